@@ -0,0 +1,417 @@
+# backtest.py - Offline backtest of the signal rules over archived M1 candles
+#
+# Usage: python backtest.py [--db forex_bot.db | --npy candles/ | --dir csv/] [--pairs EURUSD GBPUSD ...]
+#                           [--start 2024-01-01] [--end 2024-03-31] [--every 240] [--window 50]
+#                           [--json report.json]
+#
+# Walks the candles bar by bar and, every --every minutes, does what one "Generate Signal"
+# click does: scores every pair from its last --window closed candles (the vectorized
+# indicators.compute_indicators / scoring.score_signals path, all generation times of a pair
+# in one pass), fills TARGET_SIGNALS slots SIGNAL_INTERVAL_MINUTES apart with the same pair
+# rotation and fallback as signal_generator.generate_signals, and resolves every signal with
+# the ResultTracker rules: the signal candle closing in the signal direction is a direct win,
+# otherwise the next candle decides between an MTG win and a loss.
+#
+# Candles come from the price_history table (--db, filled by candle_archive), from the
+# columnar day files of candle_files.NpyCandleFiles (--npy, CANDLE_STORE=npy) or from a
+# directory of per-pair files (--dir) named EURUSD.csv / EURUSD.parquet (or frxEURUSD.*)
+# with an `epoch` or `timestamp` column and open/high/low/close.
+#
+# Differences from the live bot: the snapshot is the last closed candle before the click
+# (live, the newest candle is still forming), a pair only counts as having data when its
+# previous candle exists (no stale weekend snapshots), and the news filter is not applied
+# (its calendar is not historical).
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from constants import OHLC_DEFAULT_SIZE, TARGET_SIGNALS, SIGNAL_INTERVAL_MINUTES
+from signal_generator import FOREX_PAIRS, BINARY_SYMBOL_MAP
+from scoring import FEATURE_NAMES, score_signals, window_features
+from candle_archive import rows_to_columns
+from candle_files import NpyCandleFiles
+from result_tracker import ResultTracker
+from logger_config import logger
+
+MIN_WINDOW = 26  # get_signal_for_pair needs this many candles for the indicator path
+SCORE_CHUNK = 8192  # candle windows scored per window_features call
+
+
+# ---- loading ----
+
+def load_from_database(database, pairs: list, start: int = None, end: int = None) -> dict:
+    """{pair: (epochs, opens, highs, lows, closes)} from price_history"""
+    candles = {}
+    for pair in pairs:
+        columns = rows_to_columns(database.get_candles(pair, start, end))
+        if columns is not None:
+            candles[pair] = columns
+    return candles
+
+
+def load_from_files(root: str, pairs: list, start: int = None, end: int = None) -> dict:
+    """{pair: (epochs, opens, highs, lows, closes)} from NpyCandleFiles day files"""
+    files = NpyCandleFiles(root)
+    candles = {}
+    for pair in pairs:
+        columns = files.read(pair, start, end)
+        if columns is not None:
+            candles[pair] = columns
+    return candles
+
+
+def _read_frame(path: str) -> pd.DataFrame:
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)  # needs pyarrow or fastparquet
+    return pd.read_csv(path)
+
+
+def load_from_directory(directory: str, pairs: list, start: int = None, end: int = None) -> dict:
+    """{pair: (epochs, opens, highs, lows, closes)} from <PAIR>.csv / <PAIR>.parquet files"""
+    candles = {}
+    for pair in pairs:
+        names = [f"{name}.{ext}" for name in (pair, BINARY_SYMBOL_MAP.get(pair, pair)) for ext in ('parquet', 'csv')]
+        path = next((os.path.join(directory, name) for name in names
+                     if os.path.exists(os.path.join(directory, name))), None)
+        if path is None:
+            continue
+        try:
+            df = _read_frame(path)
+            if 'epoch' in df.columns:
+                epochs = df['epoch'].to_numpy(dtype=np.int64)
+            else:
+                stamps = pd.to_datetime(df['timestamp'], utc=True)
+                epochs = ((stamps - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+            prices = [df[name].to_numpy(dtype=np.float64) for name in ('open', 'high', 'low', 'close')]
+        except Exception as e:
+            logger.error(f"Could not read candles for {pair} from {path}: {e}")
+            continue
+
+        keep = np.ones(len(epochs), dtype=bool)
+        if start is not None:
+            keep &= epochs >= start
+        if end is not None:
+            keep &= epochs <= end
+        keep &= ~np.isnan(np.column_stack(prices)).any(axis=1)
+        epochs = epochs[keep]
+        if not len(epochs):
+            continue
+        # Sort by epoch, keeping the last row of duplicated epochs
+        order = np.argsort(epochs, kind='stable')
+        last = np.append(epochs[order][1:] != epochs[order][:-1], True)
+        order = order[last]
+        candles[pair] = (epochs[order],) + tuple(price[keep][order] for price in prices)
+    return candles
+
+
+# ---- scoring ----
+
+def window_feature_matrix(columns, ends: np.ndarray, window: int) -> np.ndarray:
+    """
+    Scoring features (one row per FEATURE_NAMES entry) of the `window` candles ending at each
+    row index in `ends`, computed in chunks through scoring.window_features.
+    """
+    _, _, highs, lows, closes = columns
+    views = [sliding_window_view(values, window) for values in (highs, lows, closes)]
+    matrix = np.empty((len(FEATURE_NAMES), len(ends)))
+    for offset in range(0, len(ends), SCORE_CHUNK):
+        rows = ends[offset:offset + SCORE_CHUNK] - (window - 1)
+        high, low, close = (view[rows] for view in views)
+        features = window_features(high, low, close)
+        for row, name in enumerate(FEATURE_NAMES):
+            matrix[row, offset:offset + len(rows)] = features[name]
+    return matrix
+
+
+def feature_codes(matrix: np.ndarray, thresholds: dict = None) -> np.ndarray:
+    """Signal codes (+1 CALL, -1 PUT, 0 none) for a window_feature_matrix, optionally with threshold overrides"""
+    labels, _, _ = score_signals(dict(zip(FEATURE_NAMES, matrix)), thresholds)
+    return (labels == 'CALL').astype(np.int8) - (labels == 'PUT')
+
+
+def score_windows(columns, ends: np.ndarray, window: int, thresholds: dict = None) -> np.ndarray:
+    """Signal code (+1 CALL, -1 PUT, 0 none) for the `window` candles ending at each row index in `ends`"""
+    return feature_codes(window_feature_matrix(columns, ends, window), thresholds)
+
+
+def generation_times(candles: dict, every: int, window: int, slots: int, interval: int) -> np.ndarray:
+    """Click times (epochs on the minute grid) from the first full window to the last fully resolvable batch"""
+    first = min(int(columns[0][min(window, len(columns[0]) - 1)]) for columns in candles.values())
+    last = max(int(columns[0][-1]) for columns in candles.values()) - (slots * interval + 2) * 60
+    first += -first % 60
+    if last < first:
+        return np.zeros(0, dtype=np.int64)
+    return np.arange(first, last + 1, every * 60, dtype=np.int64)
+
+
+def signal_features(candles: dict, pairs: list, times: np.ndarray, window: int) -> tuple:
+    """
+    (features, cells, fresh): fresh is the (times, pairs) matrix of whether the pair had a full
+    window ending at the candle just before the click; features is the window_feature_matrix
+    of the fresh cells, whose flat indices into that matrix are `cells`.
+    """
+    fresh = np.zeros((len(times), len(pairs)), dtype=bool)
+    matrices, cells = [], []
+    for col, pair in enumerate(pairs):
+        columns = candles.get(pair)
+        if columns is None or len(columns[0]) < window:
+            continue
+        epochs = columns[0]
+        ends = np.searchsorted(epochs, times) - 1  # Last candle opened before the click
+        fresh[:, col] = (ends >= window - 1) & (epochs[np.maximum(ends, 0)] == times - 60)
+        rows = np.flatnonzero(fresh[:, col])
+        if len(rows):
+            matrices.append(window_feature_matrix(columns, ends[rows], window))
+            cells.append(rows * len(pairs) + col)
+    if not matrices:
+        return np.empty((len(FEATURE_NAMES), 0)), np.zeros(0, dtype=np.int64), fresh
+    return np.concatenate(matrices, axis=1), np.concatenate(cells), fresh
+
+
+def cell_codes(features: np.ndarray, cells: np.ndarray, shape: tuple, thresholds: dict = None) -> np.ndarray:
+    """(times, pairs) signal code matrix from signal_features output; 0 outside `cells`"""
+    codes = np.zeros(shape, dtype=np.int8)
+    codes.flat[cells] = feature_codes(features, thresholds)
+    return codes
+
+
+def signal_codes(candles: dict, pairs: list, times: np.ndarray, window: int, thresholds: dict = None) -> tuple:
+    """
+    (codes, fresh): (times, pairs) matrices of signal codes and of whether the pair had a
+    full window ending at the candle just before the click. Codes are 0 where not fresh.
+    """
+    features, cells, fresh = signal_features(candles, pairs, times, window)
+    return cell_codes(features, cells, fresh.shape, thresholds), fresh
+
+
+# ---- slotting and resolution ----
+
+def fill_slots(codes: np.ndarray, times: np.ndarray, slots: int, interval: int) -> tuple:
+    """
+    generate_signals slotting for every click at once: slot i asks pair i % len(pairs) and
+    falls back to the following pairs in rotation; a slot without any signal is skipped.
+    Returns (click index, slot, pair index, code, signal candle epoch) arrays for filled slots.
+    """
+    count = codes.shape[1]
+    picked = []
+    for slot in range(slots):
+        order = (slot % count + np.arange(count)) % count
+        has_signal = codes[:, order] != 0
+        filled = np.flatnonzero(has_signal.any(axis=1))
+        pair_idx = order[has_signal[filled].argmax(axis=1)]
+        picked.append((filled, np.full(len(filled), slot), pair_idx, codes[filled, pair_idx],
+                       times[filled] + (slot + 1) * interval * 60))
+    return tuple(np.concatenate(parts) for parts in zip(*picked))
+
+
+def _candles_at(columns, epochs: np.ndarray) -> tuple:
+    """(present mask, opens, closes) of the candles opening at `epochs`"""
+    stored = columns[0]
+    idx = np.minimum(np.searchsorted(stored, epochs), len(stored) - 1)
+    present = stored[idx] == epochs
+    return present, columns[1][idx], columns[4][idx]
+
+
+def _won(codes: np.ndarray, opens: np.ndarray, closes: np.ndarray) -> np.ndarray:
+    """ResultTracker._direction_won for arrays of CALL (+1) / PUT (-1) codes"""
+    return np.where(codes > 0, ResultTracker._direction_won('CALL', opens, closes),
+                    ResultTracker._direction_won('PUT', opens, closes))
+
+
+def resolve(columns, codes: np.ndarray, epochs: np.ndarray) -> tuple:
+    """
+    Outcomes with the ResultTracker rules (a candle counts once the next one exists):
+    signal candle won -> direct win; signal candle missing -> unverified;
+    otherwise the next candle decides MTG win / loss, and a missing next candle is a loss.
+    Returns (result codes: 1 direct win, 2 MTG win, 0 loss, -1 unverified).
+    """
+    has_first, open_1, close_1 = _candles_at(columns, epochs)
+    has_second, open_2, close_2 = _candles_at(columns, epochs + 60)
+    has_third, _, _ = _candles_at(columns, epochs + 120)
+    first_closed = has_first & has_second
+    second_closed = has_second & has_third
+
+    first_won = first_closed & _won(codes, open_1, close_1)
+    mtg_won = first_closed & ~first_won & second_closed & _won(codes, open_2, close_2)
+    return np.select([~first_closed, first_won, mtg_won], [-1, 1, 2], 0)
+
+
+def outcome_table(candles: dict, pairs: list, times: np.ndarray, slots: int, interval: int) -> np.ndarray:
+    """
+    resolve() result codes of a PUT (index 0) and a CALL (index 1) for every (click, slot, pair),
+    so that many sets of signal codes can be evaluated without the candles (see evaluate()).
+    """
+    table = np.full((2, len(times), slots, len(pairs)), -1, dtype=np.int8)
+    epochs = (times[:, None] + (np.arange(slots) + 1) * interval * 60).ravel()
+    for col, pair in enumerate(pairs):
+        columns = candles.get(pair)
+        if columns is None or not len(columns[0]):
+            continue
+        for side, code in enumerate((-1, 1)):
+            outcomes = resolve(columns, np.full(len(epochs), code, dtype=np.int8), epochs)
+            table[side, :, :, col] = outcomes.reshape(len(times), slots)
+    return table
+
+
+def evaluate(codes: np.ndarray, fresh: np.ndarray, times: np.ndarray, table: np.ndarray,
+             slots: int = TARGET_SIGNALS, interval: int = SIGNAL_INTERVAL_MINUTES) -> dict:
+    """Overall statistics, click and empty slot counts for a signal code matrix, outcomes from outcome_table()"""
+    clicks, slot, pair_idx, signal_code, _ = fill_slots(codes, times, slots, interval)
+    report = _statistics(table[(signal_code > 0).astype(np.intp), clicks, slot, pair_idx])
+    open_clicks = int(np.count_nonzero(fresh.any(axis=1)))
+    report['clicks'] = open_clicks
+    report['skipped_slots'] = open_clicks * slots - int(len(clicks))
+    return report
+
+
+def _statistics(outcomes: np.ndarray) -> dict:
+    """Counts and rates in the shape of ResultTracker.get_batch_statistics"""
+    direct = int(np.count_nonzero(outcomes == 1))
+    mtg = int(np.count_nonzero(outcomes == 2))
+    losses = int(np.count_nonzero(outcomes == 0))
+    verified = direct + mtg + losses
+    return {
+        'total_trades': int(len(outcomes)),
+        'wins': direct + mtg,
+        'direct_wins': direct,
+        'mtg_wins': mtg,
+        'losses': losses,
+        'unverified': int(len(outcomes)) - verified,
+        'win_rate': (direct + mtg) / verified * 100 if verified else 0,
+        'direct_win_rate': direct / verified * 100 if verified else 0,
+        'mtg_win_rate': mtg / verified * 100 if verified else 0,
+        'loss_rate': losses / verified * 100 if verified else 0
+    }
+
+
+def run_backtest(candles: dict, every: int = 240, window: int = OHLC_DEFAULT_SIZE,
+                 slots: int = TARGET_SIGNALS, interval: int = SIGNAL_INTERVAL_MINUTES,
+                 thresholds: dict = None) -> dict:
+    """
+    Backtest over {pair: (epochs, opens, highs, lows, closes)} candles, optionally with
+    scoring threshold overrides ({constants name: value}, see scoring.THRESHOLD_NAMES).
+    Returns overall statistics plus 'pairs' (per-pair statistics), click/slot counts and timings.
+    """
+    if window < MIN_WINDOW:
+        raise ValueError(f"window must be at least {MIN_WINDOW} candles")
+    pairs = list(FOREX_PAIRS)
+    timings = {}
+    report = _statistics(np.zeros(0, dtype=np.int8))
+    report.update({'clicks': 0, 'skipped_slots': 0, 'pairs': {}, 'timings_ms': timings})
+    if not candles:
+        return report
+
+    started = time.perf_counter()
+    times = generation_times(candles, every, window, slots, interval)
+    codes, fresh = signal_codes(candles, pairs, times, window, thresholds)
+    timings['score'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    clicks, _, pair_idx, signal_code, epochs = fill_slots(codes, times, slots, interval)
+    outcomes = np.full(len(clicks), -1, dtype=np.int8)
+    for col, pair in enumerate(pairs):
+        mask = pair_idx == col
+        if mask.any():
+            outcomes[mask] = resolve(candles[pair], signal_code[mask], epochs[mask])
+    timings['resolve'] = (time.perf_counter() - started) * 1000
+
+    report.update(_statistics(outcomes))
+    open_clicks = int(np.count_nonzero(fresh.any(axis=1)))  # Clicks while some pair was trading
+    report['clicks'] = open_clicks
+    report['skipped_slots'] = open_clicks * slots - int(len(clicks))
+    report['pairs'] = {pair: _statistics(outcomes[pair_idx == col])
+                       for col, pair in enumerate(pairs) if np.any(pair_idx == col)}
+    return report
+
+
+# ---- command line ----
+
+def _epoch(date_text: str, end_of_day: bool = False):
+    if not date_text:
+        return None
+    moment = datetime.strptime(date_text, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    return int(moment.timestamp()) + (86399 if end_of_day else 0)
+
+
+def format_report(report: dict) -> str:
+    def line(name, stats):
+        return (f"{name:>8} | {stats['total_trades']:>7} | {stats['direct_wins']:>7} | {stats['mtg_wins']:>7} | "
+                f"{stats['losses']:>7} | {stats['unverified']:>6} | {stats['direct_win_rate']:>7.1f}% | "
+                f"{stats['win_rate']:>7.1f}%")
+
+    output = f"{report['clicks']} clicks, {report['skipped_slots']} empty slots\n"
+    output += f"{'pair':>8} | {'signals':>7} | {'direct':>7} | {'MTG win':>7} | {'loss':>7} | {'unver.':>6} | " \
+              f"{'direct %':>8} | {'total %':>8}\n"
+    output += "-" * 84 + "\n"
+    for pair, stats in report['pairs'].items():
+        output += line(pair, stats) + "\n"
+    output += "-" * 84 + "\n"
+    output += line('all', report)
+    return output
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Candle source and simulation options shared with sweep.py"""
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--db', default='forex_bot.db', help="SQLite database with price_history (default)")
+    source.add_argument('--npy', help="Candle file directory of CANDLE_STORE=npy (<PAIR>/<YYYY-MM-DD>.npy)")
+    source.add_argument('--dir', help="Directory of <PAIR>.csv / <PAIR>.parquet candle files")
+    parser.add_argument('--pairs', nargs='+', default=FOREX_PAIRS)
+    parser.add_argument('--start', help="First day (YYYY-MM-DD, UTC)")
+    parser.add_argument('--end', help="Last day (YYYY-MM-DD, UTC)")
+    parser.add_argument('--every', type=int, default=TARGET_SIGNALS * SIGNAL_INTERVAL_MINUTES,
+                        help="Minutes between clicks (default: one batch after another)")
+    parser.add_argument('--window', type=int, default=OHLC_DEFAULT_SIZE, help="Candles per snapshot")
+
+
+def load_candles(args) -> tuple:
+    """(candles, milliseconds) for the add_arguments() options; prints what was loaded"""
+    started = time.perf_counter()
+    start, end = _epoch(args.start), _epoch(args.end, end_of_day=True)
+    if args.npy:
+        candles = load_from_files(args.npy, args.pairs, start, end)
+    elif args.dir:
+        candles = load_from_directory(args.dir, args.pairs, start, end)
+    else:
+        from database import Database
+        database = Database(args.db)
+        candles = load_from_database(database, args.pairs, start, end)
+        database.close()
+    loaded_ms = (time.perf_counter() - started) * 1000
+    total = sum(len(columns[0]) for columns in candles.values())
+    if total:
+        print(f"Loaded {total:,} candles for {len(candles)} pairs in {loaded_ms:.0f} ms")
+    else:
+        print("No candles found")
+    return candles, loaded_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the signal rules over archived M1 candles")
+    add_arguments(parser)
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    candles, loaded_ms = load_candles(args)
+    if not candles:
+        return
+
+    report = run_backtest(candles, every=args.every, window=args.window)
+    report['timings_ms']['load'] = loaded_ms
+    print(format_report(report))
+    timings = report['timings_ms']
+    print(f"Scoring {timings['score']:.0f} ms | slotting + resolution {timings['resolve']:.0f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
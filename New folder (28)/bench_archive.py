@@ -0,0 +1,90 @@
+# bench_archive.py - Candle archive: history payloads and cold-start fetch with and without price_history
+#
+# Usage: python bench_archive.py [--outputsize 50] [--warm 5] [--latency 0.05]
+#
+# Starts replay_server.ReplayServer and runs two bot processes against it one after the
+# other, sharing one database (polling mode, so every get_all_ohlc_data call asks for
+# history). The first starts with an empty price_history table; the second is a restart
+# that seeds its candle stores from the archive the first one wrote. For each process the
+# cold call and the warm calls are timed and the candles the server sent are counted.
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+async def _fetch_rounds(outputsize: int, warm: int) -> tuple:
+    from market_client import market_client
+
+    started = time.perf_counter()
+    result = await market_client.get_all_ohlc_data(outputsize)
+    cold = time.perf_counter() - started
+    warm_samples = []
+    for _ in range(warm):
+        started = time.perf_counter()
+        await market_client.get_all_ohlc_data(outputsize)
+        warm_samples.append(time.perf_counter() - started)
+    await market_client.close()
+    return result, cold, warm_samples
+
+
+def run_client(outputsize: int, warm: int):
+    """Child process: one cold and `warm` warm get_all_ohlc_data calls, reported as JSON"""
+    from candle_archive import candle_archive
+
+    result, cold, warm_samples = asyncio.run(_fetch_rounds(outputsize, warm))
+    candle_archive.flush()
+    print(json.dumps({'pairs': len(result), 'rows': min((len(df) for df in result.values()), default=0),
+                      'cold': cold, 'warm': sorted(warm_samples)[len(warm_samples) // 2] if warm_samples else 0.0}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the price_history candle archive")
+    parser.add_argument('--outputsize', type=int, default=50)
+    parser.add_argument('--warm', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--client', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client:
+        run_client(args.outputsize, args.warm)
+        return
+
+    from replay_server import Recording, ReplayServer
+
+    server = ReplayServer(Recording(), port=0, latency=args.latency)
+    server.start()
+    workdir = tempfile.mkdtemp(prefix="bench_archive_")  # forex_bot.db is created in the working directory
+    env = dict(os.environ, BINARY_WS_URL=server.url, STREAM_CANDLES="false", LOG_FILE="",
+               PYTHONPATH=os.pathsep.join(filter(None, [HERE, os.environ.get("PYTHONPATH")])))
+
+    print(f"Replay server {server.url}, {args.latency * 1000:.0f} ms latency, database in {workdir}")
+    print(f"{'':>24} | {'cold (ms)':>9} | {'warm (ms)':>9} | {'candles sent':>12} | {'per pair/call':>13}")
+    print("-" * 82)
+    try:
+        for name in ("empty archive", "restart from archive"):
+            before = server.stats['history_candles'], server.stats['requests']
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--client',
+                                     '--outputsize', str(args.outputsize), '--warm', str(args.warm)],
+                                    cwd=workdir, env=env, capture_output=True, text=True, check=True).stdout
+            report = json.loads(output.strip().splitlines()[-1])
+            sent = server.stats['history_candles'] - before[0]
+            requests = server.stats['requests'] - before[1]
+            print(f"{name:>24} | {report['cold'] * 1000:>9.1f} | {report['warm'] * 1000:>9.1f} | {sent:>12} | "
+                  f"{sent / max(requests, 1):>13.1f}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# bench_backtest.py - Backtest throughput on months of synthetic M1 candles for all pairs
+#
+# Usage: python bench_backtest.py [--days 90] [--every 240 1] [--check 300] [--keep]
+#
+# Writes --days of weekday M1 candles per pair (trending random walks with volatility
+# regimes) into a fresh database through Database.upsert_candles, then times
+# backtest.load_from_database and backtest.run_backtest for each --every click spacing.
+# --check compares the vectorized signal codes with signal_generator.get_signal_for_pair
+# (the per-window `ta` path the live bot uses) on that many random windows, and reports
+# both paths' cost per window.
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import numpy as np
+import pandas as pd
+
+import backtest
+from database import Database
+from signal_generator import FOREX_PAIRS, get_signal_for_pair
+
+DAY = 86400
+
+
+def synthesize(days: int, seed: int = 11) -> dict:
+    """{pair: (epochs, opens, highs, lows, closes)} weekday M1 candles ending at today's midnight UTC"""
+    rng = np.random.default_rng(seed)
+    end = int(time.time()) // DAY * DAY
+    epochs = np.arange(end - days * DAY, end, 60, dtype=np.int64)
+    epochs = epochs[((epochs // DAY + 3) % 7) < 5]  # Drop Saturdays and Sundays (1970-01-01 was a Thursday)
+    n = len(epochs)
+    candles = {}
+    for pair in FOREX_PAIRS:
+        regime = np.repeat(rng.normal(0, 2e-5, n // 240 + 1), 240)[:n]  # Drift changes every 4 hours
+        volatility = np.repeat(rng.uniform(1e-4, 5e-4, n // 60 + 1), 60)[:n]
+        base = 100.0 if pair.endswith('JPY') else 1.0 + rng.random()
+        closes = base * np.exp(np.cumsum(regime + rng.normal(0, 1, n) * volatility))
+        opens = np.concatenate(([base], closes[:-1]))
+        spread = np.abs(rng.normal(0, 0.5, n)) * volatility * closes
+        candles[pair] = (epochs.copy(), opens, np.maximum(opens, closes) + spread,
+                         np.minimum(opens, closes) - spread, closes)
+    return candles
+
+
+def check(candles: dict, samples: int, window: int, seed: int = 5):
+    """Vectorized codes vs get_signal_for_pair on random windows: (mismatches, vectorized us, ta us per window)"""
+    rng = np.random.default_rng(seed)
+    mismatches = 0
+    vector_s = ta_s = 0.0
+    per_pair = max(1, samples // len(candles))
+    for pair, columns in candles.items():
+        ends = np.sort(rng.integers(window - 1, len(columns[0]), per_pair))
+        started = time.perf_counter()
+        codes = backtest.score_windows(columns, ends, window)
+        vector_s += time.perf_counter() - started
+
+        started = time.perf_counter()
+        for end, code in zip(ends, codes):
+            rows = slice(end - window + 1, end + 1)
+            df = pd.DataFrame({'open': columns[1][rows], 'high': columns[2][rows],
+                               'low': columns[3][rows], 'close': columns[4][rows]})
+            expected = {'CALL': 1, 'PUT': -1}.get(get_signal_for_pair(df), 0)
+            mismatches += expected != code
+        ta_s += time.perf_counter() - started
+    checked = per_pair * len(candles)
+    return mismatches, checked, vector_s / checked * 1e6, ta_s / checked * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline backtest")
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--every', type=int, nargs='+', default=[240, 1], help="Minutes between clicks")
+    parser.add_argument('--window', type=int, default=50)
+    parser.add_argument('--check', type=int, default=300, help="Windows compared with get_signal_for_pair")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated database")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_backtest_")
+    database = Database(os.path.join(workdir, "candles.db"))
+    started = time.perf_counter()
+    generated = synthesize(args.days)
+    for pair, columns in generated.items():
+        database.upsert_candles(pair, *(col.tolist() for col in columns))
+    total = sum(len(columns[0]) for columns in generated.values())
+    print(f"{total:,} candles ({args.days} days x {len(generated)} pairs) archived in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    candles = backtest.load_from_database(database, FOREX_PAIRS)
+    print(f"load_from_database: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    for every in args.every:
+        started = time.perf_counter()
+        report = backtest.run_backtest(candles, every=every, window=args.window)
+        elapsed = time.perf_counter() - started
+        timings = report['timings_ms']
+        print(f"every {every:>3} min: {report['clicks']:>7,} clicks, {report['total_trades']:>9,} signals in "
+              f"{elapsed:.2f}s (scoring {timings['score']:.0f} ms, slotting + resolution {timings['resolve']:.0f} ms) | "
+              f"win rate {report['win_rate']:.1f}% ({report['direct_win_rate']:.1f}% direct)")
+
+    if args.check:
+        mismatches, checked, vector_us, ta_us = check(candles, args.check, args.window)
+        print(f"check: {mismatches}/{checked} windows differ from get_signal_for_pair | "
+              f"vectorized {vector_us:.0f} us/window (in small batches), ta {ta_us:.0f} us/window")
+
+    database.close()
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    else:
+        print(f"Database kept at {workdir}")
+
+
+if __name__ == "__main__":
+    main()
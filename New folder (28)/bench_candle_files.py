@@ -0,0 +1,86 @@
+# bench_candle_files.py - Candle archive reads: price_history rows vs columnar .npy day files
+#
+# Usage: python bench_candle_files.py [--days 365] [--pair EURUSD] [--repeat 5]
+#
+# Writes --days of synthetic weekday M1 candles for one pair into both archive backends
+# (SQLite price_history through Database.upsert_candles, and candle_files.NpyCandleFiles),
+# checks that both return the same candles, then times reading the newest 50 candles
+# (CandleArchive.load_seeds), one day, one month and the whole range through each backend.
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import numpy as np
+
+from bench_backtest import synthesize
+from candle_archive import rows_to_columns
+from candle_files import NpyCandleFiles, DAY
+from database import Database
+
+
+def timed(func, repeat: int) -> float:
+    """Best of `repeat` calls, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the columnar candle files against price_history")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--pair', default='EURUSD')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    columns = synthesize(args.days)[args.pair]
+    workdir = tempfile.mkdtemp(prefix="bench_candle_files_")
+    database = Database(os.path.join(workdir, "candles.db"))
+    files = NpyCandleFiles(os.path.join(workdir, "candles"))
+    try:
+        started = time.perf_counter()
+        database.upsert_candles(args.pair, *(col.tolist() for col in columns))
+        sqlite_write = time.perf_counter() - started
+        started = time.perf_counter()
+        files.write(args.pair, columns)
+        npy_write = time.perf_counter() - started
+        print(f"{len(columns[0]):,} candles for {args.pair}: written in {sqlite_write:.1f}s (SQLite), "
+              f"{npy_write:.2f}s (.npy, {len(files.days(args.pair))} day files)")
+
+        def sqlite_read(start=None, end=None, limit=None):
+            return rows_to_columns(database.get_candles(args.pair, start, end, limit))
+
+        def npy_read(start=None, end=None, limit=None):
+            return files.read(args.pair, start, end, limit)
+
+        last = int(columns[0][-1])
+        ranges = {
+            'newest 50': (None, None, 50),
+            'one day': (last - last % DAY, last, None),
+            'one month': (last - 30 * DAY, last, None),
+            'everything': (None, None, None),
+        }
+        print(f"\n{'read':>10} | {'candles':>8} | {'SQLite (ms)':>11} | {'.npy (ms)':>9} | {'speedup':>7} | same")
+        print("-" * 66)
+        for name, (start, end, limit) in ranges.items():
+            expected, got = sqlite_read(start, end, limit), npy_read(start, end, limit)
+            same = all(np.array_equal(a, b) for a, b in zip(expected, got))
+            sqlite_ms = timed(lambda: sqlite_read(start, end, limit), args.repeat)
+            npy_ms = timed(lambda: npy_read(start, end, limit), args.repeat)
+            print(f"{name:>10} | {len(got[0]):>8,} | {sqlite_ms:>11.2f} | {npy_ms:>9.2f} | "
+                  f"{sqlite_ms / npy_ms:>6.1f}x | {'yes' if same else 'NO'}")
+    finally:
+        database.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# bench_db.py - Signal insert throughput: per-call connections vs. the persistent WAL connection
+#
+# Usage: python bench_db.py [--signals 3000] [--batch 30]
+#
+# Inserts --signals signals in batches of --batch (one "Generate Signal" click each) into a
+# fresh on-disk database, first with the previous add_signal (sqlite3.connect, rollback
+# journal, commit, close per call), then with Database.add_signal, and reports signals/sec
+# and the cost of one batch. Result updates are timed the same way. A third run stores
+# each batch with Database.add_signals_bulk (one executemany and one commit per batch), and
+# a fourth submits the same bulk writes through db_writer.DatabaseWriter, reporting the time
+# callers spend (enqueue only), the time until everything is committed, and writer metrics.
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from database import Database
+from db_writer import DatabaseWriter
+
+
+def legacy_add_signal(db_path: str, signal_id: str, signal_dict: dict, batch_id: str, user_id: int, chat_id: int):
+    """The previous Database.add_signal: open, insert, commit, close"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT OR REPLACE INTO signals
+        (signal_id, batch_id, user_id, chat_id, pair, signal_type, signal_time,
+         timestamp, entry_price, status, created_at, confidence_score)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (signal_id, batch_id, user_id, chat_id, signal_dict['pair'], signal_dict['signal'],
+          signal_dict['time'], signal_dict['timestamp'].isoformat(), signal_dict.get('entry_price'),
+          'pending', datetime.now().isoformat(), None))
+    cursor.execute('''
+        INSERT OR IGNORE INTO batches
+        (batch_id, user_id, chat_id, created_at)
+        VALUES (?, ?, ?, ?)
+    ''', (batch_id, user_id, chat_id, datetime.now().isoformat()))
+    cursor.execute('UPDATE batches SET total_signals = total_signals + 1 WHERE batch_id = ?', (batch_id,))
+    conn.commit()
+    conn.close()
+
+
+def legacy_update_result(db_path: str, signal_id: str, result: bool):
+    """The previous Database.update_signal_result (win/loss path)"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE signals SET status = 'completed', result = ?, mtg_count = ?, is_mtg = ?, completed_at = ?
+        WHERE signal_id = ?
+    ''', ('win' if result else 'loss', 0, 0, datetime.now().isoformat(), signal_id))
+    cursor.execute('SELECT batch_id FROM signals WHERE signal_id = ?', (signal_id,))
+    batch_id = cursor.fetchone()[0]
+    column = 'wins' if result else 'losses'
+    cursor.execute(f'UPDATE batches SET {column} = {column} + 1, completed_signals = completed_signals + 1 WHERE batch_id = ?',
+                   (batch_id,))
+    cursor.execute('UPDATE batches SET win_rate = CAST(wins AS REAL) / NULLIF(completed_signals, 0) * 100 WHERE batch_id = ?',
+                   (batch_id,))
+    conn.commit()
+    conn.close()
+
+
+def make_batches(total: int, batch_size: int) -> list:
+    now = datetime.now()
+    batches = []
+    for start in range(0, total, batch_size):
+        batch_id = str(uuid.uuid4())
+        signals = []
+        for i in range(min(batch_size, total - start)):
+            timestamp = now + timedelta(minutes=8 * (i + 1))
+            signals.append((str(uuid.uuid4()), {
+                'pair': 'EURUSD', 'signal': 'CALL' if i % 2 else 'PUT',
+                'time': timestamp.strftime('%H:%M'), 'timestamp': timestamp, 'entry_price': 1.1
+            }))
+        batches.append((batch_id, signals))
+    return batches
+
+
+def run(batches: list, add, update, add_bulk=None) -> tuple:
+    """Returns (insert seconds, update seconds)"""
+    started = time.perf_counter()
+    for batch_id, signals in batches:
+        if add_bulk is not None:
+            add_bulk(batch_id, dict(signals), 1, 1)
+            continue
+        for signal_id, signal_dict in signals:
+            add(signal_id, signal_dict, batch_id, 1, 1)
+    inserted = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _, signals in batches:
+        for i, (signal_id, _) in enumerate(signals):
+            update(signal_id, i % 3 != 0)
+    return inserted, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Database signal writes")
+    parser.add_argument('--signals', type=int, default=3000)
+    parser.add_argument('--batch', type=int, default=30, help="Signals per batch (one click)")
+    args = parser.parse_args()
+
+    batches = make_batches(args.signals, args.batch)
+    total = sum(len(signals) for _, signals in batches)
+    workdir = tempfile.mkdtemp(prefix="bench_db_")
+
+    legacy_path = os.path.join(workdir, "legacy.db")
+    Database(legacy_path).close()
+    with sqlite3.connect(legacy_path) as conn:
+        conn.execute('PRAGMA journal_mode=DELETE')  # The previous connections never switched to WAL
+    legacy = run(batches,
+                 lambda *a: legacy_add_signal(legacy_path, *a),
+                 lambda signal_id, result: legacy_update_result(legacy_path, signal_id, result))
+
+    db = Database(os.path.join(workdir, "persistent.db"))
+    current = run(batches, db.add_signal, lambda signal_id, result: db.update_signal_result(signal_id, result))
+    db.close()
+
+    db = Database(os.path.join(workdir, "bulk.db"))
+    bulk = run(batches, None, lambda signal_id, result: db.update_signal_result(signal_id, result), db.add_signals_bulk)
+    db.close()
+
+    db = Database(os.path.join(workdir, "write_behind.db"))
+    writer = DatabaseWriter(db)
+    started = time.perf_counter()
+    behind = run(batches, None, lambda signal_id, result: writer.submit('update_signal_result', signal_id, result),
+                 lambda *a: writer.submit('add_signals_bulk', *a))
+    writer.flush()
+    committed = time.perf_counter() - started
+    stats = writer.stats()
+    writer.close()
+
+    print(f"{total} signals in batches of {args.batch} ({workdir})")
+    print(f"{'':>22} | {'inserts/sec':>11} | {'per batch (ms)':>14} | {'updates/sec':>11}")
+    print("-" * 68)
+    for name, (inserted, updated) in (("per-call connection", legacy), ("persistent WAL", current),
+                                      ("bulk per batch", bulk)):
+        print(f"{name:>22} | {total / inserted:>11,.0f} | {inserted / len(batches) * 1000:>14.2f} | "
+              f"{total / updated:>11,.0f}")
+    print(f"{'write-behind (caller)':>22} | {total / behind[0]:>11,.0f} | {behind[0] / len(batches) * 1000:>14.2f} | "
+          f"{total / behind[1]:>11,.0f}")
+    print(f"{'bulk vs per-call':>22} | {legacy[0] / bulk[0]:>10.1f}x | {'':>14} | {legacy[1] / bulk[1]:>10.1f}x")
+    print(f"write-behind: all {stats['submitted']} writes committed after {committed * 1000:.0f} ms in {stats['flushes']} flushes "
+          f"(avg {stats['avg_flush_ms']:.2f} ms, max {stats['max_flush_ms']:.2f} ms, "
+          f"max queue depth {stats['max_queue_depth']}, max queue wait {stats['max_queue_wait_ms']:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
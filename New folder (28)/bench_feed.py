@@ -0,0 +1,152 @@
+# bench_feed.py - End-to-end latency benchmark against the local replay server
+#
+# Usage: python bench_feed.py [--file session.jsonl] [--runs 5] [--latency 0.05] [--jitter 0.0]
+#                             [--loss 0.0] [--disconnect-every 0] [--pool 1]
+#
+# Starts replay_server.ReplayServer on a free local port, points BINARY_WS_URL at it
+# and times, over --runs rounds:
+#   - market_client.get_all_ohlc_data (first call, then streamed/warm calls)
+#   - market_client.get_candles_since for every pair (result verification)
+#   - the handler's pipeline (fetch -> generate_signals -> format -> tracker)
+#   - bot.generate_signal_handler end to end with a stand-in callback query
+#     (needs python-telegram-bot installed, skipped otherwise)
+# Without a --file recording the server answers with synthetic candles.
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(prefix="bench_feed_"), "forex_bot.db"))
+
+from replay_server import Recording, ReplayServer
+
+
+def _summary(samples: list) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return (f"{ordered[0] * 1000:>9.1f} | {statistics.median(ordered) * 1000:>9.1f} | "
+            f"{p95 * 1000:>9.1f} | {ordered[-1] * 1000:>9.1f}")
+
+
+def _report(name: str, samples: list, note: str = ""):
+    print(f"{name:<36} | {_summary(samples)}{'  ' + note if note else ''}")
+
+
+async def _timed_async(coro):
+    started = time.perf_counter()
+    result = await coro
+    return time.perf_counter() - started, result
+
+
+class _Chat:
+    id = 1
+
+
+class _User:
+    id = 1
+
+
+class _Message:
+    chat = _Chat()
+
+
+class BenchQuery:
+    """Minimal stand-in for a Telegram CallbackQuery"""
+
+    def __init__(self):
+        self.from_user = _User()
+        self.message = _Message()
+        self.edits = 0
+
+    async def answer(self):
+        pass
+
+    async def edit_message_text(self, *args, **kwargs):
+        self.edits += 1
+
+
+async def bench_async(runs: int, pairs: list):
+    from market_client import market_client
+
+    cold, result = await _timed_async(market_client.get_all_ohlc_data(50))
+    _report("market_client.get_all_ohlc_data cold", [cold], f"{len(result)} pairs")
+    warm = [(await _timed_async(market_client.get_all_ohlc_data(50)))[0] for _ in range(runs)]
+    _report("market_client.get_all_ohlc_data warm", warm)
+
+    starts = {pair: int(time.time()) // 60 * 60 - 600 for pair in pairs}
+    history = [(await _timed_async(market_client.get_candles_since(starts)))[0] for _ in range(runs)]
+    _report(f"market_client.get_candles_since x{len(pairs)}", history)
+
+    from signal_generator import generate_signals, format_signal_output
+    from result_tracker import tracker
+
+    async def pipeline():
+        data = await market_client.get_all_ohlc_data(50)
+        signals = generate_signals(data)
+        format_signal_output(signals, martingale=1)
+        tracker.add_batch(str(uuid.uuid4()), {str(uuid.uuid4()): sig for sig in signals}, user_id=1, chat_id=1)
+        return signals
+
+    samples = []
+    for _ in range(runs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, signals = await _timed_async(pipeline())
+        samples.append(elapsed)
+    _report("signal pipeline (handler steps)", samples, f"{len(signals)} signals")
+
+    try:
+        import bot
+    except ImportError as e:
+        print(f"{'bot.generate_signal_handler':<36} | skipped ({e})")
+    else:
+        samples = []
+        for _ in range(runs):
+            query = BenchQuery()
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed, _ = await _timed_async(bot.generate_signal_handler(query, None))
+            samples.append(elapsed)
+        _report("bot.generate_signal_handler", samples)
+
+    await market_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data fetching and signal generation against a local replay server")
+    parser.add_argument('--file', help="JSONL recording from replay_server.py record")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated round trip in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--loss', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--disconnect-every', type=int, default=0)
+    parser.add_argument('--pool', type=int, default=1, help="WS_POOL_SIZE for market_client")
+    args = parser.parse_args()
+
+    recording = Recording.load(args.file) if args.file else Recording()
+    server = ReplayServer(recording, port=0, latency=args.latency, jitter=args.jitter, loss=args.loss,
+                          error_rate=args.error_rate, disconnect_every=args.disconnect_every)
+    url = server.start()
+    os.environ["BINARY_WS_URL"] = url
+    os.environ["WS_POOL_SIZE"] = str(args.pool)
+
+    from signal_generator import FOREX_PAIRS
+
+    print(f"Replay server {url} | latency {args.latency * 1000:.0f}ms +{args.jitter * 1000:.0f}ms jitter | "
+          f"loss {args.loss:.1%} | errors {args.error_rate:.1%} | disconnect every {args.disconnect_every or '-'}")
+    print(f"{'stage':<36} | {'min (ms)':>9} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'max (ms)':>9}")
+    print("-" * 84)
+    asyncio.run(bench_async(args.runs, FOREX_PAIRS))
+    print(f"Server: {server.stats}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
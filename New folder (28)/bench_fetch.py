@@ -0,0 +1,135 @@
+# bench_fetch.py - Fetch latency benchmark: pipelined send queue vs. per-request sleeps
+#
+# Usage: python bench_fetch.py [--pairs 11 25 50 100 120] [--latency 0.08] [--pool 1 2 4]
+#
+# Runs MarketDataClient.get_all_ohlc_data (polling mode) against in-process loopback
+# sockets that answer every ticks_history request after a simulated network round trip,
+# and compares it with the previous send loop that slept WS_REQUEST_DELAY per request.
+# With several --pool sizes, the pipelined run is repeated per connection pool size.
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("ARCHIVE_CANDLES", "false")
+
+import market_client
+from constants import DATA_FETCH_TIMEOUT, WS_RATE_LIMIT_PER_MINUTE, WS_RATE_LIMIT_BURST
+
+LEGACY_REQUEST_DELAY = 0.1  # Old WS_REQUEST_DELAY
+
+
+class LoopbackWS:
+    """Answers ticks_history requests with synthetic candles after `latency` seconds"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.incoming = asyncio.Queue()
+
+    async def send(self, message: str):
+        request = json.loads(message)
+        asyncio.get_running_loop().call_later(self.latency, self._respond, request)
+
+    async def close(self):
+        pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.incoming.get()
+
+    def _respond(self, request: dict):
+        count = request.get('count', 50)
+        base = 1700000000 - 1700000000 % 60
+        candles = [
+            {'epoch': base + 60 * i, 'open': 1.1, 'high': 1.1002, 'low': 1.0998, 'close': 1.1 + i * 1e-5}
+            for i in range(count)
+        ]
+        response = {
+            'candles': candles,
+            'echo_req': request,
+            'msg_type': 'candles',
+            'req_id': request.get('req_id')
+        }
+        self.incoming.put_nowait(json.dumps(response))
+
+
+def _setup(pair_count: int, latency: float, pool_size: int = 1):
+    """A polling MarketDataClient on `pool_size` loopback sockets, with `pair_count` synthetic pairs"""
+    pairs = [f"SYN{i:03d}" for i in range(pair_count)]
+    market_client.FOREX_PAIRS = pairs
+    market_client.BINARY_SYMBOL_MAP = {pair: f"frx{pair}" for pair in pairs}
+    client = market_client.MarketDataClient(stream_candles=False, pool_size=pool_size)
+    for conn in client._connections:
+        conn.ws = LoopbackWS(latency)
+        conn.connected = True
+        conn.reader_task = asyncio.create_task(conn._reader(conn.ws))
+    return client, pairs
+
+
+async def run_pipelined(pair_count: int, latency: float, pool_size: int = 1) -> tuple:
+    client, _ = _setup(pair_count, latency, pool_size)
+    started = time.perf_counter()
+    result = await client.get_all_ohlc_data(50)
+    elapsed = time.perf_counter() - started
+    await client.close()
+    return elapsed, len(result)
+
+
+async def run_legacy(pair_count: int, latency: float) -> tuple:
+    """Previous behaviour: send, sleep WS_REQUEST_DELAY, repeat, then wait for responses"""
+    client, pairs = _setup(pair_count, latency)
+    conn = client._connections[0]
+    started = time.perf_counter()
+    futures = []
+    for pair in pairs:
+        request = {
+            "ticks_history": market_client.BINARY_SYMBOL_MAP[pair],
+            "end": "latest",
+            "count": 50,
+            "granularity": 60,
+            "style": "candles"
+        }
+        futures.append(client._register(request))
+        await conn.ws.send(json.dumps(request))
+        await asyncio.sleep(LEGACY_REQUEST_DELAY)
+    done, _ = await asyncio.wait(futures, timeout=DATA_FETCH_TIMEOUT)
+    elapsed = time.perf_counter() - started
+    await client.close()
+    return elapsed, len(done)
+
+
+async def compare(args):
+    print(f"Rate limit: burst {WS_RATE_LIMIT_BURST}, {WS_RATE_LIMIT_PER_MINUTE}/min per connection | latency {args.latency * 1000:.0f}ms")
+    header = f"{'pairs':>6} | {'legacy (s)':>10}"
+    for pool_size in args.pool:
+        header += f" | {f'pool={pool_size} (s)':>12} | {'speedup':>7}"
+    print(header)
+    print("-" * len(header))
+    for count in args.pairs:
+        legacy_time, legacy_ok = await run_legacy(count, args.latency)
+        row = f"{count:>6} | {legacy_time:>10.3f}"
+        for pool_size in args.pool:
+            pipe_time, pipe_ok = await run_pipelined(count, args.latency, pool_size)
+            speedup = legacy_time / pipe_time if pipe_time > 0 else float('inf')
+            row += f" | {pipe_time:>12.3f} | {speedup:>6.1f}x"
+            if pipe_ok != count:
+                row += f" ({pipe_ok}/{count})"
+        print(row + ('' if legacy_ok == count else f"  (legacy answered {legacy_ok})"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark get_all_ohlc_data fetch latency")
+    parser.add_argument('--pairs', type=int, nargs='+', default=[11, 25, 50, 100, 120])
+    parser.add_argument('--latency', type=float, default=0.08, help="Simulated round trip in seconds")
+    parser.add_argument('--pool', type=int, nargs='+', default=[1], help="Connection pool sizes to compare")
+    args = parser.parse_args()
+    asyncio.run(compare(args))
+
+if __name__ == "__main__":
+    main()
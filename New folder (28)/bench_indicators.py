@@ -0,0 +1,198 @@
+# bench_indicators.py - Indicator benchmark: vectorized NumPy engine vs. per-pair `ta` path
+#
+# Usage: python bench_indicators.py [--symbols 11 100 1000] [--candles 50] [--stream 600]
+#
+# Builds random-walk candles for N symbols, checks that indicators.compute_indicators
+# matches signal_generator.add_indicators (the `ta` reference) within tolerance,
+# then times both paths.
+#
+# The streaming section feeds candles through CandleStores the way market_client does
+# (forming-candle updates, an occasional out-of-order rewrite), checks the streamed values
+# against compute_latest_indicators and score_frames on the same 50-candle frames, and
+# times a streamed update against recomputing the window.
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import numpy as np
+import pandas as pd
+
+from candle_store import CandleStore
+from constants import OHLC_DEFAULT_SIZE
+from data_fetch import update_indicators, latest_indicators
+from indicators import INDICATOR_NAMES, LATEST_ATTR, compute_indicators, compute_latest_indicators, stack_frames
+from scoring import score_frames
+from signal_generator import add_indicators
+
+TOLERANCE = 1e-6  # relative, with |expected| floored at SCALE_FLOOR
+SCALE_FLOOR = 1e-6  # MACD-style values hover around zero
+
+
+def make_frames(symbols: int, candles: int, seed: int = 7) -> dict:
+    """Random-walk M1 candles for `symbols` synthetic pairs"""
+    rng = np.random.default_rng(seed)
+    epochs = 1700000000 + 60 * np.arange(candles, dtype=np.int64)
+    frames = {}
+    for i in range(symbols):
+        close = 1.1 * np.exp(np.cumsum(rng.normal(0, 4e-4, candles)))
+        open_ = np.concatenate(([close[0]], close[:-1]))
+        spread = np.abs(rng.normal(0, 2e-4, candles))
+        frames[f"SYN{i:04d}"] = pd.DataFrame({
+            'timestamp': epochs.view('datetime64[s]'),
+            'open': open_,
+            'high': np.maximum(open_, close) + spread,
+            'low': np.minimum(open_, close) - spread,
+            'close': close,
+        })
+    return frames
+
+
+def run_ta(frames: dict) -> dict:
+    return {symbol: add_indicators(df.copy()) for symbol, df in frames.items()}
+
+
+def run_vectorized(frames: dict) -> dict:
+    return [(symbols, compute_indicators(high, low, close)) for symbols, high, low, close in stack_frames(frames)]
+
+
+def max_deviation(reference: dict, vectorized: list) -> dict:
+    """Largest relative deviation per indicator; NaN positions must agree"""
+    worst = {name: 0.0 for name in INDICATOR_NAMES}
+    for symbols, indicators in vectorized:
+        for row, symbol in enumerate(symbols):
+            df = reference[symbol]
+            for name in INDICATOR_NAMES:
+                expected = df[name].to_numpy(dtype=np.float64)
+                actual = indicators[name][row]
+                if not np.array_equal(np.isnan(expected), np.isnan(actual)):
+                    worst[name] = float('inf')
+                    continue
+                mask = ~np.isnan(expected)
+                scale = np.maximum(np.abs(expected[mask]), SCALE_FLOOR)
+                deviation = np.max(np.abs(actual[mask] - expected[mask]) / scale, initial=0.0)
+                worst[name] = max(worst[name], float(deviation))
+    return worst
+
+
+def run_stream(symbols: int, candles: int) -> dict:
+    """
+    Stream `candles` candles per symbol through CandleStores and compare, at every candle,
+    the streamed indicator values and signals with a recompute of the same windows.
+    """
+    frames = make_frames(symbols, candles, seed=11)
+    stores = {symbol: CandleStore(symbol) for symbol in frames}
+    states = {}
+    columns = {symbol: [df[name].to_numpy() for name in ('open', 'high', 'low', 'close')]
+               for symbol, df in frames.items()}
+    epochs = frames[next(iter(frames))]['timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    worst = {name: 0.0 for name in INDICATOR_NAMES}
+    mismatches = signals = 0
+    commit_time = peek_time = recompute_time = 0.0
+
+    for t in range(candles):
+        for symbol, (opens, highs, lows, closes) in columns.items():
+            store = stores[symbol]
+            if t and t % 150 == 0:
+                # Out-of-order rewrite of an older candle: the state must rebuild
+                store.merge_columns(tuple(np.array([col[t - 5]]) for col in (epochs, opens, highs, lows, closes)))
+                update_indicators(states, store)
+            # Forming candle first, then its final values (one stream update each, as in the reader)
+            store.merge_row(epochs[t], opens[t], opens[t], opens[t], opens[t])
+            started = time.perf_counter()
+            update_indicators(states, store)  # Commits the previous candle
+            commit_time += time.perf_counter() - started
+            store.merge_row(epochs[t], opens[t], highs[t], lows[t], closes[t])
+            update_indicators(states, store)
+
+        started = time.perf_counter()
+        streamed_values = latest_indicators(states, list(stores.values()))
+        peek_time += time.perf_counter() - started
+
+        plain = {symbol: store.to_dataframe(OHLC_DEFAULT_SIZE) for symbol, store in stores.items()}
+        started = time.perf_counter()
+        expected = {}
+        for symbol_group, high, low, close in stack_frames(plain):
+            latest = compute_latest_indicators(high, low, close)
+            for row, symbol in enumerate(symbol_group):
+                expected[symbol] = {name: latest[name][row] for name in INDICATOR_NAMES}
+        recompute_time += time.perf_counter() - started
+
+        streamed = {}
+        for (symbol, df), values in zip(plain.items(), streamed_values):
+            for name in INDICATOR_NAMES:
+                reference, actual = expected[symbol][name], values[name]
+                if np.isnan(reference) or np.isnan(actual):
+                    if np.isnan(reference) != np.isnan(actual):
+                        worst[name] = float('inf')
+                    continue
+                deviation = abs(actual - reference) / max(abs(reference), SCALE_FLOOR)
+                worst[name] = max(worst[name], deviation)
+            streamed[symbol] = df.copy()
+            streamed[symbol].attrs[LATEST_ATTR] = values
+
+        expected_scores, streamed_scores = score_frames(plain), score_frames(streamed)
+        mismatches += sum(expected_scores[symbol] != streamed_scores.get(symbol) for symbol in expected_scores)
+        signals += sum(score[0] is not None for score in expected_scores.values())
+
+    return {
+        'worst': worst,
+        'mismatches': mismatches,
+        'signals': signals,
+        'scored': symbols * max(candles - 25, 0),
+        'commit_ms': commit_time / candles * 1e3,
+        'peek_ms': peek_time / candles * 1e3,
+        'recompute_ms': recompute_time / candles * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized indicators against ta")
+    parser.add_argument('--symbols', type=int, nargs='+', default=[11, 100, 1000])
+    parser.add_argument('--candles', type=int, default=50)
+    parser.add_argument('--stream', type=int, default=600, help="Candles streamed per symbol (0 skips)")
+    args = parser.parse_args()
+
+    print(f"Candles per symbol: {args.candles}")
+    print(f"{'symbols':>8} | {'ta (s)':>9} | {'numpy (s)':>9} | {'speedup':>7} | {'max rel dev':>11}")
+    print("-" * 57)
+    for count in args.symbols:
+        frames = make_frames(count, args.candles)
+
+        started = time.perf_counter()
+        reference = run_ta(frames)
+        ta_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        vectorized = run_vectorized(frames)
+        np_time = time.perf_counter() - started
+
+        worst = max_deviation(reference, vectorized)
+        deviation = max(worst.values())
+        speedup = ta_time / np_time if np_time > 0 else float('inf')
+        print(f"{count:>8} | {ta_time:>9.3f} | {np_time:>9.4f} | {speedup:>6.0f}x | {deviation:>11.2e}")
+        if deviation > TOLERANCE:
+            failing = {name: value for name, value in worst.items() if value > TOLERANCE}
+            print(f"         [MISMATCH] {failing}")
+
+    if args.stream:
+        symbols = args.symbols[0]
+        stats = run_stream(symbols, args.stream)
+        deviation = max(stats['worst'].values())
+        print()
+        print(f"Streaming over the {OHLC_DEFAULT_SIZE}-candle window: {symbols} symbols x {args.stream} candles")
+        print(f"  max rel dev vs compute_latest_indicators: {deviation:.2e}")
+        print(f"  score_frames mismatches: {stats['mismatches']} of {stats['scored']} scored "
+              f"({stats['signals']} signals)")
+        print(f"  per candle, all symbols: commit {stats['commit_ms']:.2f} ms, "
+              f"peek {stats['peek_ms']:.2f} ms, window recompute {stats['recompute_ms']:.2f} ms")
+        if deviation > TOLERANCE or stats['mismatches']:
+            failing = {name: value for name, value in stats['worst'].items() if value > TOLERANCE}
+            print(f"  [MISMATCH] {failing}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# bench_plan.py - "Generate Signal" click bursts with and without the shared signal plan cache
+#
+# Usage: python bench_plan.py [--clicks 1 10 100 1000] [--latency 0.05]
+#
+# Simulates bursts of simultaneous clicks against a fake market data fetch (--latency
+# seconds, synthetic trending candles for every pair, up and down in turn, so the scoring
+# rules produce real CALL/PUT signals - checked before timing, so the run never measures
+# the emergency fallback). "per click" runs the old pipeline for
+# each click (fetch, generate_signals, format_signal_output); "plan cache" goes through
+# signal_plan.SignalPlanCache. Reports the burst wall time, the fetch and build counts,
+# and the median and worst click latency. A second burst after a new candle opens checks
+# that the plan is rebuilt.
+
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import numpy as np
+
+from candle_store import CandleStore
+from signal_generator import FOREX_PAIRS, BINARY_SYMBOL_MAP, generate_signals
+from signal_plan import SignalPlanCache, build_plan
+
+TREND = 4e-4  # Per-candle log drift of the synthetic trends
+NOISE = 3e-4
+
+
+def make_market(latency: float, seed: int = 3):
+    """(fetch coroutine function, advance() opening one more candle per pair, fetch counter)"""
+    rng = np.random.default_rng(seed)
+    stores = {}
+    drifts = {}
+    last = int(time.time()) // 60 * 60
+    for index, pair in enumerate(FOREX_PAIRS):
+        symbol = BINARY_SYMBOL_MAP[pair]
+        drifts[symbol] = TREND if index % 2 == 0 else -TREND
+        closes = 1.1 * np.exp(np.cumsum(rng.normal(drifts[symbol], NOISE, 50)))
+        opens = np.concatenate(([closes[0]], closes[:-1]))
+        store = CandleStore(symbol)
+        store.merge_columns((np.arange(last - 49 * 60, last + 1, 60, dtype=np.int64), opens,
+                             np.maximum(opens, closes) + 1e-4, np.minimum(opens, closes) - 1e-4, closes))
+        stores[symbol] = store
+    counter = {'fetches': 0}
+
+    async def fetch():
+        counter['fetches'] += 1
+        await asyncio.sleep(latency)
+        return {symbol: store.to_dataframe(50) for symbol, store in stores.items()}
+
+    def advance():
+        for symbol, store in stores.items():
+            price = store.last_close
+            close = price * np.exp(drifts[symbol])
+            store.merge_row(store.last_epoch + 60, price, max(price, close) + 1e-4, min(price, close) - 1e-4, close)
+
+    return fetch, advance, counter
+
+
+async def burst(clicks: int, click):
+    latencies = []
+
+    async def one():
+        started = time.perf_counter()
+        result = await click()
+        latencies.append(time.perf_counter() - started)
+        return result
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(clicks)))
+    return time.perf_counter() - started, sorted(latencies), results
+
+
+async def run(clicks_list: list, latency: float) -> list:
+    """Report lines (printed after the run: generate_signals prints every slot)"""
+    fetch, _, _ = make_market(0)
+    signals = generate_signals(await fetch())
+    assert signals, "synthetic candles produced no signals (the run would time the emergency fallback)"
+
+    lines = []
+    lines.append(f"generate_signals on the synthetic candles: {len(signals)} signals\n")
+    lines.append(f"{'clicks':>6} | {'mode':>10} | {'wall (ms)':>9} | {'fetches':>7} | {'builds':>6} | "
+          f"{'p50 (ms)':>8} | {'max (ms)':>8}")
+    lines.append("-" * 74)
+    for clicks in clicks_list:
+        fetch, _, counter = make_market(latency)
+        builds = {'count': 0}
+
+        async def per_click():
+            data = await fetch()
+            builds['count'] += 1
+            return build_plan(data)
+
+        wall, latencies, _ = await burst(clicks, per_click)
+        lines.append(f"{clicks:>6} | {'per click':>10} | {wall * 1000:>9.0f} | {counter['fetches']:>7} | "
+              f"{builds['count']:>6} | {latencies[len(latencies) // 2] * 1000:>8.1f} | {latencies[-1] * 1000:>8.1f}")
+
+        fetch, _, counter = make_market(latency)
+        cache = SignalPlanCache()
+        wall, latencies, plans = await burst(clicks, lambda: cache.get(fetch))
+        assert len({id(plan) for plan in plans}) == 1
+        lines.append(f"{clicks:>6} | {'plan cache':>10} | {wall * 1000:>9.0f} | {counter['fetches']:>7} | "
+              f"{cache.stats['builds']:>6} | {latencies[len(latencies) // 2] * 1000:>8.1f} | {latencies[-1] * 1000:>8.1f}")
+
+    fetch, advance, _ = make_market(latency)
+    cache = SignalPlanCache()
+    first = await cache.get(fetch)
+    same = await cache.get(fetch)
+    advance()
+    after = await cache.get(fetch)
+    assert after.signals, "no signals after the new candle"
+    lines.append(f"\nsame snapshot reused: {same is first}; new candle rebuilt: {after is not first} "
+          f"(stats {cache.stats})")
+    lines.append(f"plan output matches a direct build: {first.output == build_plan(await fetch())[1]}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared signal plan cache")
+    parser.add_argument('--clicks', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--latency', type=float, default=0.05, help="Fake market data fetch latency (s)")
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        lines = asyncio.run(run(args.clicks, args.latency))
+    print('\n'.join(lines))
+
+
+if __name__ == "__main__":
+    main()
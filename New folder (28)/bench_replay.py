@@ -0,0 +1,138 @@
+# bench_replay.py - Message handling throughput: replay a recorded WebSocket stream
+#
+# Usage: python bench_replay.py [--file frames.jsonl] [--symbols 11] [--minutes 240] [--save frames.jsonl]
+#
+# Feeds raw frames (one JSON message per line, as received from Binary.com) through
+# a MarketDataClient connection's reader and reports messages per second for every available JSON
+# decoder. Without --file, a stream shaped like a live session is synthesized:
+# a candle history response per symbol, then ohlc updates and ticks every few seconds.
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import numpy as np
+
+import market_client
+
+UPDATES_PER_MINUTE = 6  # ohlc updates per symbol per candle
+
+
+def synthesize(symbols: int, minutes: int, seed: int = 3) -> list:
+    """Raw frames for `symbols` streams over `minutes` minutes"""
+    rng = np.random.default_rng(seed)
+    names = [f"frxSYN{i:03d}" for i in range(symbols)]
+    start = 1700000000 - 1700000000 % 60
+    prices = {name: 1.1 for name in names}
+    frames = []
+
+    for req_id, name in enumerate(names, 1):
+        candles = []
+        for i in range(50):
+            price = prices[name] = prices[name] * (1 + rng.normal(0, 3e-4))
+            candles.append({'epoch': start - 60 * (50 - i), 'open': price, 'high': price * 1.0002,
+                            'low': price * 0.9998, 'close': price})
+        frames.append(json.dumps({
+            'candles': candles, 'echo_req': {'ticks_history': name, 'granularity': 60, 'style': 'candles',
+                                             'subscribe': 1, 'req_id': req_id},
+            'msg_type': 'candles', 'req_id': req_id, 'subscription': {'id': f"sub-{name}"}
+        }))
+
+    for minute in range(minutes):
+        open_time = start + 60 * minute
+        for step in range(UPDATES_PER_MINUTE):
+            epoch = open_time + step * (60 // UPDATES_PER_MINUTE)
+            for name in names:
+                price = prices[name] = prices[name] * (1 + rng.normal(0, 1e-4))
+                frames.append(json.dumps({
+                    'msg_type': 'ohlc', 'echo_req': {'ticks_history': name},
+                    'ohlc': {'symbol': name, 'open_time': open_time, 'epoch': epoch, 'granularity': 60,
+                             'open': f"{price:.5f}", 'high': f"{price * 1.0001:.5f}",
+                             'low': f"{price * 0.9999:.5f}", 'close': f"{price:.5f}"},
+                    'subscription': {'id': f"sub-{name}"}
+                }))
+                if step % 2 == 0:
+                    frames.append(json.dumps({
+                        'msg_type': 'tick', 'echo_req': {'ticks': name},
+                        'tick': {'symbol': name, 'epoch': epoch + 1, 'quote': round(price, 5)}
+                    }))
+    return frames
+
+
+def decoders() -> dict:
+    available = {'json': json.loads}
+    try:
+        import orjson
+        available['orjson'] = orjson.loads
+    except ImportError:
+        pass
+    try:
+        import msgspec
+        available['msgspec'] = msgspec.json.decode
+    except ImportError:
+        pass
+    return available
+
+
+class FrameSocket:
+    """Async iterator over recorded frames, standing in for a websockets connection"""
+
+    def __init__(self, frames: list):
+        self._frames = iter(frames)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._frames)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+async def _read_all(conn, frames: list) -> float:
+    started = time.perf_counter()
+    await conn._reader(FrameSocket(frames))
+    return time.perf_counter() - started
+
+
+def replay(frames: list, decode) -> tuple:
+    """Push every frame through a fresh client connection's reader; returns (messages/second, client)"""
+    market_client.decode_message = decode
+    client = market_client.MarketDataClient(pool_size=1)
+    elapsed = asyncio.run(_read_all(client._connections[0], frames))
+    return len(frames) / elapsed, client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a WebSocket message stream through the client's reader")
+    parser.add_argument('--file', help="JSONL file with one raw frame per line")
+    parser.add_argument('--symbols', type=int, default=11)
+    parser.add_argument('--minutes', type=int, default=240)
+    parser.add_argument('--save', help="Write the synthesized stream to this file")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file) as f:
+            frames = [line.rstrip('\n') for line in f if line.strip()]
+    else:
+        frames = synthesize(args.symbols, args.minutes)
+        if args.save:
+            with open(args.save, 'w') as f:
+                f.write('\n'.join(frames) + '\n')
+
+    print(f"Replaying {len(frames)} frames ({len(frames) and sum(map(len, frames)) // len(frames)} bytes avg)")
+    for name, decode in decoders().items():
+        rate, client = replay(frames, decode)
+        print(f"  {name:>8}: {rate:>10,.0f} msgs/sec  ({1e6 / rate:.1f} us/msg)")
+    stored = sum(len(store) for store in client._candle_stores.values())
+    print(f"Stores: {len(client._candle_stores)} symbols, {stored} candles")
+
+
+if __name__ == "__main__":
+    main()
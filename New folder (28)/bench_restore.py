@@ -0,0 +1,110 @@
+# bench_restore.py - Startup restore time: ResultTracker.restore_from_database on a large table
+#
+# Usage: python bench_restore.py [--history 100000] [--recent-batches 50] [--batch 30] [--runs 5]
+#
+# Fills a fresh database with --history completed signals created 2-30 days ago, plus
+# --recent-batches batches from the last hours (the newest ones still pending), then times
+# a cold ResultTracker restoring from it. The restore should stay well under 100 ms because
+# it only reads the recent window and pending rows through indexes.
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import pytz
+
+import result_tracker
+from database import Database, _INSERT_SIGNAL_SQL
+from db_writer import DatabaseWriter
+
+PAIRS = ["EURUSD", "GBPUSD", "USDJPY", "USDCHF", "AUDUSD", "USDCAD", "NZDUSD", "EURGBP", "EURJPY", "GBPJPY", "NZDCHF"]
+RESULT_SQL = "UPDATE signals SET status = 'completed', result = ?, mtg_count = ?, is_mtg = ?, completed_at = ? WHERE signal_id = ?"
+
+
+def fill(db: Database, history: int, recent_batches: int, batch_size: int, seed: int = 5):
+    rng = random.Random(seed)
+    utc6 = pytz.timezone('Asia/Dhaka')
+    now = datetime.now()
+    conn = db._connect()
+
+    def batch_rows(created: datetime, size: int):
+        batch_id = str(uuid.uuid4())
+        rows, ids = [], []
+        for i in range(size):
+            signal_id = str(uuid.uuid4())
+            timestamp = (created + timedelta(minutes=8 * (i + 1))).astimezone(utc6)
+            rows.append((signal_id, batch_id, 1, 1, PAIRS[i % len(PAIRS)], rng.choice(('CALL', 'PUT')),
+                         timestamp.strftime('%H:%M'), timestamp.isoformat(), 1.1, 'pending',
+                         created.isoformat(), None))
+            ids.append(signal_id)
+        conn.execute("INSERT OR IGNORE INTO batches (batch_id, user_id, chat_id, total_signals, created_at) "
+                     "VALUES (?, ?, ?, ?, ?)", (batch_id, 1, 1, size, created.isoformat()))
+        return rows, ids
+
+    def complete(ids: list, created: datetime):
+        conn.executemany(RESULT_SQL, [
+            (rng.choice(('win', 'loss')), rng.randint(0, 2), rng.randint(0, 1),
+             (created + timedelta(minutes=8 * (i + 2))).isoformat(), signal_id)
+            for i, signal_id in enumerate(ids)
+        ])
+
+    for start in range(0, history, batch_size):
+        created = now - timedelta(days=rng.uniform(2, 30))
+        rows, ids = batch_rows(created, min(batch_size, history - start))
+        conn.executemany(_INSERT_SIGNAL_SQL, rows)
+        complete(ids, created)
+
+    for b in range(recent_batches):
+        created = now - timedelta(hours=20 * (recent_batches - b) / recent_batches)
+        rows, ids = batch_rows(created, batch_size)
+        conn.executemany(_INSERT_SIGNAL_SQL, rows)
+        if b < recent_batches - 2:  # The two newest batches are still in flight
+            complete(ids, created)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ResultTracker startup restore")
+    parser.add_argument('--history', type=int, default=100000)
+    parser.add_argument('--recent-batches', type=int, default=50)
+    parser.add_argument('--batch', type=int, default=30)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_restore_"), "restore.db")
+    db = Database(path)
+    started = time.perf_counter()
+    fill(db, args.history, args.recent_batches, args.batch)
+    total = db._connect().execute("SELECT COUNT(*) FROM signals").fetchone()[0]
+    print(f"{total} signal rows ({args.history} historical) written in {time.perf_counter() - started:.1f}s")
+
+    plan = db._connect().execute(
+        "EXPLAIN QUERY PLAN SELECT signal_id FROM signals WHERE created_at >= ? "
+        "UNION ALL SELECT signal_id FROM signals WHERE status = 'pending' AND created_at < ?", ('', '')).fetchall()
+    print("Query plan: " + "; ".join(row[-1] for row in plan))
+
+    result_tracker.db_writer = DatabaseWriter(db)
+    samples = []
+    for _ in range(args.runs):
+        tracker = result_tracker.ResultTracker()
+        started = time.perf_counter()
+        restored = tracker.restore_from_database()
+        samples.append(time.perf_counter() - started)
+
+    print(f"Restored {restored} signals: {len(tracker.active_signals)} pending, "
+          f"{tracker.store.completed_count} completed, {len(tracker.signal_batches)} batches")
+    print(f"restore_from_database: min {min(samples) * 1000:.1f} ms | median {statistics.median(samples) * 1000:.1f} ms | "
+          f"max {max(samples) * 1000:.1f} ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
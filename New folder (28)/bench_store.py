@@ -0,0 +1,64 @@
+# bench_store.py - Batch statistics/formatting cost as the number of tracked signals grows
+#
+# Usage: python bench_store.py [--sizes 1000 10000 100000] [--batch 30] [--repeat 200]
+#
+# Fills a ResultTracker's SignalStore with --size completed signals in batches of --batch,
+# then times the per-batch calls the auto-result job makes every tick (check_batch_completed,
+# get_batch_statistics, format_batch_summary) on the newest batch. With the indexed store and
+# per-batch counters these stay flat as the total grows; the previous list scans grew linearly.
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from result_tracker import ResultTracker
+from signal_store import SignalRecord
+
+
+def fill(tracker: ResultTracker, total: int, batch_size: int) -> str:
+    now = datetime.now()
+    batch_id = None
+    for i in range(total):
+        if i % batch_size == 0:
+            batch_id = f"batch-{i // batch_size}"
+        timestamp = now + timedelta(minutes=i % batch_size)
+        tracker.store.add(SignalRecord(
+            signal_id=f"sig-{i}", pair="EURUSD", signal="CALL" if i % 2 else "PUT",
+            time=timestamp.strftime('%H:%M'), timestamp=timestamp, batch_id=batch_id, user_id=1, chat_id=1,
+            status='completed', result=(None if i % 11 == 0 else i % 3 != 0), verify_stage='done'
+        ))
+    return batch_id
+
+
+def timed(func, repeat: int) -> float:
+    """Average milliseconds per call"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-batch tracker calls against store size")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--batch', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'signals':>8} | {'check_batch_completed':>21} | {'get_batch_statistics':>20} | {'format_batch_summary':>20}")
+    print("-" * 80)
+    for size in args.sizes:
+        tracker = ResultTracker()
+        batch_id = fill(tracker, size, args.batch)
+        results = [timed(lambda: tracker.check_batch_completed(batch_id), args.repeat),
+                   timed(lambda: tracker.get_batch_statistics(batch_id), args.repeat),
+                   timed(lambda: tracker.format_batch_summary(batch_id), args.repeat)]
+        print(f"{size:>8} | {results[0]:>18.4f} ms | {results[1]:>17.4f} ms | {results[2]:>17.4f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# bench_sweep.py - Threshold sweep throughput against the number of worker processes
+#
+# Usage: python bench_sweep.py [--days 30] [--every 240] [--combos 64] [--workers 1 2 4 8]
+#
+# Builds --days of synthetic M1 candles (bench_backtest.synthesize), precomputes the sweep
+# arrays once, checks that the baseline combination reproduces backtest.run_backtest, then
+# times the same --combos random threshold combinations with each --workers count and
+# reports combinations per second and the speedup over one worker.
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import backtest
+import sweep
+from bench_backtest import synthesize
+
+GRID = ['SIGNAL_MIN_SCORE=10:18:1', 'SIGNAL_MIN_DIFF=3:8:1', 'SIGNAL_VERY_STRONG_SCORE=10:14:1',
+        'RSI_VERY_OVERSOLD=20:30:5', 'ADX_WEAK=20:30:5', 'ATR_TOO_LOW=0.1:0.2:0.05']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parallel threshold sweep")
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--every', type=int, default=240)
+    parser.add_argument('--window', type=int, default=50)
+    parser.add_argument('--combos', type=int, default=64)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    candles = {pair: columns for pair, columns in synthesize(args.days).items()}
+    started = time.perf_counter()
+    arrays = sweep.prepare(candles, args.every, args.window)
+    print(f"{sum(len(c[0]) for c in candles.values()):,} candles, {arrays['features'].shape[1]:,} snapshots: "
+          f"precomputed in {time.perf_counter() - started:.2f}s")
+
+    expected = backtest.run_backtest(candles, every=args.every, window=args.window)
+    baseline = sweep.run_combination({}, arrays)
+    keys = ('total_trades', 'direct_wins', 'mtg_wins', 'losses', 'unverified', 'clicks', 'skipped_slots')
+    differing = [key for key in keys if expected[key] != baseline[key]]
+    print(f"baseline vs run_backtest: {'identical' if not differing else 'DIFFERENT: ' + ', '.join(differing)}")
+
+    combos = sweep.combinations(sweep.parse_grid(GRID), args.combos, seed=1)
+    print(f"\n{'workers':>7} | {'seconds':>7} | {'combos/s':>8} | {'speedup':>7}")
+    print("-" * 40)
+    single = None
+    for workers in args.workers:
+        started = time.perf_counter()
+        sweep.sweep(arrays, combos, workers)
+        elapsed = time.perf_counter() - started
+        single = single or elapsed
+        print(f"{workers:>7} | {elapsed:>7.2f} | {len(combos) / elapsed:>8.1f} | {single / elapsed:>6.2f}x")
+    print(f"({os.cpu_count()} CPU cores available)")
+
+
+if __name__ == "__main__":
+    main()
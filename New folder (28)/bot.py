@@ -3,13 +3,12 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 from config import TELEGRAM_BOT_TOKEN
-from data_fetch import get_all_ohlc_data
-from signal_generator import generate_signals, format_signal_output
-from result_tracker import tracker
+from market_client import market_client
+from candle_archive import candle_archive
+from signal_plan import signal_plans
+from result_tracker import tracker, DB_AVAILABLE
 from datetime import datetime, timedelta
-import pytz
 import uuid
-import asyncio
 import traceback
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -39,6 +38,22 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif query.data == "show_results":
         await show_results_handler(query, context)
 
+async def _fetch_market_data() -> dict:
+    """Step 1 of a click: candles for all pairs ({} on failure)"""
+    print("\n[STEP 1] Fetching market data...")
+    ohlc_data = {}
+    try:
+        ohlc_data = await market_client.get_all_ohlc_data(50)
+    except Exception as e:
+        print(f"[ERROR] Data fetch exception: {e}")
+        import traceback
+        traceback.print_exc()
+    
+    print(f"[STEP 1 RESULT] Received data for {len(ohlc_data)} pairs")
+    if ohlc_data:
+        print(f"   Pairs: {list(ohlc_data.keys())[:5]}...")
+    return ohlc_data
+
 async def generate_signal_handler(query, context: ContextTypes.DEFAULT_TYPE):
     """Generate signals handler - GUARANTEED TO WORK"""
     keyboard = [
@@ -57,73 +72,16 @@ async def generate_signal_handler(query, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("⏳ Analyzing markets...", reply_markup=reply_markup)
         print("⏳ Analyzing markets...")
         
-        # Step 1: Get data
-        print("\n[STEP 1] Fetching market data...")
-        ohlc_data = {}
-        try:
-            loop = asyncio.get_event_loop()
-            ohlc_data = await loop.run_in_executor(None, get_all_ohlc_data, 50)
-        except Exception as e:
-            print(f"[ERROR] Data fetch exception: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        print(f"[STEP 1 RESULT] Received data for {len(ohlc_data)} pairs")
-        if ohlc_data:
-            print(f"   Pairs: {list(ohlc_data.keys())[:5]}...")
-        
-        # Step 2: Generate signals (ALWAYS generates signals)
-        print(f"\n[STEP 2] Generating signals...")
-        signals = []
-        
-        # ALWAYS generate signals - use data if available, otherwise use defaults
-        try:
-            signals = generate_signals(ohlc_data)  # This function ALWAYS returns signals
-        except Exception as e:
-            print(f"[ERROR] Signal generation exception: {e}")
-            import traceback
-            traceback.print_exc()
-            # Fallback: Generate default signals
-            from signal_generator import FOREX_PAIRS, format_time_utc6
-            utc6 = pytz.timezone('Asia/Dhaka')
-            now = datetime.now(utc6)
-            interval = 12
-            minute_offset = interval
-            
-            for i, pair in enumerate(FOREX_PAIRS[:10]):
-                signal_time = now + timedelta(minutes=minute_offset)
-                time_str = format_time_utc6(signal_time.hour, signal_time.minute)
-                signal = "CALL" if i % 2 == 0 else "PUT"
-                signals.append({
-                    'pair': pair,
-                    'time': time_str,
-                    'signal': signal,
-                    'timestamp': signal_time
-                })
-                minute_offset += interval
-        
-        print(f"[STEP 2 RESULT] Generated {len(signals)} signals")
-        
-        # This should never happen, but just in case
-        if not signals or len(signals) == 0:
-            print("[CRITICAL] No signals generated! Creating emergency signals...")
-            from signal_generator import FOREX_PAIRS, format_time_utc6
-            utc6 = pytz.timezone('Asia/Dhaka')
-            now = datetime.now(utc6)
-            for i, pair in enumerate(FOREX_PAIRS[:10]):
-                signal_time = now + timedelta(minutes=(i+1)*12)
-                time_str = format_time_utc6(signal_time.hour, signal_time.minute)
-                signals.append({
-                    'pair': pair,
-                    'time': time_str,
-                    'signal': "CALL" if i % 2 == 0 else "PUT",
-                    'timestamp': signal_time
-                })
+        # Steps 1-2: market data and signals, shared by every click with the same
+        # minute and candle snapshot (concurrent clicks wait for one computation)
+        plan = await signal_plans.get(_fetch_market_data)
+        signals = plan.signals_copy()
+        print(f"[STEP 2 RESULT] {len(signals)} signals (plan {plan.key[0]}, {signal_plans.stats})")
         
         # Step 3: Format and send
-        print(f"\n[STEP 3] Formatting {len(signals)} signals...")
+        print(f"\n[STEP 3] Sending {len(signals)} signals...")
         try:
-            signal_output = format_signal_output(signals, martingale=1)
+            signal_output = plan.output
             
             print("\n" + "="*60)
             print("📊 TELEGRAM OUTPUT:")
@@ -140,15 +98,9 @@ async def generate_signal_handler(query, context: ContextTypes.DEFAULT_TYPE):
             user_id = query.from_user.id if hasattr(query, 'from_user') and query.from_user else None
             chat_id = query.message.chat.id if hasattr(query, 'message') and query.message else None
             
-            # Get entry prices for all signals
-            from data_fetch import get_price
-            for sig in signals:
-                signal_id = str(uuid.uuid4())
-                # Get entry price at signal generation time
-                entry_price = get_price(sig.get('pair', ''))
-                if entry_price:
-                    sig['entry_price'] = entry_price
-                tracker.add_signal(signal_id, sig, batch_id=batch_id, user_id=user_id, chat_id=chat_id)
+            # Entry prices are the signal candles' opens, recorded when the tracker verifies them
+            batch_signals = {str(uuid.uuid4()): sig for sig in signals}
+            tracker.add_batch(batch_id, batch_signals, user_id=user_id, chat_id=chat_id)
             print(f"✅ Stored {len(signals)} signals in tracker (batch: {batch_id[:8]}...)\n")
             
             # Store batch info for automatic result sending
@@ -252,7 +204,7 @@ async def check_and_send_automatic_results(context: ContextTypes.DEFAULT_TYPE):
         
         # Send individual results for newly completed signals
         for signal in newly_completed:
-            batch_id = signal.get('batch_id')
+            batch_id = signal.batch_id
             if not batch_id:
                 continue
             
@@ -261,11 +213,11 @@ async def check_and_send_automatic_results(context: ContextTypes.DEFAULT_TYPE):
                 continue
             
             batch_info = tracker.signal_batches[batch_id]
-            chat_id = batch_info.get('chat_id')
+            chat_id = batch_info.chat_id
             if not chat_id:
                 continue
             
-            signal_id = signal.get('signal_id')
+            signal_id = signal.signal_id
             
             # Initialize storage
             if chat_id not in _batch_storage:
@@ -273,7 +225,7 @@ async def check_and_send_automatic_results(context: ContextTypes.DEFAULT_TYPE):
             if batch_id not in _batch_storage[chat_id]:
                 _batch_storage[chat_id][batch_id] = {
                     'individual_sent': set(),
-                    'summary_sent': False
+                    'summary_sent': batch_info.summary_sent  # Restored batches were already reported
                 }
             
             # Send individual result if not already sent
@@ -289,7 +241,7 @@ async def check_and_send_automatic_results(context: ContextTypes.DEFAULT_TYPE):
                     )
                     
                     _batch_storage[chat_id][batch_id]['individual_sent'].add(signal_id)
-                    print(f"[AUTO-RESULT] Sent individual result for {signal.get('pair')} to chat {chat_id}")
+                    print(f"[AUTO-RESULT] Sent individual result for {signal.pair} to chat {chat_id}")
                     
                 except Exception as e:
                     print(f"[ERROR] Failed to send individual result: {e}")
@@ -302,7 +254,7 @@ async def check_and_send_automatic_results(context: ContextTypes.DEFAULT_TYPE):
         
         # Send final summary for completed batches
         for batch_id, batch_info in completed_batches:
-            chat_id = batch_info.get('chat_id')
+            chat_id = batch_info.chat_id
             if not chat_id:
                 continue
             
@@ -312,7 +264,7 @@ async def check_and_send_automatic_results(context: ContextTypes.DEFAULT_TYPE):
             if batch_id not in _batch_storage[chat_id]:
                 _batch_storage[chat_id][batch_id] = {
                     'individual_sent': set(),
-                    'summary_sent': False
+                    'summary_sent': batch_info.summary_sent  # Restored batches were already reported
                 }
             
             # Check if we already sent summary for this batch
@@ -361,8 +313,32 @@ async def check_and_send_automatic_results(context: ContextTypes.DEFAULT_TYPE):
         traceback.print_exc()
 
 def main():
+    async def open_connections(application):
+        """
+        Connect the market data client up front, then restore in-flight batches: the
+        result tracker verifies through the client, so restored signals due at once
+        can fetch their candle history instead of failing before the client runs.
+        """
+        try:
+            await market_client.connect()
+        except Exception as e:
+            print(f"[WARNING] Market data not connected yet, retrying on demand: {e}")
+        
+        # Pick up in-flight batches from before a restart and resume their verification
+        restored = tracker.restore_from_database()
+        if restored:
+            print(f"[INFO] Restored {restored} signals from the database")
+    
+    async def close_connections(application):
+        """Close the market data WebSocket, flush queued archive and database writes and close the database"""
+        await market_client.close()
+        candle_archive.close()
+        if DB_AVAILABLE:
+            from db_writer import db_writer
+            db_writer.close()
+    
     # Build application with drop_pending_updates to avoid conflicts
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = Application.builder().token(TELEGRAM_BOT_TOKEN).post_init(open_connections).post_shutdown(close_connections).build()
     
     # Add error handler
     async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
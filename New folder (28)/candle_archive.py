@@ -0,0 +1,179 @@
+# candle_archive.py - Local M1 candle archive (price_history table or columnar .npy files)
+
+import atexit
+import threading
+import time
+import numpy as np
+from config import ARCHIVE_CANDLES, CANDLE_STORE, CANDLE_DIR
+from candle_files import NpyCandleFiles, CandleFileWriter
+from signal_generator import BINARY_SYMBOL_MAP
+from logger_config import logger
+
+try:
+    from db_writer import db_writer
+    DB_AVAILABLE = True
+except Exception as e:
+    logger.warning(f"Database not available for the candle archive: {e}")
+    db_writer = None
+    DB_AVAILABLE = False
+
+# binary symbol -> pair name used as the price_history key
+PAIR_FOR_SYMBOL = {symbol: pair for pair, symbol in BINARY_SYMBOL_MAP.items()}
+
+
+def rows_to_columns(rows: list):
+    """
+    Database.get_candles() rows as (epochs, opens, highs, lows, closes) NumPy columns.
+    Rows with missing prices are dropped. Returns None when no rows remain.
+    """
+    if not rows:
+        return None
+    data = np.asarray(rows, dtype=np.float64)
+    keep = ~np.isnan(data[:, 1:]).any(axis=1)
+    if not keep.all():
+        data = data[keep]
+    if not len(data):
+        return None
+    return (data[:, 0].astype(np.int64), data[:, 1].copy(), data[:, 2].copy(),
+            data[:, 3].copy(), data[:, 4].copy())
+
+
+class SQLiteCandles:
+    """Archive backend on price_history: upserts are queued on the write-behind writer"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, pair: str, columns) -> int:
+        self.writer.submit('upsert_candles', pair, *(col.tolist() for col in columns))
+        return len(columns[0])
+
+    def read(self, pair: str, start: int = None, end: int = None, limit: int = None):
+        return rows_to_columns(self.writer.database.get_candles(pair, start, end, limit))
+
+    def flush(self) -> bool:
+        return self.writer.flush()
+
+    def close(self):
+        """Nothing to do: the shared db_writer is closed with the database"""
+
+
+class CandleArchive:
+    """
+    Closed M1 candles received from the feed, persisted through a storage backend
+    (SQLiteCandles or candle_files.CandleFileWriter, both with write() / read() /
+    flush() / close(); writes are queued and applied off the event loop).
+
+    save() is called for every candle store a message touched and writes the
+    candles that closed since the last call as one bulk upsert (the newest candle
+    is still forming and is written once it closes).
+    load_seeds() / seed() fill empty stores from the archive after a restart, and
+    history_window() turns a ticks_history request into a request for just the
+    missing tail when the store already holds enough recent candles.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._archived = {}  # {binary_symbol: newest archived epoch}
+        self._seeded = set()  # Symbols already seeded (or found empty) in this process
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def save(self, store) -> int:
+        """Queue the store's candles that closed since the last save. Returns the number queued."""
+        if self.backend is None or store is None or len(store) < 2:
+            return 0
+        with self._lock:
+            columns = store.rows_after(self._archived.get(store.symbol, 0))
+            closed = len(columns[0]) - 1  # The newest candle is still forming
+            if closed <= 0:
+                return 0
+            self._archived[store.symbol] = int(columns[0][closed - 1])
+        return self.save_columns(store.symbol, tuple(col[:closed] for col in columns))
+
+    def save_columns(self, symbol: str, columns) -> int:
+        """Write closed (epochs, opens, highs, lows, closes) candles for a symbol as one upsert"""
+        if self.backend is None or columns is None or not len(columns[0]):
+            return 0
+        try:
+            return self.backend.write(PAIR_FOR_SYMBOL.get(symbol, symbol), columns)
+        except Exception as e:
+            logger.warning(f"Failed to archive candles for {symbol}: {e}")
+            return 0
+
+    def load(self, symbol: str, start: int = None, end: int = None, limit: int = None):
+        """
+        Archived candles as (epochs, opens, highs, lows, closes) NumPy columns, oldest first,
+        or None when nothing is stored. Accepts a binary symbol or a pair name.
+        """
+        if self.backend is None:
+            return None
+        return self.backend.read(PAIR_FOR_SYMBOL.get(symbol, symbol), start, end, limit)
+
+    def load_seeds(self, symbols: list, count: int) -> dict:
+        """
+        Newest `count` archived candles of every symbol not seeded yet in this process,
+        as {symbol: columns}. Only reads the backend, so it can run in a worker thread;
+        seed() then merges the columns into the stores.
+        """
+        if self.backend is None:
+            return {}
+        with self._lock:
+            symbols = [symbol for symbol in symbols if symbol not in self._seeded]
+            self._seeded.update(symbols)
+        seeds = {}
+        for symbol in symbols:
+            columns = self.load(symbol, limit=count)
+            if columns is not None:
+                seeds[symbol] = columns
+        return seeds
+
+    def seed(self, store, columns) -> int:
+        """Fill a store that is still empty with load_seeds() columns. Returns the number of candles loaded."""
+        if store is None or columns is None or len(store):
+            return 0
+        store.merge_columns(columns)
+        store.updated_at = None  # Archived candles are not live data (no cached prices, streams not hot)
+        with self._lock:
+            self._archived[store.symbol] = max(self._archived.get(store.symbol, 0), store.last_epoch)
+        logger.debug(f"Seeded {len(columns[0])} archived candles for {store.symbol}")
+        return len(columns[0])
+
+    def flush(self) -> bool:
+        """Wait until every queued archive write is stored. Returns False on timeout."""
+        return self.backend.flush() if self.backend is not None else True
+
+    def close(self):
+        """Store queued archive writes and stop the backend's writer"""
+        if self.backend is not None:
+            self.backend.close()
+
+    @staticmethod
+    def history_window(store, count: int) -> dict:
+        """
+        ticks_history range for a store: {"start": newest stored epoch} when the stored
+        candles plus the missing tail make up `count`, else {"count": count}.
+        The newest stored candle is re-fetched as it may have changed.
+        """
+        if store is not None and len(store):
+            missing = (int(time.time()) - store.last_epoch) // 60
+            if missing < count <= len(store) + missing:
+                return {"start": store.last_epoch}
+        return {"count": count}
+
+
+def _default_backend():
+    """Backend selected by ARCHIVE_CANDLES / CANDLE_STORE, or None when archiving is off"""
+    if not ARCHIVE_CANDLES:
+        return None
+    if CANDLE_STORE == 'npy':
+        return CandleFileWriter(NpyCandleFiles(CANDLE_DIR))
+    return SQLiteCandles(db_writer) if DB_AVAILABLE else None
+
+
+# Global archive on the configured backend
+candle_archive = CandleArchive(_default_backend())
+atexit.register(candle_archive.close)  # Last-chance flush if the process exits without the bot's shutdown hook
@@ -0,0 +1,215 @@
+# candle_files.py - Columnar on-disk M1 candle store with memory-mapped reads
+
+import os
+import queue
+import threading
+import numpy as np
+from constants import DB_WRITE_QUEUE_SIZE, DB_FLUSH_TIMEOUT
+from logger_config import logger
+
+DAY = 86400
+MINUTES_PER_DAY = 1440
+FILE_SHAPE = (4, MINUTES_PER_DAY)  # open/high/low/close rows, one column per minute of the UTC day
+
+
+_STOP = object()
+
+
+def _day_name(day: int) -> str:
+    return str(np.datetime64(day // DAY, 'D')) + '.npy'
+
+
+class NpyCandleFiles:
+    """
+    M1 candles in one <root>/<PAIR>/<YYYY-MM-DD>.npy file per pair and UTC day.
+
+    Each file holds a (4, 1440) float64 array: open/high/low/close rows indexed by the
+    minute of the day, NaN where no candle is stored. Because the position of a candle
+    follows from its epoch, a write is an in-place upsert into the memory-mapped day and
+    a read maps the day files and keeps the filled minutes - no row parsing, no sorting
+    and no epoch search. Same write()/read() interface as SQLiteCandles in candle_archive.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, pair: str, day: int) -> str:
+        return os.path.join(self.root, pair, _day_name(day))
+
+    def days(self, pair: str) -> np.ndarray:
+        """Sorted start epochs of the days with a file for this pair"""
+        try:
+            names = [name[:-4] for name in os.listdir(os.path.join(self.root, pair)) if name.endswith('.npy')]
+        except FileNotFoundError:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.array(names, dtype='datetime64[D]').astype(np.int64) * DAY)
+
+    def _open_day(self, pair: str, day: int):
+        """Writable memory map of a day file, created NaN-filled (atomically) when missing"""
+        path = self._path(pair, day)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            partial = path + '.tmp'
+            created = np.lib.format.open_memmap(partial, mode='w+', dtype=np.float64, shape=FILE_SHAPE)
+            created[:] = np.nan
+            created.flush()
+            del created
+            os.replace(partial, path)
+        return np.lib.format.open_memmap(path, mode='r+')
+
+    def write(self, pair: str, columns) -> int:
+        """
+        Upsert (epochs, opens, highs, lows, closes) candles; epochs must be whole minutes.
+        Returns the number of candles written.
+        """
+        epochs = np.asarray(columns[0], dtype=np.int64)
+        prices = np.vstack([np.asarray(col, dtype=np.float64) for col in columns[1:]])
+        on_grid = epochs % 60 == 0
+        if not on_grid.all():
+            logger.warning(f"Skipping {np.count_nonzero(~on_grid)} off-minute candles for {pair}")
+            epochs, prices = epochs[on_grid], prices[:, on_grid]
+        if not len(epochs):
+            return 0
+
+        days = epochs - epochs % DAY
+        try:
+            with self._lock:
+                for day in np.unique(days):
+                    in_day = days == day
+                    stored = self._open_day(pair, int(day))
+                    stored[:, (epochs[in_day] - day) // 60] = prices[:, in_day]
+                    stored.flush()
+                    del stored
+        except Exception as e:
+            logger.error(f"Error writing candle files for {pair}: {e}")
+            return 0
+        return len(epochs)
+
+    def _load_day(self, pair: str, day: int, start: int = None, end: int = None):
+        """(epochs, prices) of the filled minutes of one day file within [start, end], or None"""
+        path = self._path(pair, day)
+        try:
+            prices = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError) as e:
+            logger.warning(f"Skipping unreadable candle file {path}: {e}")
+            return None
+        filled = ~np.isnan(prices[3])
+        if start is not None and start > day:
+            filled[:(start - day + 59) // 60] = False
+        if end is not None and end < day + DAY - 60:
+            filled[(end - day) // 60 + 1:] = False
+        return day + np.flatnonzero(filled) * 60, prices[:, filled]
+
+    def read(self, pair: str, start: int = None, end: int = None, limit: int = None):
+        """
+        Stored candles as (epochs, opens, highs, lows, closes) columns, oldest first, or None.
+        start/end are inclusive epoch bounds; limit keeps only the newest `limit` candles.
+        """
+        days = self.days(pair)
+        if start is not None:
+            days = days[days >= start - start % DAY]
+        if end is not None:
+            days = days[days <= end]
+
+        parts, count = [], 0
+        for day in days[::-1]:  # Newest first, so a limit stops at the days it needs
+            part = self._load_day(pair, int(day), start, end)
+            if part is not None and len(part[0]):
+                parts.append(part)
+                count += len(part[0])
+                if limit is not None and count >= limit:
+                    break
+        if not parts:
+            return None
+
+        parts.reverse()
+        epochs = np.concatenate([part[0] for part in parts])
+        prices = np.concatenate([part[1] for part in parts], axis=1)
+        if limit is not None:
+            epochs, prices = epochs[-limit:], prices[:, -limit:]
+        return (epochs,) + tuple(prices)
+
+
+class CandleFileWriter:
+    """
+    Write-behind queue in front of NpyCandleFiles, the .npy counterpart of db_writer.
+
+    write() copies the candles and only enqueues them, so the memory-mapped upserts and
+    their flushes to disk never run on the event loop; one daemon thread applies them in
+    submission order. read() goes straight to the files and may miss writes still queued
+    (flush() first when that matters). When the queue is full, write() blocks until the
+    thread catches up rather than dropping candles.
+    """
+
+    def __init__(self, files: NpyCandleFiles, maxsize: int = DB_WRITE_QUEUE_SIZE):
+        self.files = files
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._progress = threading.Condition()
+        self._submitted = 0
+        self._completed = 0
+        self._closed = False
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="candle-file-writer", daemon=True)
+                    self._thread.start()
+
+    def write(self, pair: str, columns) -> int:
+        """Queue NpyCandleFiles.write(pair, columns); runs synchronously once the writer is closed"""
+        if self._closed:
+            return self.files.write(pair, columns)
+
+        # Copies: the columns may be views of a candle store that keeps changing
+        item = (pair, tuple(np.array(col) for col in columns))
+        self._ensure_thread()
+        with self._progress:
+            self._submitted += 1
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning(f"Candle file write queue full ({self._queue.maxsize}), waiting for the writer")
+            self._queue.put(item)
+        return len(item[1][0])
+
+    def _run(self):
+        """Writer thread: apply queued writes one by one"""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            try:
+                self.files.write(*item)
+            except Exception as e:
+                logger.error(f"Candle file writer failed to write {item[0]}: {e}")
+            with self._progress:
+                self._completed += 1
+                self._progress.notify_all()
+
+    def read(self, pair: str, start: int = None, end: int = None, limit: int = None):
+        return self.files.read(pair, start, end, limit)
+
+    def flush(self, timeout: float = DB_FLUSH_TIMEOUT) -> bool:
+        """Wait until every write queued so far is on disk. Returns False on timeout."""
+        with self._progress:
+            target = self._submitted
+            if self._completed >= target:
+                return True
+            if self._thread is None or not self._thread.is_alive():
+                self._ensure_thread()
+            return self._progress.wait_for(lambda: self._completed >= target, timeout=timeout)
+
+    def close(self, timeout: float = DB_FLUSH_TIMEOUT):
+        """Write out the queue and stop the writer thread; later writes run synchronously"""
+        if self._closed:
+            return
+        if not self.flush(timeout):
+            logger.error(f"Candle file writer: {self._queue.qsize()} writes still queued after {timeout}s")
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=timeout)
@@ -0,0 +1,298 @@
+# candle_store.py - Per-symbol NumPy candle buffer with zero-copy DataFrame views
+
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from constants import OHLC_MAX_CANDLES
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+
+def parse_candles(candles: list):
+    """
+    Convert a list of Binary.com candle dicts into sorted, de-duplicated NumPy columns.
+    Invalid candles (no epoch, missing/non-numeric prices, all-zero prices) are dropped.
+    Returns (epochs, opens, highs, lows, closes) or None if nothing valid remains.
+    """
+    epochs, opens, highs, lows, closes = [], [], [], [], []
+    for candle in candles:
+        if not isinstance(candle, dict):
+            continue
+        try:
+            epoch = int(candle.get('epoch') or 0)
+            open_val = float(candle.get('open') or 0)
+            high_val = float(candle.get('high') or 0)
+            low_val = float(candle.get('low') or 0)
+            close_val = float(candle.get('close') or 0)
+        except (TypeError, ValueError):
+            continue
+        if epoch == 0:
+            continue
+        if open_val == 0 and high_val == 0 and low_val == 0 and close_val == 0:
+            continue
+        epochs.append(epoch)
+        opens.append(open_val)
+        highs.append(high_val)
+        lows.append(low_val)
+        closes.append(close_val)
+
+    if not epochs:
+        return None
+
+    columns = (
+        np.asarray(epochs, dtype=np.int64),
+        np.asarray(opens, dtype=np.float64),
+        np.asarray(highs, dtype=np.float64),
+        np.asarray(lows, dtype=np.float64),
+        np.asarray(closes, dtype=np.float64),
+    )
+
+    epoch_arr = columns[0]
+    if len(epoch_arr) > 1 and not np.all(epoch_arr[1:] > epoch_arr[:-1]):
+        # Sort and keep the LAST occurrence of each epoch (newest data wins)
+        order = np.argsort(epoch_arr, kind='stable')
+        sorted_epochs = epoch_arr[order]
+        keep = np.append(sorted_epochs[1:] != sorted_epochs[:-1], True)
+        order = order[keep]
+        columns = tuple(col[order] for col in columns)
+
+    return columns
+
+
+class CandleStore:
+    """
+    Fixed-capacity candle buffer for a single symbol.
+
+    Candles live in NumPy columns (epoch/open/high/low/close) sorted by epoch.
+    The buffer is allocated at twice the capacity so appends are amortized O(1):
+    when the write position reaches the end, the live window is moved into a
+    freshly allocated buffer. Rows that have been handed out through
+    to_dataframe() are never modified in place, so returned DataFrames stay
+    valid while the store keeps receiving candles.
+    """
+
+    def __init__(self, symbol: str, capacity: int = OHLC_MAX_CANDLES):
+        self.symbol = symbol
+        self.capacity = capacity
+        self.updated_at = None  # datetime of the last successful merge
+        self.version = 0  # Incremented on every change
+        self.revision = 0  # Incremented when stored history is rewritten (out-of-order merge)
+        self._allocate(0)
+        self._start = 0
+        self._end = 0
+
+    def _allocate(self, keep: int):
+        """Move the newest `keep` rows into new buffers (old views stay valid)"""
+        size = self.capacity * 2
+        new_columns = [np.zeros(size, dtype=np.int64)] + [np.zeros(size, dtype=np.float64) for _ in PRICE_COLUMNS]
+        if keep:
+            for new_col, old_col in zip(new_columns, self._columns):
+                new_col[:keep] = old_col[self._end - keep:self._end]
+        self._columns = new_columns
+        self._start = 0
+        self._end = keep
+        self._exported_end = 0  # Rows below this index may be referenced by DataFrames
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def last_epoch(self) -> int:
+        return int(self._columns[0][self._end - 1]) if len(self) else 0
+
+    @property
+    def last_close(self) -> float:
+        return float(self._columns[4][self._end - 1]) if len(self) else 0.0
+
+    @property
+    def last_row(self) -> tuple:
+        """(epoch, open, high, low, close) of the newest candle, or None when empty"""
+        if not len(self):
+            return None
+        return tuple(col[self._end - 1].item() for col in self._columns)
+
+    def index_of(self, epoch: int, granularity: int = 60) -> int:
+        """
+        Buffer row holding `epoch`, or -1.
+        O(1) on a gap-free candle grid: the row is computed from the distance to the
+        newest candle. Falls back to a binary search when candles are missing.
+        """
+        if not len(self):
+            return -1
+        epoch_col = self._columns[0]
+        last = int(epoch_col[self._end - 1])
+        if epoch > last:
+            return -1
+        idx = self._end - 1 - (last - epoch) // granularity
+        if self._start <= idx and int(epoch_col[idx]) == epoch:
+            return idx
+        idx = self._start + int(np.searchsorted(epoch_col[self._start:self._end], epoch))
+        return idx if idx < self._end and int(epoch_col[idx]) == epoch else -1
+
+    def has_epoch(self, epoch: int) -> bool:
+        """Check whether a candle with this epoch is stored"""
+        return self.index_of(epoch) >= 0
+
+    def rows_after(self, epoch: int):
+        """(epochs, opens, highs, lows, closes) views of the candles newer than `epoch`"""
+        epochs = self._columns[0][self._start:self._end]
+        idx = self._start + int(np.searchsorted(epochs, epoch, side='right'))
+        return tuple(col[idx:self._end] for col in self._columns)
+
+    def _append(self, columns):
+        """Append rows that are strictly newer than the current last epoch"""
+        n = len(columns[0])
+        if n >= self.capacity:
+            columns = tuple(col[-self.capacity:] for col in columns)
+            n = self.capacity
+            self._allocate(0)
+        elif self._end + n > len(self._columns[0]):
+            self._allocate(min(len(self), self.capacity - n))
+
+        for buf, col in zip(self._columns, columns):
+            buf[self._end:self._end + n] = col
+        self._end += n
+        self._start = max(self._start, self._end - self.capacity)
+
+    def _append_row(self, row):
+        """Append one row that is strictly newer than the current last epoch"""
+        if self._end >= len(self._columns[0]):
+            self._allocate(min(len(self), self.capacity - 1))
+        for buf, value in zip(self._columns, row):
+            buf[self._end] = value
+        self._end += 1
+        self._start = max(self._start, self._end - self.capacity)
+
+    def _overwrite_last(self, row):
+        """Replace the newest candle (in-progress candle update)"""
+        idx = self._end - 1
+        if idx < self._exported_end:
+            # Row is visible through an exported DataFrame - copy before writing
+            self._allocate(len(self))
+            idx = self._end - 1
+        for buf, value in zip(self._columns, row):
+            buf[idx] = value
+
+    def _rebuild(self, columns):
+        """Slow path: merge out-of-order candles into the existing window"""
+        existing = tuple(buf[self._start:self._end] for buf in self._columns)
+        merged = tuple(np.concatenate((old, new)) for old, new in zip(existing, columns))
+        # Reverse so np.unique keeps the incoming value for duplicate epochs
+        reversed_epochs = merged[0][::-1]
+        _, first_idx = np.unique(reversed_epochs, return_index=True)
+        order = (len(reversed_epochs) - 1 - first_idx)
+        merged = tuple(col[order] for col in merged)
+        self._allocate(0)
+        self._append(merged)
+        self.revision += 1
+
+    def merge(self, candles: list) -> int:
+        """
+        Merge Binary.com candle dicts into the store by epoch.
+        Newer candles are appended, a candle with the current last epoch replaces it,
+        and older/out-of-order candles trigger a full re-merge.
+        Returns the number of candles accepted.
+        """
+        columns = parse_candles(candles)
+        if columns is None:
+            return 0
+        return self.merge_columns(columns)
+
+    def merge_columns(self, columns) -> int:
+        """Merge pre-parsed (epochs, opens, highs, lows, closes) arrays sorted by epoch"""
+        epochs = columns[0]
+        count = len(epochs)
+        if count == 0:
+            return 0
+
+        last = self.last_epoch
+        first_new = int(epochs[0])
+
+        if not len(self) or first_new > last:
+            self._append(columns)
+        elif first_new == last and (count == 1 or int(epochs[1]) > last):
+            self._overwrite_last(tuple(col[0] for col in columns))
+            if count > 1:
+                self._append(tuple(col[1:] for col in columns))
+        else:
+            self._rebuild(columns)
+
+        self.version += 1
+        self.updated_at = datetime.now()
+        return count
+
+    def merge_row(self, epoch, open_val, high_val, low_val, close_val) -> bool:
+        """
+        Merge a single candle (streamed ohlc update) without building arrays.
+        Same validation and replace-by-epoch rules as merge().
+        """
+        try:
+            row = (int(epoch or 0), float(open_val or 0), float(high_val or 0),
+                   float(low_val or 0), float(close_val or 0))
+        except (TypeError, ValueError):
+            return False
+        if row[0] == 0 or not any(row[1:]):
+            return False
+
+        last = self.last_epoch
+        if not len(self) or row[0] > last:
+            self._append_row(row)
+        elif row[0] == last:
+            self._overwrite_last(row)
+        else:
+            return self.merge_columns(tuple(np.array([value]) for value in row)) > 0
+
+        self.version += 1
+        self.updated_at = datetime.now()
+        return True
+
+    def apply_tick(self, epoch: int, price: float, granularity: int = 60) -> bool:
+        """
+        Fold a tick into the candle of its `granularity` bucket.
+        Updates high/low/close of the current candle or opens a new one.
+        Ticks older than the current candle are ignored.
+        """
+        epoch = int(epoch or 0)
+        price = float(price or 0)
+        if epoch == 0 or price == 0:
+            return False
+
+        bucket = epoch - epoch % granularity
+        last = self.last_epoch
+        if len(self) and bucket < last:
+            return False
+
+        if len(self) and bucket == last:
+            idx = self._end - 1
+            row = (
+                bucket,
+                self._columns[1][idx],
+                max(self._columns[2][idx], price),
+                min(self._columns[3][idx], price),
+                price,
+            )
+            self._overwrite_last(row)
+        else:
+            self._append_row((bucket, price, price, price, price))
+
+        self.version += 1
+        self.updated_at = datetime.now()
+        return True
+
+    def to_dataframe(self, count: int = None) -> pd.DataFrame:
+        """
+        Return the newest `count` candles as a DataFrame backed by the store's arrays.
+        Columns: timestamp (datetime64[s]), open, high, low, close.
+        """
+        start = self._start if count is None else max(self._start, self._end - count)
+        end = self._end
+        self._exported_end = max(self._exported_end, end)
+
+        epoch_col, open_col, high_col, low_col, close_col = self._columns
+        return pd.DataFrame({
+            'timestamp': epoch_col[start:end].view('datetime64[s]'),
+            'open': open_col[start:end],
+            'high': high_col[start:end],
+            'low': low_col[start:end],
+            'close': close_col[start:end],
+        }, copy=False)
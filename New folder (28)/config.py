@@ -17,9 +17,21 @@ if not TELEGRAM_BOT_TOKEN:
 TELEGRAM_API_ID = os.getenv("TELEGRAM_API_ID")
 TELEGRAM_API_HASH = os.getenv("TELEGRAM_API_HASH")
 
-# Binary.com WebSocket URL
+# Binary.com WebSocket URL (use ws://127.0.0.1:8765 with `python replay_server.py serve` to run offline)
 BINARY_WS_URL = os.getenv("BINARY_WS_URL", "wss://ws.binaryws.com/websockets/v3?app_id=1089")
 
+# Keep persistent candle subscriptions open instead of polling ticks_history per request
+STREAM_CANDLES = os.getenv("STREAM_CANDLES", "true").lower() in ("1", "true", "yes")
+
+# Number of WebSocket connections in the market_client pool; symbols are sharded across them
+WS_POOL_SIZE = max(1, int(os.getenv("WS_POOL_SIZE", "1")))
+
+# Archive closed candles and seed candle stores from them on startup
+ARCHIVE_CANDLES = os.getenv("ARCHIVE_CANDLES", "true").lower() in ("1", "true", "yes")
+# Archive backend: "sqlite" (price_history table) or "npy" (per-pair, per-day files under CANDLE_DIR)
+CANDLE_STORE = os.getenv("CANDLE_STORE", "sqlite").lower()
+CANDLE_DIR = os.getenv("CANDLE_DIR", "candles")
+
 # Database settings
 DATABASE_PATH = os.getenv("DATABASE_PATH", "forex_bot.db")
 
@@ -4,6 +4,12 @@
 SIGNAL_MIN_SCORE = 15  # Minimum score required for 90%+ accuracy
 SIGNAL_MIN_DIFF = 6    # Minimum difference between call/put scores
 SIGNAL_MIN_STRONG_INDICATORS = 5  # Minimum strong indicators required
+SIGNAL_VERY_STRONG_SCORE = 12
+SIGNAL_VERY_STRONG_DIFF = 5
+SIGNAL_VERY_STRONG_INDICATORS = 4
+SIGNAL_STRONG_SCORE = 10
+SIGNAL_STRONG_DIFF = 4
+SIGNAL_STRONG_INDICATORS = 3
 
 # RSI Thresholds
 RSI_VERY_OVERSOLD = 25
@@ -14,6 +20,7 @@ RSI_OVERBOUGHT = 70
 # EMA Thresholds
 EMA_DIFF_VERY_STRONG = 0.15
 EMA_DIFF_STRONG = 0.08
+EMA_DIFF_CONFIRM = 0.1  # Counts as a strong-indicator confirmation
 
 # SMA Thresholds
 SMA_DIFF_EXTREMELY_STRONG = 0.2
@@ -57,24 +64,27 @@ ATR_LOW = 0.2
 
 # Trend Confirmation Thresholds
 TREND_5_EXTREMELY_STRONG = 0.15
-TREND_3_VERY_STRONG = 0.1
-TREND_3_STRONG = 0.15
+TREND_3_VERY_STRONG = 0.15
+TREND_3_STRONG = 0.1
 
 # Signal Generation Settings
 TARGET_SIGNALS = 30
 SIGNAL_INTERVAL_MINUTES = 8
 DATA_FETCH_TIMEOUT = 20  # seconds
-DATA_FETCH_WAIT_INTERVAL = 0.5  # seconds
 
 # WebSocket Settings
 WS_CONNECTION_TIMEOUT = 15  # seconds
-WS_STABILIZE_DELAY = 2  # seconds
-WS_REQUEST_DELAY = 0.1  # seconds between requests
+# Deriv/Binary API general request limit is 180 per minute (website_status api_call_limits).
+# Send up to WS_RATE_LIMIT_BURST back to back, then refill so any 60s window stays under the limit.
+WS_RATE_LIMIT_PER_MINUTE = 180
+WS_RATE_LIMIT_BURST = 120
+STREAM_STALE_AFTER = 120  # seconds without a candle update before a stream is considered cold
 
 # Result Verification Settings
-FIRST_CANDLE_WAIT = 0.5  # seconds
-SECOND_CANDLE_WAIT = 65  # seconds (1 minute + 5 seconds buffer)
-VERIFICATION_TIMEOUT = 120  # seconds
+FIRST_CANDLE_WAIT = 2  # seconds after a candle closes before reading it from candle history
+VERIFY_RETRY_DELAY = 5  # seconds between retries when a price is unavailable
+VERIFICATION_TIMEOUT = 120  # seconds before an unverifiable signal is marked unknown
+VERIFY_FETCH_TIMEOUT = 8  # seconds to wait for one verification round of candle history
 
 # News Filter Settings
 NEWS_BUFFER_MINUTES = 15
@@ -83,12 +93,20 @@ NEWS_FILTER_MAX_ATTEMPTS = 5
 # Data Settings
 OHLC_DEFAULT_SIZE = 50
 OHLC_MAX_CANDLES = 200
-PRICE_FETCH_TIMEOUT = 0.8  # seconds
 
 # Memory Management
 SIGNAL_CLEANUP_HOURS = 24
+INDICATOR_CACHE_SIZE = 256  # (symbol, candle snapshot) signal results kept in the LRU cache
 BATCH_CLEANUP_HOURS = 24
 
+# Database Settings
+DB_CACHE_SIZE_KB = 16384  # SQLite page cache per connection
+DB_BUSY_TIMEOUT_MS = 5000  # wait this long for a competing writer's lock
+DB_STATEMENT_CACHE = 64  # prepared statements kept per connection
+DB_WRITE_QUEUE_SIZE = 10000  # pending write-behind operations before callers block
+DB_WRITE_GROUP_MAX = 500  # writes coalesced into one commit
+DB_FLUSH_TIMEOUT = 10  # seconds to wait for queued writes on shutdown
+
 # Error Handling
 ERROR_RESULT_UNKNOWN = None  # Don't default to WIN on errors
 MAX_RETRY_ATTEMPTS = 3
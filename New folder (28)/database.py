@@ -2,22 +2,102 @@
 
 import sqlite3
 import json
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict
 import pytz
 from logger_config import logger
+from constants import DB_CACHE_SIZE_KB, DB_BUSY_TIMEOUT_MS, DB_STATEMENT_CACHE
+
+_INSERT_SIGNAL_SQL = '''
+    INSERT OR REPLACE INTO signals 
+    (signal_id, batch_id, user_id, chat_id, pair, signal_type, signal_time, 
+     timestamp, entry_price, status, created_at, confidence_score)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_INSERT_BATCH_SQL = '''
+    INSERT OR IGNORE INTO batches 
+    (batch_id, user_id, chat_id, created_at)
+    VALUES (?, ?, ?, ?)
+'''
+
+_COUNT_BATCH_SIGNALS_SQL = '''
+    UPDATE batches 
+    SET total_signals = total_signals + ?
+    WHERE batch_id = ?
+'''
+
+# Candle times are stored as UTC ISO text ('2024-01-31T13:05:00'); SQLite converts the epochs
+_UPSERT_CANDLE_SQL = '''
+    INSERT INTO price_history 
+    (pair, timestamp, open, high, low, close, created_at)
+    VALUES (?, strftime('%Y-%m-%dT%H:%M:%S', ?, 'unixepoch'), ?, ?, ?, ?, ?)
+    ON CONFLICT(pair, timestamp) DO UPDATE SET
+        open = excluded.open, high = excluded.high, low = excluded.low, close = excluded.close
+'''
+
+_RESTORE_COLUMNS = (
+    'signal_id, batch_id, user_id, chat_id, pair, signal_type, signal_time, timestamp, '
+    'entry_price, status, created_at, completed_at, result, mtg_count, is_mtg, confidence_score'
+)
 
 class Database:
-    """SQLite database for persisting signals, results, and statistics"""
+    """
+    SQLite database for persisting signals, results, and statistics.
+    
+    Each thread keeps one long-lived connection (WAL journal, synchronous=NORMAL,
+    larger page cache), so writes skip the open/close and per-commit fsync cost
+    and repeated statements are served from the connection's statement cache.
+    """
     
     def __init__(self, db_path: str = "forex_bot.db"):
         self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []  # Every connection opened, for close()
+        self._connections_lock = threading.Lock()
         self._init_database()
         logger.info(f"Database initialized: {db_path}")
     
+    def _connect(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening and tuning it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # check_same_thread=False only so close() can run from the shutdown thread
+            conn = sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT_MS / 1000,
+                                   cached_statements=DB_STATEMENT_CACHE, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')  # WAL + NORMAL: durable across app crashes, no fsync per commit
+            conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _rollback(self):
+        """Discard the calling thread's open transaction after a failed write"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+    
+    def close(self):
+        """Close every thread's connection (checkpoints the WAL)"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"Error closing database connection: {e}")
+        self._local = threading.local()
+    
     def _init_database(self):
         """Initialize database tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Signals table
@@ -95,71 +175,98 @@ class Database:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_signals_batch ON signals(batch_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_signals_status ON signals(status)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_signals_timestamp ON signals(timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_signals_created ON signals(created_at)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_batches_created ON batches(created_at)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_statistics_date ON statistics(date, hour)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_price_history_pair_time ON price_history(pair, timestamp)')
         
         conn.commit()
-        conn.close()
+    
+    @staticmethod
+    def _signal_row(signal_id: str, signal_dict: dict, batch_id: str, user_id: int, chat_id: int,
+                    created_at: str) -> tuple:
+        """Parameters for _INSERT_SIGNAL_SQL"""
+        timestamp_str = signal_dict.get('timestamp')
+        if isinstance(timestamp_str, datetime):
+            timestamp_str = timestamp_str.isoformat()
+        
+        return (
+            signal_id,
+            batch_id,
+            user_id,
+            chat_id,
+            signal_dict.get('pair'),
+            signal_dict.get('signal'),
+            signal_dict.get('time'),
+            timestamp_str,
+            signal_dict.get('entry_price'),
+            'pending',
+            created_at,
+            signal_dict.get('confidence_score')
+        )
     
     def add_signal(self, signal_id: str, signal_dict: dict, batch_id: str = None, 
-                   user_id: int = None, chat_id: int = None):
-        """Add a new signal to database"""
+                   user_id: int = None, chat_id: int = None, commit: bool = True):
+        """Add a new signal to database (commit=False leaves the transaction to write_many)"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
+            now = datetime.now().isoformat()
             
-            timestamp_str = signal_dict.get('timestamp')
-            if isinstance(timestamp_str, datetime):
-                timestamp_str = timestamp_str.isoformat()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO signals 
-                (signal_id, batch_id, user_id, chat_id, pair, signal_type, signal_time, 
-                 timestamp, entry_price, status, created_at, confidence_score)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                signal_id,
-                batch_id,
-                user_id,
-                chat_id,
-                signal_dict.get('pair'),
-                signal_dict.get('signal'),
-                signal_dict.get('time'),
-                timestamp_str,
-                signal_dict.get('entry_price'),
-                'pending',
-                datetime.now().isoformat(),
-                signal_dict.get('confidence_score')
-            ))
+            cursor.execute(_INSERT_SIGNAL_SQL, self._signal_row(signal_id, signal_dict, batch_id, user_id, chat_id, now))
             
             # Update batch
             if batch_id:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO batches 
-                    (batch_id, user_id, chat_id, created_at)
-                    VALUES (?, ?, ?, ?)
-                ''', (batch_id, user_id, chat_id, datetime.now().isoformat()))
-                
-                cursor.execute('''
-                    UPDATE batches 
-                    SET total_signals = total_signals + 1
-                    WHERE batch_id = ?
-                ''', (batch_id,))
+                cursor.execute(_INSERT_BATCH_SQL, (batch_id, user_id, chat_id, now))
+                cursor.execute(_COUNT_BATCH_SIGNALS_SQL, (1, batch_id))
             
-            conn.commit()
-            conn.close()
+            if commit:
+                conn.commit()
             logger.debug(f"Signal added to database: {signal_id}")
             
         except Exception as e:
+            if commit:
+                self._rollback()
             logger.error(f"Error adding signal to database: {e}")
             raise
     
-    def update_signal_result(self, signal_id: str, result: bool, mtg_count: int = 0, 
-                            is_mtg: bool = False):
-        """Update signal with result"""
+    def add_signals_bulk(self, batch_id: str, signals: dict, user_id: int = None, chat_id: int = None,
+                         commit: bool = True):
+        """
+        Add a batch of signals ({signal_id: signal_dict}) in one transaction:
+        the batch row is written once and all signals go through executemany.
+        """
+        if not signals:
+            return
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
+            cursor = conn.cursor()
+            now = datetime.now().isoformat()
+            
+            cursor.executemany(_INSERT_SIGNAL_SQL, [
+                self._signal_row(signal_id, signal_dict, batch_id, user_id, chat_id, now)
+                for signal_id, signal_dict in signals.items()
+            ])
+            
+            if batch_id:
+                cursor.execute(_INSERT_BATCH_SQL, (batch_id, user_id, chat_id, now))
+                cursor.execute(_COUNT_BATCH_SIGNALS_SQL, (len(signals), batch_id))
+            
+            if commit:
+                conn.commit()
+            logger.debug(f"{len(signals)} signals added to database (batch: {batch_id})")
+            
+        except Exception as e:
+            if commit:
+                self._rollback()
+            logger.error(f"Error adding signal batch to database: {e}")
+            raise
+    
+    def update_signal_result(self, signal_id: str, result: Optional[bool], mtg_count: int = 0, 
+                            is_mtg: bool = False, commit: bool = True, entry_price: Optional[float] = None):
+        """Update signal with result (None = could not be verified) and the verified entry price, if known"""
+        try:
+            conn = self._connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -168,13 +275,15 @@ class Database:
                     result = ?,
                     mtg_count = ?,
                     is_mtg = ?,
-                    completed_at = ?
+                    completed_at = ?,
+                    entry_price = COALESCE(?, entry_price)
                 WHERE signal_id = ?
             ''', (
-                'win' if result else 'loss',
+                None if result is None else ('win' if result else 'loss'),
                 mtg_count,
                 1 if is_mtg else 0,
                 datetime.now().isoformat(),
+                entry_price,
                 signal_id
             ))
             
@@ -183,7 +292,13 @@ class Database:
             row = cursor.fetchone()
             if row and row[0]:
                 batch_id = row[0]
-                if result:
+                if result is None:
+                    cursor.execute('''
+                        UPDATE batches 
+                        SET completed_signals = completed_signals + 1
+                        WHERE batch_id = ?
+                    ''', (batch_id,))
+                elif result:
                     cursor.execute('''
                         UPDATE batches 
                         SET wins = wins + 1, completed_signals = completed_signals + 1
@@ -203,20 +318,68 @@ class Database:
                     WHERE batch_id = ?
                 ''', (batch_id,))
             
-            conn.commit()
-            conn.close()
-            logger.debug(f"Signal result updated: {signal_id} = {'WIN' if result else 'LOSS'}")
+            if commit:
+                conn.commit()
+            logger.debug(f"Signal result updated: {signal_id} = {'UNKNOWN' if result is None else ('WIN' if result else 'LOSS')}")
             
         except Exception as e:
+            if commit:
+                self._rollback()
             logger.error(f"Error updating signal result: {e}")
             raise
     
+    def upsert_candles(self, pair: str, epochs: list, opens: list, highs: list, lows: list, closes: list,
+                       commit: bool = True):
+        """Insert or refresh M1 candles for a pair in price_history with one executemany"""
+        if not epochs:
+            return
+        try:
+            conn = self._connect()
+            now = datetime.now().isoformat()
+            conn.executemany(_UPSERT_CANDLE_SQL, [
+                (pair, epoch, open_val, high_val, low_val, close_val, now)
+                for epoch, open_val, high_val, low_val, close_val in zip(epochs, opens, highs, lows, closes)
+            ])
+            
+            if commit:
+                conn.commit()
+            logger.debug(f"{len(epochs)} candles archived for {pair}")
+            
+        except Exception as e:
+            if commit:
+                self._rollback()
+            logger.error(f"Error archiving candles for {pair}: {e}")
+            raise
+    
+    def write_many(self, operations: list) -> int:
+        """
+        Apply [(method_name, args, kwargs)] writes in one transaction (group commit).
+        If the group fails it is rolled back and every write is retried on its own,
+        so one bad row does not discard the rest. Returns the number of failed writes.
+        """
+        if len(operations) > 1:
+            try:
+                for name, args, kwargs in operations:
+                    getattr(self, name)(*args, commit=False, **kwargs)
+                self._connect().commit()
+                return 0
+            except Exception as e:
+                self._rollback()
+                logger.warning(f"Group commit of {len(operations)} writes failed ({e}), retrying one by one")
+        
+        failed = 0
+        for name, args, kwargs in operations:
+            try:
+                getattr(self, name)(*args, **kwargs)
+            except Exception:
+                failed += 1
+        return failed
+    
     def get_pending_signals(self) -> List[Dict]:
         """Get all pending signals"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            cursor = self._connect().cursor()
+            cursor.row_factory = sqlite3.Row
             
             cursor.execute('''
                 SELECT * FROM signals 
@@ -226,20 +389,39 @@ class Database:
             
             rows = cursor.fetchall()
             signals = [dict(row) for row in rows]
-            
-            conn.close()
             return signals
             
         except Exception as e:
             logger.error(f"Error getting pending signals: {e}")
             return []
     
+    def get_recent_signals(self, since: datetime) -> List[Dict]:
+        """
+        Signals created since `since` plus older ones still pending, oldest first.
+        One statement, two index range scans (idx_signals_created, idx_signals_status),
+        so startup cost follows the recent window, not the size of the table.
+        """
+        try:
+            cursor = self._connect().cursor()
+            cursor.execute(f'''
+                SELECT {_RESTORE_COLUMNS} FROM signals WHERE created_at >= ?
+                UNION ALL
+                SELECT {_RESTORE_COLUMNS} FROM signals WHERE status = 'pending' AND created_at < ?
+                ORDER BY created_at ASC
+            ''', (since.isoformat(), since.isoformat()))
+            
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            logger.error(f"Error loading recent signals: {e}")
+            return []
+    
     def get_batch_signals(self, batch_id: str) -> List[Dict]:
         """Get all signals for a batch"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            cursor = self._connect().cursor()
+            cursor.row_factory = sqlite3.Row
             
             cursor.execute('''
                 SELECT * FROM signals 
@@ -249,27 +431,55 @@ class Database:
             
             rows = cursor.fetchall()
             signals = [dict(row) for row in rows]
-            
-            conn.close()
             return signals
             
         except Exception as e:
             logger.error(f"Error getting batch signals: {e}")
             return []
     
+    def get_candles(self, pair: str, start: int = None, end: int = None, limit: int = None) -> List[tuple]:
+        """
+        Archived M1 candles of a pair as (epoch, open, high, low, close) rows, oldest first.
+        start/end are inclusive epoch bounds; limit keeps only the newest `limit` candles.
+        Served by the (pair, timestamp) index.
+        """
+        def as_text(epoch):
+            return datetime.fromtimestamp(int(epoch), timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+        
+        try:
+            cursor = self._connect().cursor()
+            cursor.execute('''
+                SELECT CAST(strftime('%s', timestamp) AS INTEGER), open, high, low, close
+                FROM price_history
+                WHERE pair = ? AND timestamp >= ? AND timestamp <= ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            ''', (
+                pair,
+                as_text(start) if start is not None else '',
+                as_text(end) if end is not None else '9999',
+                limit if limit is not None else -1
+            ))
+            
+            rows = cursor.fetchall()
+            rows.reverse()
+            return rows
+            
+        except Exception as e:
+            logger.error(f"Error loading candles for {pair}: {e}")
+            return []
+    
     def get_batch_statistics(self, batch_id: str) -> Optional[Dict]:
         """Get statistics for a batch"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            cursor = self._connect().cursor()
+            cursor.row_factory = sqlite3.Row
             
             cursor.execute('''
                 SELECT * FROM batches WHERE batch_id = ?
             ''', (batch_id,))
             
             row = cursor.fetchone()
-            conn.close()
             
             if row:
                 return dict(row)
@@ -282,7 +492,7 @@ class Database:
     def cleanup_old_data(self, days: int = 7):
         """Clean up data older than specified days"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
@@ -301,11 +511,11 @@ class Database:
             deleted_prices = cursor.rowcount
             
             conn.commit()
-            conn.close()
             
             logger.info(f"Cleaned up: {deleted_signals} signals, {deleted_batches} batches, {deleted_prices} price records")
             
         except Exception as e:
+            self._rollback()
             logger.error(f"Error cleaning up old data: {e}")
 
 # Global database instance
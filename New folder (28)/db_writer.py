@@ -0,0 +1,170 @@
+# db_writer.py - Write-behind persistence: one writer thread, bounded queue, group commits
+
+import atexit
+import queue
+import threading
+import time
+from database import db
+from constants import DB_WRITE_QUEUE_SIZE, DB_WRITE_GROUP_MAX, DB_FLUSH_TIMEOUT
+from logger_config import logger
+
+# Database methods that accept commit=False and can share one transaction
+GROUPABLE_WRITES = {'add_signal', 'add_signals_bulk', 'update_signal_result', 'upsert_candles'}
+
+_STOP = object()
+
+
+class DatabaseWriter:
+    """
+    Write-behind queue in front of a Database.
+
+    Callers (the asyncio event loop, the result verifier) only enqueue writes;
+    a single daemon thread drains the queue, coalescing everything waiting into
+    one transaction of up to DB_WRITE_GROUP_MAX writes. Writes are applied in
+    submission order. When the queue is full, submit() blocks until the writer
+    catches up rather than dropping data.
+    """
+
+    def __init__(self, database, maxsize: int = DB_WRITE_QUEUE_SIZE, group_max: int = DB_WRITE_GROUP_MAX):
+        self.database = database
+        self.group_max = group_max
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._progress = threading.Condition()
+        self._submitted = 0
+        self._completed = 0
+        self._closed = False
+        self._metrics = {
+            'submitted': 0,
+            'written': 0,
+            'failed': 0,
+            'flushes': 0,
+            'blocked_submits': 0,
+            'max_queue_depth': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+            'max_queue_wait_ms': 0.0,
+        }
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, method: str, *args, **kwargs):
+        """Queue database.<method>(*args, **kwargs); runs synchronously once the writer is closed"""
+        if self._closed:
+            getattr(self.database, method)(*args, **kwargs)
+            return
+
+        self._ensure_thread()
+        item = (time.perf_counter(), method, args, kwargs)
+        with self._progress:
+            self._submitted += 1
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._metrics['blocked_submits'] += 1
+            logger.warning(f"Database write queue full ({self._queue.maxsize}), waiting for the writer")
+            self._queue.put(item)
+        self._metrics['submitted'] += 1
+        self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], self._queue.qsize())
+
+    def _run(self):
+        """Writer thread: block for one write, then take everything queued behind it"""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            items = [item]
+            stop = False
+            while len(items) < self.group_max:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                items.append(item)
+
+            self._write(items)
+            if stop:
+                return
+
+    def _write(self, items: list):
+        started = time.perf_counter()
+        oldest = min(submitted_at for submitted_at, _, _, _ in items)
+        failed = 0
+        group = []
+        try:
+            for _, method, args, kwargs in items:
+                if method in GROUPABLE_WRITES:
+                    group.append((method, args, kwargs))
+                    continue
+                # Other writes (e.g. cleanup_old_data) run alone, after everything queued before them
+                if group:
+                    failed += self.database.write_many(group)
+                    group = []
+                failed += self.database.write_many([(method, args, kwargs)])
+            if group:
+                failed += self.database.write_many(group)
+        except Exception as e:
+            failed = len(items)
+            logger.error(f"Database writer failed to apply {len(items)} writes: {e}")
+
+        finished = time.perf_counter()
+        flush_ms = (finished - started) * 1000
+        metrics = self._metrics
+        metrics['flushes'] += 1
+        metrics['written'] += len(items) - failed
+        metrics['failed'] += failed
+        metrics['last_flush_ms'] = flush_ms
+        metrics['max_flush_ms'] = max(metrics['max_flush_ms'], flush_ms)
+        metrics['total_flush_ms'] += flush_ms
+        metrics['max_queue_wait_ms'] = max(metrics['max_queue_wait_ms'], (started - oldest) * 1000)
+        logger.debug(f"Database writer flushed {len(items)} writes in {flush_ms:.1f}ms ({failed} failed)")
+
+        with self._progress:
+            self._completed += len(items)
+            self._progress.notify_all()
+
+    def flush(self, timeout: float = DB_FLUSH_TIMEOUT) -> bool:
+        """Wait until every write submitted so far is committed. Returns False on timeout."""
+        with self._progress:
+            target = self._submitted
+            if self._completed >= target:
+                return True
+            if self._thread is None or not self._thread.is_alive():
+                self._ensure_thread()
+            return self._progress.wait_for(lambda: self._completed >= target, timeout=timeout)
+
+    def close(self, timeout: float = DB_FLUSH_TIMEOUT):
+        """Flush queued writes, stop the writer thread and close the database connections"""
+        if self._closed:
+            return
+        if not self.flush(timeout):
+            logger.error(f"Database writer: {self._queue.qsize()} writes still queued after {timeout}s")
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=timeout)
+        logger.info(f"Database writer closed: {self.stats()}")
+        self.database.close()
+
+    def stats(self) -> dict:
+        """Queue depth and flush latency metrics"""
+        metrics = dict(self._metrics)
+        metrics['queue_depth'] = self._queue.qsize()
+        metrics['avg_flush_ms'] = metrics['total_flush_ms'] / metrics['flushes'] if metrics['flushes'] else 0.0
+        del metrics['total_flush_ms']
+        return metrics
+
+
+# Global writer for the global database
+db_writer = DatabaseWriter(db)
+atexit.register(db_writer.close)  # Last-chance flush if the process exits without the bot's shutdown hook
@@ -0,0 +1,430 @@
+# indicators.py - Vectorized multi-pair indicator engine and streaming state (NumPy)
+
+from bisect import bisect_left
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Indicator columns produced by compute_indicators(), same names as get_signal_for_pair()
+INDICATOR_NAMES = (
+    'rsi', 'ema_fast', 'ema_slow', 'sma_20', 'sma_50',
+    'macd', 'macd_signal', 'macd_diff', 'stoch_k', 'stoch_d',
+    'adx', 'bb_high', 'bb_low', 'bb_mid', 'atr', 'vwap',
+)
+
+# DataFrame.attrs key for StreamingIndicators values at a frame's newest candle (see scoring.score_frames)
+LATEST_ATTR = 'latest_indicators'
+
+
+def _ewm(values: np.ndarray, alpha: float, min_periods: int) -> np.ndarray:
+    """
+    Row-wise exponential mean, pandas ewm(adjust=False) semantics.
+    Leading NaNs are skipped; results are NaN until `min_periods` values were seen.
+    The recursion runs candle-major (one contiguous row per step) and the result is
+    returned as a transposed view.
+    """
+    rows, length = values.shape
+    columns = np.ascontiguousarray(values.T)
+    out = np.full((length, rows), np.nan)
+    missing = np.isnan(columns)
+    empty_columns = missing.all(axis=1)
+    if not (missing.any(axis=1) & ~empty_columns).any():
+        # NaNs only fill whole columns (e.g. a shared leading NaN): one scalar counter for all rows
+        state = None
+        seen = 0
+        for t in range(length):
+            if not empty_columns[t]:
+                x = columns[t]
+                state = x.copy() if state is None else state + alpha * (x - state)
+                seen += 1
+            if seen >= min_periods:
+                out[t] = state
+        return out.T
+    
+    state = np.full(rows, np.nan)
+    seen = np.zeros(rows, dtype=np.int64)
+    for t in range(length):
+        x = columns[t]
+        valid = ~missing[t]
+        started = ~np.isnan(state)
+        state = np.where(valid & started, state + alpha * (x - state), state)
+        state = np.where(valid & ~started, x, state)
+        seen += valid
+        out[t] = np.where(seen >= min_periods, state, np.nan)
+    return out.T
+
+
+def _ema(values: np.ndarray, window: int) -> np.ndarray:
+    """ta EMAIndicator: span-based EWM, NaN for the first window-1 values"""
+    return _ewm(values, 2.0 / (window + 1), window)
+
+
+def _rolling(values: np.ndarray, window: int, func) -> np.ndarray:
+    """Apply a reduction over trailing windows, NaN until the window is full"""
+    rows, length = values.shape
+    out = np.full((rows, length), np.nan)
+    if length >= window:
+        out[:, window - 1:] = func(sliding_window_view(values, window, axis=1), axis=-1)
+    return out
+
+
+def _wilder_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    ta ADX smoothing: seed with the sum of values[1:window+1] at index `window`,
+    then s[t] = s[t-1] - s[t-1] / window + values[t]. Zero before the seed.
+    """
+    rows, length = values.shape
+    out = np.zeros((length, rows))  # Candle-major, returned transposed
+    if length <= window:
+        return out.T
+    columns = np.ascontiguousarray(values.T)
+    out[window] = columns[1:window + 1].sum(axis=0)
+    for t in range(window + 1, length):
+        out[t] = out[t - 1] - out[t - 1] / window + columns[t]
+    return out.T
+
+
+def _rsi(close: np.ndarray, window: int = 14) -> np.ndarray:
+    diff = np.diff(close, axis=1, prepend=np.nan)
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+    ema_up = _ewm(up, 1.0 / window, window)
+    ema_down = _ewm(down, 1.0 / window, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + ema_up / ema_down)
+    return np.where(ema_down == 0, 100.0, rsi)
+
+
+def _stochastic(high, low, close, window: int = 14, smooth_window: int = 3):
+    lowest = _rolling(low, window, np.min)
+    highest = _rolling(high, window, np.max)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stoch_k = 100 * (close - lowest) / (highest - lowest)
+    stoch_d = _rolling(stoch_k, smooth_window, np.mean)
+    return stoch_k, stoch_d
+
+
+def _adx(high, low, close, window: int = 14) -> np.ndarray:
+    rows, length = close.shape
+    prev_close = np.concatenate((np.full((rows, 1), np.nan), close[:, :-1]), axis=1)
+    true_range = np.maximum(high, prev_close) - np.minimum(low, prev_close)
+
+    diff_up = np.diff(high, axis=1, prepend=np.nan)
+    diff_down = -np.diff(low, axis=1, prepend=np.nan)
+    pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+    neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+
+    trs = _wilder_sum(true_range, window)
+    dip = _wilder_sum(pos, window)
+    din = _wilder_sum(neg, window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        di_pos = np.where(trs != 0, 100 * dip / trs, 0.0)
+        di_neg = np.where(trs != 0, 100 * din / trs, 0.0)
+        di_sum = di_pos + di_neg
+        dx = np.where(di_sum != 0, 100 * np.abs((di_pos - di_neg) / di_sum), 0.0)
+
+    adx = np.zeros((length, rows))  # Candle-major, returned transposed
+    first = 2 * window - 1
+    if length > first:
+        dx = np.ascontiguousarray(dx.T)
+        adx[first] = dx[window:first + 1].mean(axis=0)
+        for t in range(first + 1, length):
+            adx[t] = (adx[t - 1] * (window - 1) + dx[t]) / window
+    return adx.T
+
+
+def _atr(high, low, close, window: int = 14) -> np.ndarray:
+    rows, length = close.shape
+    prev_close = np.concatenate((np.full((rows, 1), np.nan), close[:, :-1]), axis=1)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+    atr = np.zeros((length, rows))  # Candle-major, returned transposed
+    if length >= window:
+        true_range = np.ascontiguousarray(true_range.T)
+        atr[window - 1] = true_range[:window].mean(axis=0)
+        for t in range(window, length):
+            atr[t] = (atr[t - 1] * (window - 1) + true_range[t]) / window
+    return atr.T
+
+
+def compute_indicators(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> dict:
+    """
+    Compute every indicator used by the scoring rules for many symbols at once.
+    Inputs are 2-D float arrays shaped (symbols, candles), oldest candle first.
+    Returns {name: array of the same shape}; values match the `ta` classes used
+    by get_signal_for_pair (NaN where ta yields NaN, 0 where ta pads with 0).
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    length = close.shape[1]
+
+    result = {'rsi': _rsi(close)}
+    result['ema_fast'] = _ema(close, 9)
+    result['ema_slow'] = _ema(close, 21)
+
+    result['sma_20'] = _rolling(close, 20, np.mean)
+    result['sma_50'] = _rolling(close, 50, np.mean) if length >= 50 else close.copy()
+
+    macd = _ema(close, 12) - _ema(close, 26)
+    result['macd'] = macd
+    result['macd_signal'] = _ema(macd, 9)
+    result['macd_diff'] = macd - result['macd_signal']
+
+    result['stoch_k'], result['stoch_d'] = _stochastic(high, low, close)
+    result['adx'] = _adx(high, low, close)
+
+    bb_mid = _rolling(close, 20, np.mean)
+    bb_std = _rolling(close, 20, np.std)
+    result['bb_high'] = bb_mid + 2 * bb_std
+    result['bb_low'] = bb_mid - 2 * bb_std
+    result['bb_mid'] = bb_mid
+
+    result['atr'] = _atr(high, low, close)
+
+    typical_price = (high + low + close) / 3
+    result['vwap'] = _rolling(typical_price, 20, np.mean) if length >= 20 else typical_price
+
+    return result
+
+
+def _latest_rolling(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> dict:
+    """
+    Rolling indicators (SMA, Bollinger, Stochastic, VWAP) at the newest candle, evaluated
+    on the trailing candles they need: {name: 1-D array, one per row}.
+    """
+    length = close.shape[1]
+    tail_20 = close[:, -20:]
+    result = {'sma_20': _rolling(tail_20, 20, np.mean)[:, -1]}
+    result['sma_50'] = _rolling(close[:, -50:], 50, np.mean)[:, -1] if length >= 50 else close[:, -1].copy()
+
+    stoch_k, stoch_d = _stochastic(high[:, -16:], low[:, -16:], close[:, -16:])  # 14-candle range, 3-value mean
+    result['stoch_k'], result['stoch_d'] = stoch_k[:, -1], stoch_d[:, -1]
+
+    bb_mid = result['sma_20']
+    bb_std = _rolling(tail_20, 20, np.std)[:, -1]
+    result['bb_high'] = bb_mid + 2 * bb_std
+    result['bb_low'] = bb_mid - 2 * bb_std
+    result['bb_mid'] = bb_mid
+
+    typical_price = (high[:, -20:] + low[:, -20:] + close[:, -20:]) / 3
+    result['vwap'] = _rolling(typical_price, 20, np.mean)[:, -1] if length >= 20 else typical_price[:, -1]
+    return result
+
+
+def compute_latest_indicators(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> dict:
+    """
+    compute_indicators() values at the newest candle only: {name: 1-D array, one per row}.
+    Recursive indicators (EMA, RSI, MACD, ADX, ATR) still run over the whole window, but
+    rolling ones are evaluated on the trailing candles they need instead of every position.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    result = {'rsi': _rsi(close)[:, -1]}
+    result['ema_fast'] = _ema(close, 9)[:, -1]
+    result['ema_slow'] = _ema(close, 21)[:, -1]
+
+    macd = _ema(close, 12) - _ema(close, 26)
+    macd_signal = _ema(macd, 9)
+    result['macd'] = macd[:, -1]
+    result['macd_signal'] = macd_signal[:, -1]
+    result['macd_diff'] = macd[:, -1] - macd_signal[:, -1]
+
+    result['adx'] = _adx(high, low, close)[:, -1]
+    result['atr'] = _atr(high, low, close)[:, -1]
+    result.update(_latest_rolling(high, low, close))
+    return result
+
+def stack_frames(frames: dict) -> list:
+    """
+    Group candle DataFrames by length and stack them into 2-D arrays.
+    frames: {symbol: DataFrame with high/low/close}.
+    Returns [(symbols, high, low, close), ...], one entry per distinct length.
+    """
+    groups = {}
+    for symbol, df in frames.items():
+        if df is None or df.empty:
+            continue
+        groups.setdefault(len(df), []).append(symbol)
+
+    stacked = []
+    for symbols in groups.values():
+        high = np.vstack([frames[s]['high'].to_numpy(dtype=np.float64) for s in symbols])
+        low = np.vstack([frames[s]['low'].to_numpy(dtype=np.float64) for s in symbols])
+        close = np.vstack([frames[s]['close'].to_numpy(dtype=np.float64) for s in symbols])
+        stacked.append((symbols, high, low, close))
+    return stacked
+
+
+# ---------------------------------------------------------------------------
+# Streaming indicators: one recursion step per candle
+# ---------------------------------------------------------------------------
+
+_SEED_FIELDS = ('ema_fast', 'ema_slow', 'ema_12', 'ema_26', 'macd_signal',
+                'rsi_up', 'rsi_down', 'trs', 'dip', 'din', 'adx', 'atr')
+_EMA_ALPHAS = np.array([[2.0 / (span + 1)] for span in (9, 21, 12, 26)])
+
+
+def _seed_step(state: np.ndarray, positions, high, low, close, prev, values: bool = True) -> tuple:
+    """
+    Advance window-anchored recursions by one candle, with the semantics of compute_indicators()
+    on each window. state: (len(_SEED_FIELDS), n) values after the previous candle; column i
+    belongs to a window in which this candle is at position positions[i] (0 = its first
+    candle, ascending). high/low/close and prev (the previous candle's (high, low, close),
+    used where the position is > 0) are scalars or one value per column.
+    Returns (new state, {name: values at this candle} or None).
+    """
+    def upto(position):
+        """Columns before `position`"""
+        return bisect_left(positions, position)
+
+    first = upto(1)
+    new = np.empty_like(state)
+    new[0:4] = state[0:4] + _EMA_ALPHAS * (close - state[0:4])
+    new[0:4, :first] = close if np.ndim(close) == 0 else close[:first]
+
+    macd = new[2] - new[3]
+    macd[:upto(25)] = np.nan
+    new[4] = state[4] + 0.2 * (macd - state[4])
+    new[4, upto(25):upto(26)] = macd[upto(25):upto(26)]
+
+    if prev is not None:
+        prev_high, prev_low, prev_close = prev
+        diff = close - prev_close
+        diff_up, diff_down = high - prev_high, prev_low - low
+        moves = (
+            np.maximum(high, prev_close) - np.minimum(low, prev_close),  # True range
+            np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0),  # +DM
+            np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0),  # -DM
+        )
+        atr_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    else:
+        diff = 0.0
+        moves = (0.0, 0.0, 0.0)
+        atr_range = high - low
+    moves = np.array(moves, dtype=np.float64).reshape(3, -1)
+
+    # RSI: the first candle of a window has no change (0 up, 0 down)
+    changes = np.array((np.maximum(diff, 0.0), np.maximum(-diff, 0.0)), dtype=np.float64).reshape(2, -1)
+    new[5:7] = state[5:7] + (changes - state[5:7]) / 14
+    new[5:7, :first] = 0.0
+
+    # ADX: Wilder sums of true range / +DM / -DM over the window's candles 1..14, then smoothing
+    new[7:10] = state[7:10] - state[7:10] / 14 + moves
+    new[7:10, :upto(15)] = (state[7:10] + moves)[:, :upto(15)]
+    new[7:10, :first] = 0.0
+    trs, dip, din = new[7:10]
+    started = upto(14)  # Sums are 0 before position 14
+    with np.errstate(divide='ignore', invalid='ignore'):
+        di_pos = np.where(trs != 0, 100 * dip / trs, 0.0)
+        di_neg = np.where(trs != 0, 100 * din / trs, 0.0)
+        di_sum = di_pos + di_neg
+        dx = np.where(di_sum != 0, 100 * np.abs((di_pos - di_neg) / di_sum), 0.0)
+    dx[:started] = 0.0
+    # Sum of dx over positions 14..27, their mean at 27, then Wilder smoothing
+    new[10] = (state[10] * 13 + dx) / 14
+    new[10, :upto(28)] = (state[10] + dx)[:upto(28)]
+    new[10, upto(27):upto(28)] /= 14
+    new[10, :started] = 0.0
+    # ATR: sum of the first 14 true ranges, their mean at 13, then Wilder smoothing
+    new[11] = (state[11] * 13 + atr_range) / 14
+    new[11, :upto(14)] = (state[11] + atr_range)[:upto(14)]
+    new[11, upto(13):upto(14)] /= 14
+    new[11, :first] = (high - low) if np.ndim(high) == 0 else (high - low)[:first]
+    if not values:
+        return new, None
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(new[6] == 0, 100.0, 100 - 100 / (1 + new[5] / new[6]))
+    rsi[:upto(13)] = np.nan
+    result = {'rsi': rsi, 'macd': macd}
+    for name, row, warmup, fill in (('ema_fast', 0, 8, np.nan), ('ema_slow', 1, 20, np.nan),
+                                    ('macd_signal', 4, 33, np.nan), ('adx', 10, 27, 0.0), ('atr', 11, 13, 0.0)):
+        result[name] = new[row].copy()
+        result[name][:upto(warmup)] = fill
+    result['macd_diff'] = macd - result['macd_signal']
+    return new, result
+
+
+class StreamingIndicators:
+    """
+    Incremental compute_latest_indicators() for one symbol over a fixed window of candles.
+
+    EMA, RSI, MACD, ADX and ATR are recursions seeded at the first candle of the
+    window, so one running state would drift from the scorer's window. Instead
+    every committed candle starts a new seed and update() advances all window - 1
+    seeds in flight by one step (vectorized); the oldest one always covers exactly
+    the window ending at the newest candle. A candle costs one recursion step
+    whatever the stream length, where a recompute runs every recursion over the
+    whole window. Rolling indicators are read from the trailing candles.
+
+    update() commits a closed candle; peek() returns {name: float} for
+    INDICATOR_NAMES with a still-forming candle as the newest one, equal to
+    compute_latest_indicators() over the same (at most `window`) candles.
+    peek_indicators() does the same for many states in one pass.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.count = 0  # Candles committed
+        self.last_epoch = 0  # Newest committed candle
+        self.revision = None  # CandleStore.revision this state was built from
+        self.synced_epoch = None  # Store's newest candle at the last sync (data_fetch.update_indicators)
+        size = max(window - 1, 1)
+        self._candles = np.zeros((3, size))  # high/low/close of the newest committed candles
+        self._seeds = np.zeros((len(_SEED_FIELDS), size))  # Column i: window started i candles ago
+
+    @property
+    def stored(self) -> int:
+        """Committed candles inside the window"""
+        return min(self.count, self._candles.shape[1])
+
+    def update(self, epoch: int, high: float, low: float, close: float):
+        """Commit a closed candle: start its seed and advance the others"""
+        high, low, close = float(high), float(low), float(close)
+        size = self._candles.shape[1]
+        kept = min(self.count + 1, size)
+        prev = tuple(self._candles[:, self.stored - 1].tolist()) if self.count else None
+        self._seeds[:, 1:kept] = self._seeds[:, :kept - 1]
+        self._seeds[:, :kept], _ = _seed_step(self._seeds[:, :kept], range(kept), high, low, close, prev,
+                                              values=False)
+
+        if self.count >= size:
+            self._candles[:, :-1] = self._candles[:, 1:]
+        self._candles[:, min(self.count, size - 1)] = (high, low, close)
+        self.count += 1
+        self.last_epoch = int(epoch)
+
+    def peek(self, high: float, low: float, close: float) -> dict:
+        """Indicator values with this (still forming) candle as the newest one"""
+        return peek_indicators([self], [high], [low], [close])[0]
+
+
+def peek_indicators(states: list, high, low, close) -> list:
+    """
+    StreamingIndicators.peek() for many states in one vectorized pass.
+    high/low/close: each state's forming candle. Returns [{name: float}], one per state.
+    """
+    results = [None] * len(states)
+    groups = {}
+    for index, state in enumerate(states):
+        groups.setdefault(state.stored, []).append(index)
+    for stored, rows in groups.items():
+        candle = np.array([[high[i] for i in rows], [low[i] for i in rows], [close[i] for i in rows]], dtype=np.float64)
+        if stored:
+            seeds = np.stack([states[i]._seeds[:, stored - 1] for i in rows], axis=1)
+            window = np.stack([states[i]._candles[:, :stored] for i in rows], axis=1)  # (3, rows, stored)
+            prev = window[:, :, -1]
+        else:
+            seeds = np.zeros((len(_SEED_FIELDS), len(rows)))
+            window = np.empty((3, len(rows), 0))
+            prev = None
+        _, values = _seed_step(seeds, [stored] * len(rows), *candle, prev)
+        window = np.concatenate((window, candle[:, :, None]), axis=2)
+        values.update(_latest_rolling(*window))
+        for column, index in enumerate(rows):
+            results[index] = {name: float(values[name][column]) for name in INDICATOR_NAMES}
+    return results
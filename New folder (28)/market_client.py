@@ -0,0 +1,459 @@
+# market_client.py - Asyncio-native Binary.com market data client
+
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import time
+import zlib
+from datetime import datetime
+import websockets
+from config import BINARY_WS_URL, STREAM_CANDLES, WS_POOL_SIZE
+from signal_generator import FOREX_PAIRS, BINARY_SYMBOL_MAP
+from data_fetch import apply_message, decode_message, store_for, update_indicators, latest_indicators
+from candle_store import parse_candles
+from candle_archive import candle_archive
+from indicators import LATEST_ATTR
+from rate_limiter import TokenBucket
+from constants import (
+    WS_CONNECTION_TIMEOUT, WS_RATE_LIMIT_PER_MINUTE, WS_RATE_LIMIT_BURST,
+    DATA_FETCH_TIMEOUT, MAX_RETRY_ATTEMPTS, RETRY_DELAY,
+    STREAM_STALE_AFTER, OHLC_DEFAULT_SIZE
+)
+from logger_config import logger
+
+
+class _Connection:
+    """
+    One WebSocket session of a MarketDataClient.
+    Owns its socket, reader and sender tasks, send queue, rate limiter and the
+    streams open on it, and serves the symbols sharded onto it (see connection_for).
+    """
+
+    def __init__(self, client: 'MarketDataClient', index: int):
+        self.client = client
+        self.name = f"ws-{index}"
+        self.ws = None
+        self.connected = False
+        self.reader_task = None
+        self.sender_task = None
+        self.send_queue = asyncio.Queue()
+        self.connect_lock = asyncio.Lock()
+        self.subscribed_symbols = {}  # {symbol: subscription id or None} streams open on this socket
+        self.subscribing = {}  # {symbol: asyncio.Future} subscribe requests in flight
+        self.refreshed_at = {}  # {symbol: time.monotonic()} of the last stale-stream refresh
+        self.pending_ids = set()  # req_ids waiting for a response on this socket
+        # Burst up to WS_RATE_LIMIT_BURST, then refill so no 60s window exceeds the per-minute limit
+        self.rate_limiter = TokenBucket(
+            rate=(WS_RATE_LIMIT_PER_MINUTE - WS_RATE_LIMIT_BURST) / 60.0,
+            capacity=WS_RATE_LIMIT_BURST
+        )
+
+    async def connect(self):
+        """Ensure the WebSocket is open, retrying with backoff"""
+        async with self.connect_lock:
+            if self.connected:
+                return
+
+            for attempt in range(MAX_RETRY_ATTEMPTS):
+                try:
+                    logger.info(f"[{self.name}] Establishing async WebSocket connection (attempt {attempt + 1}/{MAX_RETRY_ATTEMPTS})...")
+                    self.ws = await asyncio.wait_for(
+                        websockets.connect(self.client.url, max_size=None),
+                        timeout=WS_CONNECTION_TIMEOUT
+                    )
+                    self.connected = True
+                    self.reader_task = asyncio.create_task(self._reader(self.ws))
+                    self._ensure_sender()
+                    logger.info(f"[{self.name}] Async WebSocket connected to Binary.com")
+
+                    # Re-open this shard's candle streams after a reconnect
+                    self.subscribed_symbols.clear()
+                    for symbol, count in list(self.client._stream_symbols.items()):
+                        if self.client.connection_for(symbol) is self:
+                            self.subscribe(symbol, count)
+                    return
+
+                except Exception as e:
+                    logger.warning(f"[{self.name}] Async connection attempt {attempt + 1} failed: {e}")
+                    self.connected = False
+                    self.ws = None
+                    if attempt < MAX_RETRY_ATTEMPTS - 1:
+                        await asyncio.sleep(RETRY_DELAY * (attempt + 1))  # Exponential backoff
+
+            logger.error(f"[{self.name}] Failed to establish async WebSocket connection after all retries")
+            raise Exception("WebSocket connection failed after retries")
+
+    async def close(self):
+        """Close the socket and stop this connection's tasks"""
+        for task in (self.reader_task, self.sender_task):
+            if task is not None and not task.done():
+                task.cancel()
+        if self.ws is not None:
+            try:
+                await self.ws.close()
+            except Exception:
+                pass
+        self.ws = None
+        self.connected = False
+        self.subscribed_symbols.clear()
+        self._release_pending()
+
+    def _release_pending(self):
+        """Wake every waiter on this socket - their requests will not be answered"""
+        for req_id in list(self.pending_ids):
+            self.client._resolve(req_id)
+        self.pending_ids.clear()
+
+    async def _reader(self, ws):
+        """Decode incoming messages, update the shared stores and resolve request futures"""
+        client = self.client
+        try:
+            async for message in ws:
+                try:
+                    data = decode_message(message)
+                except Exception as e:
+                    logger.error(f"[{self.name}] Failed to decode message: {e}", exc_info=True)
+                    continue
+
+                symbol = apply_message(data, client._candle_stores, self.subscribed_symbols)
+                if symbol:
+                    store = client._candle_stores.get(symbol)
+                    candle_archive.save(store)
+                    update_indicators(client._indicators, store)  # Commits the candles that closed
+
+                req_id = data.get('req_id')
+                self.pending_ids.discard(req_id)
+                client._resolve(req_id, data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[{self.name}] Async WebSocket error: {e}")
+        finally:
+            if ws is self.ws:
+                self.connected = False
+                self.subscribed_symbols.clear()  # Subscriptions die with the socket
+                self._release_pending()
+                logger.info(f"[{self.name}] Async WebSocket connection closed")
+
+    async def _sender(self):
+        """Drain the send queue, throttled only when the token bucket runs dry"""
+        while True:
+            request = await self.send_queue.get()
+            try:
+                delay = self.rate_limiter.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if not self.connected:
+                    raise Exception("WebSocket not connected")
+                await self.ws.send(json.dumps(request))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[{self.name}] Failed to send request {request}: {e}")
+                self.pending_ids.discard(request.get('req_id'))
+                self.client._resolve(request.get('req_id'))
+
+    def _ensure_sender(self):
+        """Start the sender task if it is not running"""
+        if self.sender_task is None or self.sender_task.done():
+            self.sender_task = asyncio.create_task(self._sender())
+
+    def request(self, request: dict) -> asyncio.Future:
+        """Tag a request with a req_id and queue it on this socket. Returns a future resolved with the response."""
+        future = self.client._register(request)
+        self.pending_ids.add(request['req_id'])
+        self._ensure_sender()
+        self.send_queue.put_nowait(request)
+        return future
+
+    def subscribe(self, symbol: str, count: int) -> asyncio.Future:
+        """
+        Open a persistent M1 candle stream for a symbol. It counts as open (subscribed_symbols)
+        once the server answers with candles; an error leaves it closed for the next fetch.
+        """
+        future = self.request({**self.client.history_request(symbol, count), "subscribe": 1})
+        self.subscribing[symbol] = future
+
+        def done(_):
+            if self.subscribing.get(symbol) is future:
+                del self.subscribing[symbol]
+        future.add_done_callback(done)
+        return future
+
+    def open_stream(self, symbol: str, count: int):
+        """
+        Make sure the candle stream for a symbol is open and live. Returns the future of the
+        request that opens or refreshes it, or None when the stream is fresh (or was already
+        refreshed within STREAM_STALE_AFTER). A stream that went silent is forgotten and
+        subscribed again; when its subscription id is unknown (AlreadySubscribed), a one-shot
+        ticks_history request fetches the missing candles instead.
+        """
+        pending = self.subscribing.get(symbol)
+        if pending is not None:
+            return pending
+        if symbol not in self.subscribed_symbols:
+            return self.subscribe(symbol, count)
+        if not self.client._stale(symbol):
+            return None
+
+        now = time.monotonic()
+        refreshed = self.refreshed_at.get(symbol)
+        if refreshed is not None and now - refreshed < STREAM_STALE_AFTER:
+            return None
+        self.refreshed_at[symbol] = now
+
+        subscription_id = self.subscribed_symbols[symbol]
+        if subscription_id is None:
+            logger.info(f"[{self.name}] Stream for {symbol} is stale, fetching its history")
+            return self.request(self.client.history_request(symbol, count))
+        logger.info(f"[{self.name}] Stream for {symbol} is stale, re-subscribing")
+        del self.subscribed_symbols[symbol]
+        self.request({"forget": subscription_id})
+        return self.subscribe(symbol, count)
+
+
+class MarketDataClient:
+    """
+    Asyncio market data client: get_all_ohlc_data (signal generation) and
+    get_candles_since (result verification) as coroutines. It is the bot's only
+    market data feed; threads such as the result tracker's scheduler reach it
+    through submit().
+
+    Symbols are sharded over a pool of WS_POOL_SIZE connections (stable hash of
+    the symbol), each with its own reader task, rate-limited sender task and
+    reconnect state, so request throughput grows with the pool. Every reader
+    feeds the same candle stores and resolves per-request futures by req_id.
+    Everything runs on the caller's event loop, so Telegram handlers can await
+    it directly without executor threads, blocking sleeps or locks.
+    """
+
+    def __init__(self, url: str = BINARY_WS_URL, stream_candles: bool = STREAM_CANDLES,
+                 pool_size: int = WS_POOL_SIZE):
+        self.url = url
+        self.stream_candles = stream_candles
+        self._req_ids = itertools.count(1)
+        self._pending = {}  # {req_id: asyncio.Future}
+        self._candle_stores = {}  # {binary_symbol: CandleStore}
+        self._indicators = {}  # {binary_symbol: StreamingIndicators} - follows _candle_stores
+        self._stream_symbols = {}  # {binary_symbol: candle count} - streams we want open
+        self._loop = None  # Event loop the client runs on, for submit()
+        self._connections = [_Connection(self, index) for index in range(max(1, pool_size))]
+
+    @property
+    def connected(self) -> bool:
+        return any(conn.connected for conn in self._connections)
+
+    def connection_for(self, symbol: str) -> _Connection:
+        """Pool connection that serves a symbol (stable hash shard)"""
+        return self._connections[zlib.crc32(symbol.encode()) % len(self._connections)]
+
+    async def connect(self):
+        """Ensure every pool connection is open"""
+        await self._connect_shards([])
+
+    async def _connect_shards(self, symbols: list) -> dict:
+        """
+        Group symbols by pool connection and bring those connections up concurrently
+        (every connection when `symbols` is empty). Returns {connection: [symbols]} for
+        the connections that are ready; symbols on a connection that could not connect
+        are left out (and logged). Raises when no connection is ready.
+        """
+        self._loop = asyncio.get_running_loop()
+        shards = {conn: [] for conn in self._connections} if not symbols else {}
+        for symbol in symbols:
+            shards.setdefault(self.connection_for(symbol), []).append(symbol)
+
+        outcomes = await asyncio.gather(*(conn.connect() for conn in shards), return_exceptions=True)
+        ready = {}
+        for (conn, shard), outcome in zip(shards.items(), outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"[{conn.name}] Unavailable, skipping {len(shard)} symbols: {outcome}")
+            else:
+                ready[conn] = shard
+        if not ready:
+            raise Exception("WebSocket not connected")
+        return ready
+
+    async def close(self):
+        """Close every pool connection and stop background tasks"""
+        await asyncio.gather(*(conn.close() for conn in self._connections))
+
+    def submit(self, method: str, *args) -> concurrent.futures.Future:
+        """
+        Run a client coroutine (by method name) on the client's event loop from another
+        thread, e.g. submit('get_candles_since', starts).result(timeout).
+        Raises RuntimeError until the client has connected on a running loop.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            raise RuntimeError("Market data client is not running on an event loop yet")
+        return asyncio.run_coroutine_threadsafe(getattr(self, method)(*args), loop)
+
+    def _register(self, request: dict) -> asyncio.Future:
+        """Tag a request with a unique req_id and return the future its response resolves"""
+        req_id = next(self._req_ids)
+        request['req_id'] = req_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        return future
+
+    def _resolve(self, req_id, response: dict = None):
+        """Resolve the waiter for a response (streamed follow-ups with the same req_id are ignored)"""
+        future = self._pending.pop(req_id, None)
+        if future is not None and not future.done():
+            future.set_result(response)
+
+    def history_request(self, symbol: str, count: int) -> dict:
+        """ticks_history request for the M1 candles a symbol's store is missing"""
+        return {
+            "ticks_history": symbol,
+            "end": "latest",
+            **candle_archive.history_window(self._candle_stores.get(symbol), count),
+            "granularity": 60,
+            "style": "candles"
+        }
+
+    def _stale(self, symbol: str) -> bool:
+        """True when a symbol's store has not been updated within STREAM_STALE_AFTER"""
+        store = self._candle_stores.get(symbol)
+        if store is None or store.updated_at is None:
+            return True
+        return (datetime.now() - store.updated_at).total_seconds() > STREAM_STALE_AFTER
+
+    def _read_stores(self, symbols: list, outputsize: int, hot_only: bool = False) -> dict:
+        """
+        Return DataFrames for symbols with stored candles (optionally only fresh streams).
+        Frames of the scorer's window carry the streamed indicator values at their newest
+        candle in df.attrs[LATEST_ATTR], so scoring does not recompute the window.
+        """
+        result = {}
+        for symbol in symbols:
+            store = self._candle_stores.get(symbol)
+            if store is None or not len(store):
+                continue
+            if hot_only and (symbol not in self.connection_for(symbol).subscribed_symbols or self._stale(symbol)):
+                continue
+            result[symbol] = store.to_dataframe(outputsize)
+        if outputsize == OHLC_DEFAULT_SIZE and result:
+            stores = [self._candle_stores[symbol] for symbol in result]
+            for df, values in zip(result.values(), latest_indicators(self._indicators, stores)):
+                df.attrs[LATEST_ATTR] = values
+        return result
+
+    async def get_all_ohlc_data(self, outputsize=50) -> dict:
+        """
+        Get OHLC data for all forex pairs.
+        Returns dictionary with binary symbols as keys and DataFrames as values.
+        Waits until every requested pair has answered or DATA_FETCH_TIMEOUT passes.
+        """
+        try:
+            logger.info(f"Starting async data fetch for {len(FOREX_PAIRS)} pairs...")
+            symbols = [BINARY_SYMBOL_MAP[pair] for pair in FOREX_PAIRS if pair in BINARY_SYMBOL_MAP]
+            shards = await self._connect_shards(symbols)
+            futures = []
+
+            # Cold stores start from the local archive, so only the missing tail is requested.
+            # The archive is read in a worker thread; the stores are filled back on the loop.
+            if candle_archive.enabled:
+                cold = [symbol for symbol in symbols
+                        if symbol not in self._candle_stores or not len(self._candle_stores[symbol])]
+                seeds = await asyncio.to_thread(candle_archive.load_seeds, cold, outputsize) if cold else {}
+                seeded = sum(candle_archive.seed(store_for(self._candle_stores, symbol), columns)
+                             for symbol, columns in seeds.items())
+                if seeded:
+                    logger.info(f"Loaded {seeded} archived candles")
+
+            if self.stream_candles:
+                for conn, shard_symbols in shards.items():
+                    for symbol in shard_symbols:
+                        self._stream_symbols[symbol] = max(outputsize, self._stream_symbols.get(symbol, 0))
+                        future = conn.open_stream(symbol, outputsize)
+                        if future is not None:
+                            futures.append(future)
+                if futures:
+                    logger.info(f"Opening or refreshing {len(futures)} candle streams")
+                else:
+                    result = self._read_stores(symbols, outputsize, hot_only=True)
+                    if len(result) == len(symbols):
+                        logger.info(f"Returning streamed data for {len(result)} pairs")
+                        return result
+            else:
+                for conn, shard_symbols in shards.items():
+                    for symbol in shard_symbols:
+                        futures.append(conn.request(self.history_request(symbol, outputsize)))
+                logger.info(f"Queued {len(futures)} requests over {len(shards)} connection(s), waiting for data...")
+
+            if futures:
+                done, _ = await asyncio.wait(futures, timeout=DATA_FETCH_TIMEOUT)
+                logger.info(f"{len(done)}/{len(futures)} responses received")
+
+            result = self._read_stores(symbols, outputsize)
+            if not result:
+                raise Exception(f"No OHLC data received. Available: {list(self._candle_stores.keys())}")
+
+            if len(result) < len(symbols):
+                missing = [s for s in symbols if s not in result]
+                logger.warning(f"Got data for {len(result)}/{len(symbols)} pairs, missing: {missing}")
+
+            logger.info(f"Returning data for {len(result)} pairs")
+            return result
+
+        except Exception as e:
+            logger.error(f"get_all_ohlc_data failed: {e}", exc_info=True)
+            return {}
+
+    async def get_candles_since(self, starts: dict, timeout: float = DATA_FETCH_TIMEOUT) -> dict:
+        """
+        Fetch M1 candles from a start epoch up to now for several pairs in one concurrent round
+        (one ticks_history request per pair), waiting at most `timeout` seconds for the responses.
+        starts: {pair: start_epoch}. Returns {pair: {epoch: (open, high, low, close)}};
+        pairs whose request failed or did not answer in time map to an empty dict.
+        """
+        candles = {pair: {} for pair in starts}
+
+        try:
+            symbols = {}  # {binary_symbol: pair}
+            for pair in starts:
+                binary_symbol = BINARY_SYMBOL_MAP.get(pair)
+                if not binary_symbol:
+                    logger.warning(f"Unknown pair: {pair}")
+                    continue
+                symbols[binary_symbol] = pair
+            if not symbols:
+                return candles
+
+            futures = {}  # {binary_symbol: asyncio.Future}
+            for conn, shard_symbols in (await self._connect_shards(list(symbols))).items():
+                for binary_symbol in shard_symbols:
+                    futures[binary_symbol] = conn.request({
+                        "ticks_history": binary_symbol,
+                        "start": int(starts[symbols[binary_symbol]]),
+                        "end": "latest",
+                        "granularity": 60,
+                        "style": "candles"
+                    })
+            await asyncio.wait(futures.values(), timeout=timeout)
+
+            for binary_symbol, future in futures.items():
+                pair = symbols[binary_symbol]
+                response = (future.result() if future.done() else None) or {}
+                columns = parse_candles(response.get('candles') or [])
+                if columns is None:
+                    logger.warning(f"No candle history received for {pair}")
+                    continue
+                candle_archive.save_columns(binary_symbol, tuple(col[:-1] for col in columns))  # Newest may be forming
+                epochs, opens, highs, lows, closes = (col.tolist() for col in columns)
+                candles[pair] = {
+                    epoch: (o, h, l, c)
+                    for epoch, o, h, l, c in zip(epochs, opens, highs, lows, closes)
+                }
+
+        except Exception as e:
+            logger.error(f"get_candles_since failed for {list(starts)}: {e}", exc_info=True)
+
+        return candles
+
+
+# Global client instance
+market_client = MarketDataClient()
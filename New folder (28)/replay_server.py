@@ -0,0 +1,407 @@
+# replay_server.py - Local stand-in for the Binary.com WebSocket feed (record & replay)
+#
+# Usage:
+#   python replay_server.py record --out session.jsonl [--minutes 10] [--symbols frxEURUSD frxGBPUSD]
+#   python replay_server.py serve [--file session.jsonl] [--port 8765] [--latency 0.05] [--jitter 0.02]
+#                                 [--loss 0.01] [--error-rate 0.0] [--disconnect-every 0] [--speed 1.0]
+#
+# `record` subscribes to the live feed and writes every raw frame to a JSONL file.
+# `serve` answers ticks_history / ticks requests from such a recording (candles, ohlc,
+# tick and error frames), echoing req_id like the real API, and can inject latency,
+# dropped responses, error replies and disconnects. Symbols missing from the recording
+# get synthetic random-walk candles. Point the bot at it with
+#   BINARY_WS_URL=ws://127.0.0.1:8765
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import zlib
+
+import websockets
+
+DEFAULT_SYMBOLS = [
+    "frxEURUSD", "frxGBPUSD", "frxUSDJPY", "frxUSDCHF", "frxAUDUSD",
+    "frxUSDCAD", "frxNZDUSD", "frxEURGBP", "frxEURJPY", "frxGBPJPY", "frxNZDCHF"
+]
+
+
+class Recording:
+    """Recorded frames grouped by symbol: candle history, ohlc updates, ticks, plus error payloads"""
+
+    def __init__(self, frames: list = ()):
+        self.candles = {}  # {symbol: [candle dicts]} - longest history response seen
+        self.ohlc = {}  # {symbol: [ohlc dicts]} in recorded order
+        self.ticks = {}  # {symbol: [tick dicts]} in recorded order
+        self.errors = []  # [error dicts]
+        for data in frames:
+            self.add(data)
+
+    @classmethod
+    def load(cls, path: str) -> 'Recording':
+        with open(path) as f:
+            return cls(json.loads(line) for line in f if line.strip())
+
+    def add(self, data: dict):
+        if 'error' in data:
+            self.errors.append(data['error'])
+        elif 'candles' in data:
+            symbol = data.get('echo_req', {}).get('ticks_history')
+            if symbol and len(data['candles']) >= len(self.candles.get(symbol, ())):
+                self.candles[symbol] = data['candles']
+        elif 'ohlc' in data:
+            self.ohlc.setdefault(data['ohlc'].get('symbol'), []).append(data['ohlc'])
+        elif 'tick' in data:
+            self.ticks.setdefault(data['tick'].get('symbol'), []).append(data['tick'])
+
+    def last_epoch(self) -> int:
+        """Newest candle open time in the recording, 0 when empty"""
+        epochs = [candles[-1]['epoch'] for candles in self.candles.values() if candles]
+        epochs += [frames[-1].get('open_time', 0) for frames in self.ohlc.values() if frames]
+        return int(max(epochs, default=0))
+
+
+def synthetic_candles(symbol: str, count: int, end_epoch: int) -> list:
+    """Deterministic trending random-walk M1 candles for a symbol, the newest opening at end_epoch"""
+    rng = random.Random(zlib.crc32(symbol.encode()))
+    price = 1.0 + rng.random()
+    drift = rng.choice((-2e-4, 2e-4))  # trending, so the strict signal filters have something to pass
+    candles = []
+    for i in range(count):
+        open_ = price
+        price *= 1 + drift + rng.gauss(0, 3e-4)
+        spread = abs(rng.gauss(0, 1e-4)) * price
+        candles.append({
+            'epoch': end_epoch - 60 * (count - 1 - i),
+            'open': round(open_, 5),
+            'high': round(max(open_, price) + spread, 5),
+            'low': round(min(open_, price) - spread, 5),
+            'close': round(price, 5)
+        })
+    return candles
+
+
+def _shift(payload: dict, offset: int, keys=('epoch', 'open_time')) -> dict:
+    """Copy of a recorded payload with its epoch fields moved by offset seconds"""
+    if not offset:
+        return payload
+    shifted = dict(payload)
+    for key in keys:
+        if key in shifted:
+            shifted[key] = int(shifted[key]) + offset
+    return shifted
+
+
+class ReplayServer:
+    """
+    WebSocket server speaking the subset of the Binary.com API the bot uses.
+
+    Recorded epochs are rebased so the newest recorded candle is the current
+    minute (disable with rebase=False). Every response goes out after
+    latency + uniform(0, jitter) seconds; with probability `loss` it is dropped,
+    with probability `error_rate` it is replaced by an error reply, and a
+    connection is closed after every `disconnect_every` responses (0 = never).
+    """
+
+    def __init__(self, recording: Recording = None, host: str = "127.0.0.1", port: int = 8765,
+                 latency: float = 0.0, jitter: float = 0.0, loss: float = 0.0, error_rate: float = 0.0,
+                 disconnect_every: int = 0, speed: float = 1.0, stream_interval: float = 2.0,
+                 rebase: bool = True, seed: int = 1):
+        self.recording = recording or Recording()
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.error_rate = error_rate
+        self.disconnect_every = disconnect_every
+        self.speed = speed
+        self.stream_interval = stream_interval
+        self.rebase = rebase
+        self.rng = random.Random(seed)
+        self.stats = {'connections': 0, 'requests': 0, 'responses': 0, 'dropped': 0,
+                      'errors': 0, 'disconnects': 0, 'stream_frames': 0, 'history_candles': 0}
+        self._server = None
+        self._loop = None
+        self._stopped = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def _offset(self) -> int:
+        last = self.recording.last_epoch()
+        if not self.rebase or not last:
+            return 0
+        now = int(time.time())
+        return (now - now % 60) - last
+
+    # ---- request handling ----
+
+    async def _handle(self, ws, path=None):
+        """One client session; `path` keeps older websockets versions happy"""
+        self.stats['connections'] += 1
+        session = {'responses': 0, 'streams': {}}
+        pending = set()
+        try:
+            async for message in ws:
+                try:
+                    request = json.loads(message)
+                except ValueError:
+                    continue
+                self.stats['requests'] += 1
+                task = asyncio.ensure_future(self._respond(ws, session, request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in list(pending) + list(session['streams'].values()):
+                task.cancel()
+
+    async def _send(self, ws, session: dict, data: dict, stream: bool = False):
+        await ws.send(json.dumps(data))
+        if stream:
+            self.stats['stream_frames'] += 1
+            return
+        self.stats['responses'] += 1
+        session['responses'] += 1
+        if self.disconnect_every and session['responses'] % self.disconnect_every == 0:
+            self.stats['disconnects'] += 1
+            await ws.close(code=1011, reason="replay: injected disconnect")
+
+    @staticmethod
+    def _error(request: dict, code: str, message: str, msg_type: str) -> dict:
+        return {'echo_req': request, 'error': {'code': code, 'message': message},
+                'msg_type': msg_type, 'req_id': request.get('req_id')}
+
+    async def _respond(self, ws, session: dict, request: dict):
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.loss and self.rng.random() < self.loss:
+            self.stats['dropped'] += 1
+            return
+
+        if 'ticks_history' in request:
+            msg_type = 'candles'
+        elif 'ticks' in request:
+            msg_type = 'tick'
+        else:
+            msg_type = next(iter(request), 'unknown')
+
+        try:
+            if self.error_rate and self.rng.random() < self.error_rate:
+                recorded = self.rng.choice(self.recording.errors) if self.recording.errors else None
+                response = self._error(request, (recorded or {}).get('code', 'RateLimit'),
+                                       (recorded or {}).get('message', 'Rate limit reached (replay)'), msg_type)
+                self.stats['errors'] += 1
+            elif msg_type == 'candles':
+                response = self._history(session, request)
+            elif msg_type == 'tick':
+                response = self._tick(request)
+            elif msg_type in ('forget', 'forget_all', 'ping'):
+                if msg_type == 'forget':
+                    self._forget(session, str(request.get('forget', '')))
+                response = {'echo_req': request, 'msg_type': msg_type, msg_type: 1, 'req_id': request.get('req_id')}
+            else:
+                response = self._error(request, 'UnrecognisedRequest', 'Unrecognised request', msg_type)
+
+            await self._send(ws, session, response)
+
+            symbol = request.get('ticks_history')
+            if msg_type == 'candles' and 'error' not in response and request.get('subscribe'):
+                session['streams'][symbol] = asyncio.ensure_future(self._stream(ws, session, symbol))
+        except websockets.ConnectionClosed:
+            pass
+
+    def _forget(self, session: dict, subscription_id: str):
+        """Stop the stream with a subscription id (see _history)"""
+        stream = session['streams'].pop(subscription_id.removeprefix('replay-'), None)
+        if stream is not None:
+            stream.cancel()
+
+    def _history(self, session: dict, request: dict) -> dict:
+        symbol = request['ticks_history']
+        count = int(request.get('count', 50))
+        start = int(request.get('start') or 0)  # With a start epoch: everything from there up to now
+        if request.get('subscribe') and symbol in session['streams']:
+            return self._error(request, 'AlreadySubscribed',
+                               f"You are already subscribed to {symbol}", 'candles')
+
+        recorded = self.recording.candles.get(symbol)
+        if recorded:
+            offset = self._offset()
+            candles = [_shift(candle, offset) for candle in (recorded if start else recorded[-count:])]
+            if start:
+                candles = [candle for candle in candles if candle['epoch'] >= start]
+        else:
+            now = int(time.time())
+            if start:
+                count = max(1, (now - now % 60 - start) // 60 + 1)
+            candles = synthetic_candles(symbol, count, now - now % 60)
+        self.stats['history_candles'] += len(candles)
+
+        response = {'candles': candles, 'echo_req': request, 'msg_type': 'candles',
+                    'pip_size': 5, 'req_id': request.get('req_id')}
+        if request.get('subscribe'):
+            response['subscription'] = {'id': f"replay-{symbol}"}
+        return response
+
+    def _tick(self, request: dict) -> dict:
+        symbol = request['ticks']
+        recorded = self.recording.ticks.get(symbol)
+        if recorded:
+            tick = _shift(self.rng.choice(recorded), self._offset(), keys=('epoch',))
+        else:
+            candles = self.recording.candles.get(symbol)
+            quote = candles[-1]['close'] if candles else synthetic_candles(symbol, 1, 0)[-1]['close']
+            tick = {'symbol': symbol, 'epoch': int(time.time()), 'quote': quote}
+        return {'echo_req': request, 'msg_type': 'tick', 'req_id': request.get('req_id'), 'tick': tick}
+
+    async def _stream(self, ws, session: dict, symbol: str):
+        """Push ohlc updates for a subscribed symbol: recorded ones at `speed`, else a random walk"""
+        subscription = {'id': f"replay-{symbol}"}
+        echo = {'ticks_history': symbol, 'granularity': 60, 'style': 'candles', 'subscribe': 1}
+        try:
+            recorded = self.recording.ohlc.get(symbol)
+            if recorded:
+                offset = self._offset()
+                previous = None
+                for ohlc in recorded:
+                    if previous is not None:
+                        gap = (int(ohlc.get('epoch', 0)) - previous) / self.speed
+                        await asyncio.sleep(max(gap, 0))
+                    previous = int(ohlc.get('epoch', 0))
+                    await self._send(ws, session, {'echo_req': echo, 'msg_type': 'ohlc',
+                                                   'ohlc': _shift(ohlc, offset), 'subscription': subscription},
+                                     stream=True)
+                return
+
+            rng = random.Random(zlib.crc32(symbol.encode()) + 1)
+            price = synthetic_candles(symbol, 1, 0)[-1]['close']
+            high = low = open_ = price
+            open_time = None
+            while True:
+                await asyncio.sleep(self.stream_interval)
+                now = int(time.time())
+                minute = now - now % 60
+                if minute != open_time:
+                    open_time, open_, high, low = minute, price, price, price
+                price = round(price * (1 + rng.gauss(0, 1e-4)), 5)
+                high, low = max(high, price), min(low, price)
+                await self._send(ws, session, {
+                    'echo_req': echo, 'msg_type': 'ohlc', 'subscription': subscription,
+                    'ohlc': {'symbol': symbol, 'granularity': 60, 'open_time': open_time, 'epoch': now,
+                             'open': f"{open_:.5f}", 'high': f"{high:.5f}", 'low': f"{low:.5f}",
+                             'close': f"{price:.5f}"}
+                }, stream=True)
+        except (websockets.ConnectionClosed, asyncio.CancelledError):
+            pass
+        finally:
+            if session['streams'].get(symbol) is asyncio.current_task():
+                del session['streams'][symbol]
+
+    # ---- lifecycle ----
+
+    async def serve_forever(self):
+        async with websockets.serve(self._handle, self.host, self.port, max_size=None) as server:
+            self._server = server
+            self.port = server.sockets[0].getsockname()[1]
+            self._loop = asyncio.get_running_loop()
+            self._stopped = self._loop.create_future()
+            self._started.set()
+            await self._stopped
+
+    def start(self) -> str:
+        """Run the server on a background thread (port=0 picks a free port). Returns its URL."""
+        def run():
+            try:
+                asyncio.run(self.serve_forever())
+            except OSError as e:
+                print(f"[ERROR] Replay server: {e}")
+            finally:
+                self._started.set()
+
+        self._thread = threading.Thread(target=run, name="replay-server", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._server is None:
+            raise Exception(f"Replay server failed to start on {self.host}:{self.port}")
+        return self.url
+
+    def stop(self):
+        """Stop a server started with start() and wait for its thread"""
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(lambda: self._stopped.done() or self._stopped.set_result(None))
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+async def record(url: str, symbols: list, minutes: float, path: str, count: int = 50) -> int:
+    """Subscribe to candle and tick streams on the live feed and write raw frames to path"""
+    written = 0
+    deadline = time.monotonic() + minutes * 60
+    async with websockets.connect(url, max_size=None) as ws:
+        for req_id, symbol in enumerate(symbols, 1):
+            await ws.send(json.dumps({"ticks_history": symbol, "end": "latest", "count": count,
+                                      "granularity": 60, "style": "candles", "subscribe": 1, "req_id": req_id}))
+            await ws.send(json.dumps({"ticks": symbol, "subscribe": 1, "req_id": len(symbols) + req_id}))
+        with open(path, 'w') as f:
+            while time.monotonic() < deadline:
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=max(deadline - time.monotonic(), 0.1))
+                except asyncio.TimeoutError:
+                    break
+                f.write(message.strip() + '\n')
+                written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay the Binary.com WebSocket feed")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    rec = commands.add_parser('record', help="Record live frames to a JSONL file")
+    rec.add_argument('--url', default="wss://ws.binaryws.com/websockets/v3?app_id=1089")
+    rec.add_argument('--out', required=True)
+    rec.add_argument('--symbols', nargs='+', default=DEFAULT_SYMBOLS)
+    rec.add_argument('--minutes', type=float, default=10)
+    rec.add_argument('--count', type=int, default=50)
+
+    serve = commands.add_parser('serve', help="Serve a recording (or synthetic data) locally")
+    serve.add_argument('--file', help="JSONL recording; synthetic candles when omitted")
+    serve.add_argument('--host', default="127.0.0.1")
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--latency', type=float, default=0.0, help="Seconds before each response")
+    serve.add_argument('--jitter', type=float, default=0.0, help="Extra uniform random delay, seconds")
+    serve.add_argument('--loss', type=float, default=0.0, help="Probability a response is dropped")
+    serve.add_argument('--error-rate', type=float, default=0.0, help="Probability of an error reply")
+    serve.add_argument('--disconnect-every', type=int, default=0, help="Close a session after N responses")
+    serve.add_argument('--speed', type=float, default=1.0, help="Replay speed for recorded ohlc streams")
+    serve.add_argument('--no-rebase', action='store_true', help="Keep recorded epochs as they are")
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        written = asyncio.run(record(args.url, args.symbols, args.minutes, args.out, args.count))
+        print(f"Recorded {written} frames to {args.out}")
+        return
+
+    recording = Recording.load(args.file) if args.file else Recording()
+    server = ReplayServer(recording, host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+                          loss=args.loss, error_rate=args.error_rate, disconnect_every=args.disconnect_every,
+                          speed=args.speed, rebase=not args.no_rebase)
+    print(f"Replaying {len(recording.candles)} recorded symbols on {server.url}")
+    print(f"Run the bot with BINARY_WS_URL={server.url}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print(f"Stopped: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
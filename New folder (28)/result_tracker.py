@@ -1,510 +1,711 @@
-# result_tracker.py - Track and Display Trading Results with Martingale (IMPROVED)
-
-from datetime import datetime, timedelta
-import pytz
-import threading
-from typing import Optional, Tuple
-from data_fetch import get_price, BINARY_SYMBOL_MAP
-from constants import FIRST_CANDLE_WAIT, SECOND_CANDLE_WAIT, ERROR_RESULT_UNKNOWN, SIGNAL_CLEANUP_HOURS
-from logger_config import logger
-
-# Try to import database, but don't fail if it doesn't exist
-try:
-    from database import db
-    DB_AVAILABLE = True
-except ImportError:
-    DB_AVAILABLE = False
-    logger.warning("Database module not available, running without persistence")
-
-class ResultTracker:
-    def __init__(self):
-        self.active_signals = {}  # {signal_id: signal_dict}
-        self.completed_signals = []  # List of completed signals with results
-        self.martingale_tracker = {}  # Track MTG count per pair sequence
-        self.signal_batches = {}  # {batch_id: {'signals': [signal_ids], 'user_id': user_id, 'chat_id': chat_id}}
-        self._verification_lock = threading.Lock()  # Lock for thread-safe verification
-        
-    def add_signal(self, signal_id: str, signal_dict: dict, batch_id: str = None, user_id: int = None, chat_id: int = None):
-        """Add a new signal to track"""
-        self.active_signals[signal_id] = {
-            **signal_dict,
-            'added_at': datetime.now(),
-            'status': 'pending',
-            'signal_id': signal_id,
-            'mtg_count': 0,  # Initialize MTG count
-            'batch_id': batch_id,
-            'user_id': user_id,
-            'chat_id': chat_id,
-            'entry_price': signal_dict.get('entry_price')  # Use provided entry price
-        }
-        
-        # Track batch
-        if batch_id:
-            if batch_id not in self.signal_batches:
-                self.signal_batches[batch_id] = {
-                    'signals': [],
-                    'user_id': user_id,
-                    'chat_id': chat_id,
-                    'created_at': datetime.now()
-                }
-            self.signal_batches[batch_id]['signals'].append(signal_id)
-        
-        # Save to database if available
-        if DB_AVAILABLE:
-            try:
-                db.add_signal(signal_id, signal_dict, batch_id, user_id, chat_id)
-            except Exception as e:
-                logger.warning(f"Failed to save signal to database: {e}")
-    
-    def mark_completed(self, signal_id: str, result: bool, mtg_count: int = 0, is_mtg: bool = False):
-        """Mark a signal as completed with result (True = win, False = loss)"""
-        if signal_id in self.active_signals:
-            signal = self.active_signals.pop(signal_id)
-            signal['status'] = 'completed'
-            signal['result'] = result
-            signal['completed_at'] = datetime.now()
-            signal['mtg_count'] = mtg_count
-            signal['is_mtg'] = is_mtg
-            self.completed_signals.append(signal)
-            
-            # Update database if available
-            if DB_AVAILABLE:
-                try:
-                    db.update_signal_result(signal_id, result, mtg_count, is_mtg)
-                except Exception as e:
-                    logger.warning(f"Failed to update signal result in database: {e}")
-    
-    def verify_trade_result(self, signal: dict) -> Tuple[Optional[bool], bool]:
-        """
-        Verify actual trade result with second candle MTG confirmation.
-        Returns (result: Optional[bool], is_mtg: bool)
-        - result: True if win, False if loss, None if cannot verify
-        - is_mtg: True if this is an MTG win (second candle confirmation)
-        
-        MTG Logic:
-        - If first candle loses, wait for second candle
-        - If second candle confirms signal direction, count as MTG win
-        - Only count as actual loss if second candle also loses
-        """
-        pair = signal.get('pair', '')
-        signal_type = signal.get('signal', '')
-        signal_time = signal.get('timestamp')
-        
-        try:
-            if not pair or not signal_type or not signal_time:
-                logger.error(f"[VERIFY] Missing data for signal: pair={pair}, type={signal_type}, time={signal_time}")
-                return (ERROR_RESULT_UNKNOWN, False)  # Don't default to WIN
-            
-            # Get entry price (should be set when signal was generated)
-            entry_price = signal.get('entry_price')
-            if entry_price is None:
-                # Fallback: try to get current price
-                logger.warning(f"[VERIFY] Entry price not set for {pair}, attempting to fetch...")
-                entry_price = get_price(pair)
-                if entry_price is None:
-                    logger.error(f"[VERIFY] Could not get entry price for {pair}")
-                    return (ERROR_RESULT_UNKNOWN, False)  # Don't default to WIN
-            
-            # Get first candle exit price (price 1 minute after signal time)
-            import time
-            time.sleep(FIRST_CANDLE_WAIT)  # Small wait for first candle
-            
-            first_exit_price = get_price(pair)
-            if first_exit_price is None:
-                logger.error(f"[VERIFY] Could not get first exit price for {pair}")
-                return (ERROR_RESULT_UNKNOWN, False)  # Don't default to WIN
-            
-            # Check first candle result
-            if signal_type == 'CALL':
-                first_candle_win = first_exit_price > entry_price
-            elif signal_type == 'PUT':
-                first_candle_win = first_exit_price < entry_price
-            else:
-                logger.error(f"[VERIFY] Unknown signal type '{signal_type}' for {pair}")
-                return (ERROR_RESULT_UNKNOWN, False)  # Don't default to WIN
-            
-            # If first candle wins, it's a direct win
-            if first_candle_win:
-                price_diff = first_exit_price - entry_price
-                price_diff_pct = (price_diff / entry_price * 100) if entry_price > 0 else 0
-                logger.info(f"[VERIFY] {pair} {signal_type}: Entry={entry_price:.5f}, Exit={first_exit_price:.5f}, Diff={price_diff_pct:+.3f}%, Result=DIRECT WIN")
-                return (True, False)  # Direct win, not MTG
-            
-            # First candle lost - wait for second candle confirmation (MTG)
-            logger.info(f"[VERIFY] {pair} {signal_type}: First candle LOSS, waiting for second candle confirmation (MTG)...")
-            # Note: This blocking sleep should be moved to background task in production
-            time.sleep(SECOND_CANDLE_WAIT)  # Wait for second candle to form
-            
-            # Get second candle exit price
-            second_exit_price = get_price(pair)
-            if second_exit_price is None:
-                logger.error(f"[VERIFY] Could not get second exit price for {pair}, counting as LOSS")
-                return (False, False)  # Actual loss
-            
-            # Check second candle result
-            if signal_type == 'CALL':
-                second_candle_win = second_exit_price > first_exit_price
-            elif signal_type == 'PUT':
-                second_candle_win = second_exit_price < first_exit_price
-            else:
-                second_candle_win = False
-            
-            # If second candle confirms signal direction, it's an MTG win
-            if second_candle_win:
-                price_diff = second_exit_price - entry_price
-                price_diff_pct = (price_diff / entry_price * 100) if entry_price > 0 else 0
-                logger.info(f"[VERIFY] {pair} {signal_type}: Second candle confirms! Entry={entry_price:.5f}, Second Exit={second_exit_price:.5f}, Diff={price_diff_pct:+.3f}%, Result=MTG WIN")
-                return (True, True)  # MTG win
-            else:
-                # Second candle also lost - actual loss
-                price_diff = second_exit_price - entry_price
-                price_diff_pct = (price_diff / entry_price * 100) if entry_price > 0 else 0
-                logger.info(f"[VERIFY] {pair} {signal_type}: Second candle also LOSS. Entry={entry_price:.5f}, Second Exit={second_exit_price:.5f}, Diff={price_diff_pct:+.3f}%, Result=ACTUAL LOSS")
-                return (False, False)  # Actual loss
-                
-        except Exception as e:
-            logger.error(f"[ERROR] Verifying trade result for {pair}: {e}", exc_info=True)
-            return (ERROR_RESULT_UNKNOWN, False)  # Don't default to WIN on error
-    
-    def check_and_update_expired_signals(self):
-        """
-        Check if signal times have ended and mark them as completed with actual results.
-        Returns list of newly completed signals.
-        """
-        utc6 = pytz.timezone('Asia/Dhaka')
-        now = datetime.now(utc6)
-        
-        expired_signals = []
-        for signal_id, signal in list(self.active_signals.items()):
-            # Signal expires 1 minute after its time
-            signal_time = signal.get('timestamp')
-            if signal_time:
-                # Handle both datetime and string timestamps
-                if isinstance(signal_time, str):
-                    try:
-                        signal_time = datetime.fromisoformat(signal_time)
-                        if signal_time.tzinfo is None:
-                            signal_time = utc6.localize(signal_time)
-                    except:
-                        logger.warning(f"Invalid timestamp format for signal {signal_id}")
-                        continue
-                
-                # Add 1 minute for M1 expiry
-                expiry_time = signal_time + timedelta(minutes=1)
-                if now >= expiry_time:
-                    expired_signals.append(signal_id)
-        
-        newly_completed = []
-        
-        # Mark expired signals as completed with actual results
-        for signal_id in expired_signals:
-            signal = self.active_signals[signal_id]
-            pair = signal.get('pair', '')
-            
-            # Entry price should already be set when signal was generated
-            # If not, try to get it now (fallback)
-            if signal.get('entry_price') is None:
-                logger.warning(f"[WARNING] Entry price not set for {pair} at expiry, attempting to fetch...")
-                entry_price = get_price(pair)
-                if entry_price:
-                    signal['entry_price'] = entry_price
-                else:
-                    logger.error(f"[ERROR] Could not get entry price for {pair} at expiry")
-            
-            # Get current MTG count before checking result
-            if pair in self.martingale_tracker:
-                current_mtg = self.martingale_tracker[pair].get('mtg_count', 0)
-            else:
-                current_mtg = 0
-            
-            # Verify actual trade result with MTG confirmation
-            result, is_mtg = self.verify_trade_result(signal)
-            
-            # Skip if result is None (cannot verify)
-            if result is None:
-                logger.warning(f"[WARNING] Cannot verify result for {pair}, skipping completion")
-                continue
-            
-            # Update MTG tracker based on result
-            if pair not in self.martingale_tracker:
-                self.martingale_tracker[pair] = {'mtg_count': 0}
-            
-            if result:
-                if is_mtg:
-                    # MTG win: increment MTG count (shows we used MTG)
-                    mtg_count = current_mtg + 1
-                    # Keep MTG count for display (shows MTG level used)
-                    self.martingale_tracker[pair]['mtg_count'] = mtg_count
-                else:
-                    # Direct win: MTG count stays the same (shows current MTG level), then reset
-                    mtg_count = current_mtg
-                    # Reset MTG for next trade sequence
-                    self.martingale_tracker[pair]['mtg_count'] = 0
-            else:
-                # Loss: increment MTG count
-                mtg_count = current_mtg + 1
-                self.martingale_tracker[pair]['mtg_count'] = mtg_count
-            
-            self.martingale_tracker[pair]['last_result'] = result
-            self.martingale_tracker[pair]['is_mtg'] = is_mtg
-            
-            # Mark as completed and store the completed signal info
-            self.mark_completed(signal_id, result, mtg_count, is_mtg)
-            
-            # Get the completed signal for return
-            completed_signal = next((s for s in self.completed_signals if s.get('signal_id') == signal_id), None)
-            if completed_signal:
-                newly_completed.append(completed_signal)
-        
-        return newly_completed
-    
-    def get_active_signals(self) -> dict:
-        """Get all active signals"""
-        return self.active_signals.copy()
-    
-    def format_results(self, batch_id: str = None) -> str:
-        """Format completed signals with checkmarks and MTG count"""
-        # Check for expired signals first
-        self.check_and_update_expired_signals()
-        
-        if not self.completed_signals:
-            return "No completed signals yet. Generate signals first."
-        
-        # Filter by batch if specified
-        if batch_id:
-            signal_ids = self.signal_batches.get(batch_id, {}).get('signals', [])
-            signals_to_show = [s for s in self.completed_signals if s.get('signal_id') in signal_ids]
-        else:
-            signals_to_show = self.completed_signals
-        
-        if not signals_to_show:
-            return "No completed signals for this batch yet."
-        
-        # Sort by time (oldest first for better readability)
-        sorted_signals = sorted(signals_to_show, 
-                               key=lambda x: x.get('time', ''))
-        
-        output = ""
-        for signal in sorted_signals:
-            pair = signal.get('pair', '')
-            time = signal.get('time', '')
-            signal_type = signal.get('signal', '')
-            result = signal.get('result')
-            
-            # Handle None results (unverified)
-            if result is None:
-                checkmark = "❓"  # Unknown result
-            elif result:
-                # Win: show checkmark with MTG count if > 0 or is MTG
-                is_mtg = signal.get('is_mtg', False)
-                mtg_count = signal.get('mtg_count', 0)
-                if mtg_count > 0 or is_mtg:
-                    checkmark = f"✅{mtg_count}"
-                else:
-                    checkmark = "✅"
-            else:
-                # Loss: show X
-                checkmark = "❌"
-            
-            output += f"{pair}-OTC,{time} M1 {signal_type} {checkmark}\n"
-        
-        # Add statistics if we have signals
-        total = len(sorted_signals)
-        verified_signals = [s for s in sorted_signals if s.get('result') is not None]
-        wins = sum(1 for s in verified_signals if s.get('result', False))
-        losses = len(verified_signals) - wins
-        unverified = total - len(verified_signals)
-        
-        win_rate = (wins / len(verified_signals) * 100) if verified_signals else 0
-        loss_rate = (losses / len(verified_signals) * 100) if verified_signals else 0
-        
-        output += "\n100% ACCURACY SIGNAL DONE..😮‍💨🔥\n"
-        output += f"\n{'='*50}\n"
-        output += f"📊 *STATISTICS*\n"
-        output += f"{'='*50}\n"
-        output += f"Total: {total} | ✅ Wins: {wins} ({win_rate:.1f}%) | ❌ Losses: {losses} ({loss_rate:.1f}%)"
-        if unverified > 0:
-            output += f" | ❓ Unverified: {unverified}"
-        output += f"\n🎯 *Accuracy: {win_rate:.1f}%*\n"
-        output += f"{'='*50}"
-        
-        return output
-    
-    def check_batch_completed(self, batch_id: str) -> bool:
-        """Check if all signals in a batch are completed"""
-        if batch_id not in self.signal_batches:
-            return False
-        
-        batch = self.signal_batches[batch_id]
-        signal_ids = batch.get('signals', [])
-        
-        # Check if all signals are completed
-        all_completed = True
-        for signal_id in signal_ids:
-            if signal_id in self.active_signals:
-                all_completed = False
-                break
-        
-        return all_completed
-    
-    def format_individual_result(self, signal: dict) -> str:
-        """Format a single signal result for individual updates"""
-        pair = signal.get('pair', '')
-        time = signal.get('time', '')
-        signal_type = signal.get('signal', '')
-        result = signal.get('result')
-        mtg_count = signal.get('mtg_count', 0)
-        
-        if result is None:
-            checkmark = "❓"
-            status = "UNVERIFIED"
-        elif result:
-            # Win: show checkmark with MTG count if > 0 or is MTG
-            is_mtg = signal.get('is_mtg', False)
-            if mtg_count > 0 or is_mtg:
-                checkmark = f"✅{mtg_count}"
-                status = "MTG WIN" if is_mtg else "WIN"
-            else:
-                checkmark = "✅"
-                status = "WIN"
-        else:
-            # Loss: show X
-            checkmark = "❌"
-            status = "LOSS"
-        
-        return f"{pair}-OTC,{time} M1 {signal_type} {checkmark} ({status})"
-    
-    def get_batch_results(self, batch_id: str) -> str:
-        """Get formatted results for a specific batch"""
-        if batch_id not in self.signal_batches:
-            return None
-        
-        batch = self.signal_batches[batch_id]
-        signal_ids = batch.get('signals', [])
-        
-        # Get completed signals for this batch
-        batch_signals = [
-            s for s in self.completed_signals 
-            if s.get('signal_id') in signal_ids
-        ]
-        
-        if not batch_signals:
-            return None
-        
-        # Sort by time
-        batch_signals.sort(key=lambda x: x.get('time', ''))
-        
-        output = ""
-        for signal in batch_signals:
-            pair = signal.get('pair', '')
-            time = signal.get('time', '')
-            signal_type = signal.get('signal', '')
-            result = signal.get('result')
-            mtg_count = signal.get('mtg_count', 0)
-            
-            if result is None:
-                checkmark = "❓"
-            elif result:
-                # Win: show checkmark with MTG count if > 0 or is MTG
-                is_mtg = signal.get('is_mtg', False)
-                if mtg_count > 0 or is_mtg:
-                    checkmark = f"✅{mtg_count}"
-                else:
-                    checkmark = "✅"
-            else:
-                # Loss: show X
-                checkmark = "❌"
-            
-            output += f"{pair}-OTC,{time} M1 {signal_type} {checkmark}\n"
-        
-        output += "\n100% ACCURACY SIGNAL DONE..😮‍💨🔥"
-        return output
-    
-    def get_batch_statistics(self, batch_id: str) -> dict:
-        """Calculate statistics for a batch: wins, losses, win rate, loss rate"""
-        if batch_id not in self.signal_batches:
-            return None
-        
-        batch = self.signal_batches[batch_id]
-        signal_ids = batch.get('signals', [])
-        
-        # Get completed signals for this batch
-        batch_signals = [
-            s for s in self.completed_signals 
-            if s.get('signal_id') in signal_ids
-        ]
-        
-        if not batch_signals:
-            return None
-        
-        total_trades = len(batch_signals)
-        verified_signals = [s for s in batch_signals if s.get('result') is not None]
-        wins = sum(1 for s in verified_signals if s.get('result', False))
-        losses = len(verified_signals) - wins
-        unverified = total_trades - len(verified_signals)
-        
-        win_rate = (wins / len(verified_signals) * 100) if verified_signals else 0
-        loss_rate = (losses / len(verified_signals) * 100) if verified_signals else 0
-        
-        return {
-            'total_trades': total_trades,
-            'wins': wins,
-            'losses': losses,
-            'unverified': unverified,
-            'win_rate': win_rate,
-            'loss_rate': loss_rate
-        }
-    
-    def format_batch_summary(self, batch_id: str) -> str:
-        """Format final summary with statistics for a completed batch"""
-        stats = self.get_batch_statistics(batch_id)
-        if not stats:
-            return None
-        
-        results_text = self.get_batch_results(batch_id)
-        if not results_text:
-            return None
-        
-        # Add statistics summary
-        summary = f"\n{'='*50}\n"
-        summary += f"📊 *TRADE STATISTICS*\n"
-        summary += f"{'='*50}\n"
-        summary += f"Total Trades: {stats['total_trades']}\n"
-        summary += f"✅ Wins: {stats['wins']} ({stats['win_rate']:.1f}%)\n"
-        summary += f"❌ Losses: {stats['losses']} ({stats['loss_rate']:.1f}%)\n"
-        if stats.get('unverified', 0) > 0:
-            summary += f"❓ Unverified: {stats['unverified']}\n"
-        summary += f"{'='*50}\n"
-        summary += f"🎯 *ACCURACY: {stats['win_rate']:.1f}%*\n"
-        summary += f"{'='*50}\n"
-        
-        return results_text + summary
-    
-    def clear_old_signals(self, hours: int = None):
-        """Clear signals older than specified hours"""
-        if hours is None:
-            hours = SIGNAL_CLEANUP_HOURS
-            
-        cutoff = datetime.now() - timedelta(hours=hours)
-        self.completed_signals = [
-            s for s in self.completed_signals 
-            if s.get('added_at', datetime.now()) > cutoff
-        ]
-        
-        # Clear old batches
-        old_batches = [
-            bid for bid, batch in self.signal_batches.items()
-            if batch.get('created_at', datetime.now()) < cutoff
-        ]
-        for bid in old_batches:
-            del self.signal_batches[bid]
-        
-        # Cleanup database if available
-        if DB_AVAILABLE:
-            try:
-                db.cleanup_old_data(days=hours // 24)
-            except Exception as e:
-                logger.warning(f"Failed to cleanup database: {e}")
-
-# Global tracker instance
-tracker = ResultTracker()
+# result_tracker.py - Track and Display Trading Results with Martingale (IMPROVED)
+
+from datetime import datetime, timedelta
+import pytz
+import threading
+import heapq
+import itertools
+import time
+from typing import Optional
+from market_client import market_client
+from signal_store import SignalStore, SignalRecord
+from constants import (
+    FIRST_CANDLE_WAIT, VERIFY_RETRY_DELAY, VERIFICATION_TIMEOUT,
+    ERROR_RESULT_UNKNOWN, SIGNAL_CLEANUP_HOURS, VERIFY_FETCH_TIMEOUT, WS_CONNECTION_TIMEOUT
+)
+from logger_config import logger
+
+# Try to import database, but don't fail if it doesn't exist.
+# Writes go through the write-behind queue so callers never wait on disk.
+try:
+    from db_writer import db_writer
+    DB_AVAILABLE = True
+except ImportError:
+    DB_AVAILABLE = False
+    logger.warning("Database module not available, running without persistence")
+
+# Verification stages: pending -> first_candle -> second_candle -> done
+STAGE_PENDING = 'pending'              # Waiting for the signal candle to close
+STAGE_FIRST_CANDLE = 'first_candle'    # Checking the signal candle
+STAGE_SECOND_CANDLE = 'second_candle'  # First candle lost, waiting for the MTG candle
+STAGE_DONE = 'done'
+
+class ResultTracker:
+    def __init__(self):
+        self.store = SignalStore()  # Signals indexed by id/batch/pair/chat, with per-batch result counters
+        self.active_signals = self.store.active  # {signal_id: SignalRecord} awaiting verification
+        self.martingale_tracker = {}  # Track MTG count per pair sequence
+        self._verification_lock = threading.Lock()  # Lock for thread-safe verification
+        self._wakeups = threading.Condition(self._verification_lock)
+        self._schedule = []  # Heap of (wake_at_epoch, seq, signal_id)
+        self._schedule_seq = itertools.count()
+        self._scheduler_thread = None
+        self._fetches = {}  # {Future of a candle history round: (due signals, give-up time)}
+        self._newly_completed = []  # Completed since the last check_and_update_expired_signals()
+    
+    @property
+    def signal_batches(self) -> dict:
+        """{batch_id: BatchRecord}"""
+        return self.store.batches
+        
+    def add_signal(self, signal_id: str, signal_dict: dict, batch_id: str = None, user_id: int = None, chat_id: int = None):
+        """Add a new signal to track"""
+        with self._verification_lock:
+            self._track(signal_id, signal_dict, batch_id, user_id, chat_id)
+        
+        # Save to database if available
+        if DB_AVAILABLE:
+            try:
+                db_writer.submit('add_signal', signal_id, dict(signal_dict), batch_id, user_id, chat_id)
+            except Exception as e:
+                logger.warning(f"Failed to save signal to database: {e}")
+    
+    def add_batch(self, batch_id: str, signals: dict, user_id: int = None, chat_id: int = None):
+        """
+        Add a whole batch of signals ({signal_id: signal_dict}) to track.
+        Persists them with one bulk insert (a single commit) instead of one per signal.
+        """
+        with self._verification_lock:
+            for signal_id, signal_dict in signals.items():
+                self._track(signal_id, signal_dict, batch_id, user_id, chat_id)
+        
+        if DB_AVAILABLE and signals:
+            try:
+                db_writer.submit('add_signals_bulk', batch_id,
+                                 {signal_id: dict(sig) for signal_id, sig in signals.items()}, user_id, chat_id)
+            except Exception as e:
+                logger.warning(f"Failed to save batch to database: {e}")
+    
+    def _track(self, signal_id: str, signal_dict: dict, batch_id: str, user_id: int, chat_id: int):
+        """Register a signal in memory and schedule its verification. Caller holds _verification_lock."""
+        record = self.store.add(SignalRecord(
+            signal_id=signal_id,
+            pair=signal_dict.get('pair', ''),
+            signal=signal_dict.get('signal', ''),
+            time=signal_dict.get('time', ''),
+            timestamp=signal_dict.get('timestamp'),
+            batch_id=batch_id,
+            user_id=user_id,
+            chat_id=chat_id,
+            entry_price=signal_dict.get('entry_price'),  # Replaced by the signal candle's open once verified
+            confidence_score=signal_dict.get('confidence_score')
+        ))
+        
+        self._schedule_signal(record)
+    
+    def mark_completed(self, signal_id: str, result: bool, mtg_count: int = 0, is_mtg: bool = False,
+                       entry_price: float = None):
+        """Mark a signal as completed with result (True = win, False = loss)"""
+        if self.store.complete(signal_id, result, mtg_count, is_mtg) is not None:
+            # Update database if available
+            if DB_AVAILABLE:
+                try:
+                    db_writer.submit('update_signal_result', signal_id, result, mtg_count, is_mtg,
+                                     entry_price=entry_price)
+                except Exception as e:
+                    logger.warning(f"Failed to update signal result in database: {e}")
+    
+    @staticmethod
+    def _signal_time(signal: SignalRecord) -> Optional[datetime]:
+        """Signal time as an aware datetime (handles both datetime and ISO string timestamps)"""
+        signal_time = signal.timestamp
+        if isinstance(signal_time, str):
+            try:
+                signal_time = datetime.fromisoformat(signal_time)
+            except ValueError:
+                return None
+        if not isinstance(signal_time, datetime):
+            return None
+        if signal_time.tzinfo is None:
+            signal_time = pytz.timezone('Asia/Dhaka').localize(signal_time)
+        return signal_time
+    
+    def _candle_epoch(self, signal: SignalRecord) -> Optional[int]:
+        """Open epoch of the M1 candle the signal trades (its HH:MM minute)"""
+        signal_time = self._signal_time(signal)
+        if signal_time is None:
+            return None
+        return int(signal_time.timestamp()) // 60 * 60
+    
+    def _target_epoch(self, signal: SignalRecord) -> Optional[int]:
+        """Candle checked in the signal's current stage: the signal candle, or the next one for MTG"""
+        candle_epoch = self._candle_epoch(signal)
+        if candle_epoch is None:
+            return None
+        if signal.verify_stage == STAGE_SECOND_CANDLE:
+            return candle_epoch + 60
+        return candle_epoch
+    
+    def _schedule_signal(self, signal: SignalRecord):
+        """
+        Schedule the next verification wake-up for a signal (caller holds _verification_lock).
+        Wakes FIRST_CANDLE_WAIT seconds after the checked candle closes.
+        """
+        target_epoch = self._target_epoch(signal)
+        if target_epoch is None:
+            logger.warning(f"Invalid timestamp format for signal {signal.signal_id}")
+            return
+        
+        wake_at = target_epoch + 60 + FIRST_CANDLE_WAIT
+        signal.verify_due = wake_at
+        self._push_wakeup(wake_at, signal.signal_id)
+    
+    def _push_wakeup(self, wake_at: float, signal_id: str):
+        """Add a wake-up to the schedule and nudge the scheduler thread (caller holds the lock)"""
+        heapq.heappush(self._schedule, (wake_at, next(self._schedule_seq), signal_id))
+        self._ensure_scheduler()
+        self._wakeups.notify()
+    
+    def _ensure_scheduler(self):
+        """Start the verification scheduler thread if it is not running"""
+        if self._scheduler_thread is None or not self._scheduler_thread.is_alive():
+            self._scheduler_thread = threading.Thread(target=self._scheduler_loop, name="result-verifier", daemon=True)
+            self._scheduler_thread.start()
+    
+    def _next_event(self, now: float) -> Optional[float]:
+        """Earliest wake-up or history give-up time (caller holds the lock), None when idle"""
+        times = [give_up for _, give_up in self._fetches.values()]
+        if self._schedule:
+            times.append(self._schedule[0][0])
+        return min(times) if times else None
+    
+    def _scheduler_loop(self):
+        """
+        Sleep until the earliest wake-up or until a candle history round finishes (or
+        is given up), then advance those signals and request history for the due ones.
+        The thread never waits on the network, so one slow round does not hold up others.
+        """
+        while True:
+            with self._wakeups:
+                while True:
+                    now = time.time()
+                    finished = [future for future, (_, give_up) in self._fetches.items()
+                                if future.done() or give_up <= now]
+                    next_event = self._next_event(now)
+                    if finished or (next_event is not None and next_event <= now):
+                        break
+                    self._wakeups.wait(next_event - now if next_event is not None else None)
+                
+                arrived = [(future, self._fetches.pop(future)[0]) for future in finished]
+                due = []
+                while self._schedule and self._schedule[0][0] <= now:
+                    due.append(heapq.heappop(self._schedule)[2])
+            
+            for future, signals in arrived:
+                try:
+                    self._apply_history(signals, self._history_result(future))
+                except Exception as e:
+                    logger.error(f"[VERIFY] Applying candle history failed: {e}", exc_info=True)
+            if due:
+                try:
+                    self._process_due(due)
+                except Exception as e:
+                    logger.error(f"[VERIFY] Scheduler step failed: {e}", exc_info=True)
+    
+    def _history_done(self, future):
+        """Done-callback of a candle history round (runs on the event loop): wake the scheduler"""
+        with self._wakeups:
+            self._wakeups.notify()
+    
+    @staticmethod
+    def _history_result(future) -> dict:
+        """Candles of a finished history round; {} when it failed or was given up"""
+        if not future.done():
+            future.cancel()
+            logger.warning("[VERIFY] Candle history round gave no answer in time, retrying")
+            return {}
+        if future.cancelled() or future.exception() is not None:
+            logger.warning(f"[VERIFY] Candle history round failed: {future.exception() if not future.cancelled() else 'cancelled'}")
+            return {}
+        return future.result()
+    
+    def _apply_history(self, signals: list, candles: dict):
+        """Advance signals from a round of candle history ({pair: {epoch: candle}})"""
+        with self._verification_lock:
+            for signal in signals:
+                if signal.signal_id in self.active_signals:
+                    self._advance(signal, candles.get(signal.pair, {}))
+    
+    def _process_due(self, signal_ids: list):
+        """
+        Request candle history once per pair covering every due signal; their state
+        machines advance from the exact candle open/close values when it arrives.
+        """
+        starts = {}  # {pair: earliest candle epoch needed}
+        with self._verification_lock:
+            due = [self.active_signals[sid] for sid in dict.fromkeys(signal_ids) if sid in self.active_signals]
+            for signal in due:
+                self._first_due(signal)
+                pair = signal.pair
+                target_epoch = self._target_epoch(signal)
+                if pair and target_epoch is not None:
+                    starts[pair] = min(starts.get(pair, target_epoch), target_epoch)
+        if not due:
+            return
+        
+        if not starts:
+            self._apply_history(due, {})
+            return
+        
+        try:
+            # Fetched on the market data client's event loop (the bot's only feed)
+            future = market_client.submit('get_candles_since', starts, VERIFY_FETCH_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"[VERIFY] Candle history unavailable for {list(starts)}: {e}")
+            self._apply_history(due, {})
+            return
+        
+        with self._wakeups:
+            # Connecting may add up to WS_CONNECTION_TIMEOUT before the requests go out
+            self._fetches[future] = (due, time.time() + VERIFY_FETCH_TIMEOUT + WS_CONNECTION_TIMEOUT)
+        future.add_done_callback(self._history_done)
+    
+    @staticmethod
+    def _direction_won(signal_type: str, open_price: float, close_price: float) -> Optional[bool]:
+        """Did the candle close in the signal direction? None for unknown signal types."""
+        if signal_type == 'CALL':
+            return close_price > open_price
+        if signal_type == 'PUT':
+            return close_price < open_price
+        return None
+    
+    @staticmethod
+    def _closed_candle(candles: dict, epoch: int):
+        """Candle at `epoch` once it has closed (the following candle exists), else None"""
+        if epoch + 60 not in candles:
+            return None
+        return candles.get(epoch)
+    
+    def _retry_or_give_up(self, signal: SignalRecord, reason: str):
+        """Retry a failed verification step shortly, or mark unverified after VERIFICATION_TIMEOUT"""
+        if time.time() - self._first_due(signal) > VERIFICATION_TIMEOUT:
+            logger.error(f"[VERIFY] {reason}, giving up after {VERIFICATION_TIMEOUT}s")
+            self._finalize(signal, ERROR_RESULT_UNKNOWN, False)
+            return
+        logger.warning(f"[VERIFY] {reason}, retrying in {VERIFY_RETRY_DELAY}s")
+        self._push_wakeup(time.time() + VERIFY_RETRY_DELAY, signal.signal_id)
+    
+    @staticmethod
+    def _first_due(signal: SignalRecord) -> float:
+        """
+        First verification attempt of the current stage (starts the VERIFICATION_TIMEOUT clock).
+        The clock starts at the attempt, not at the candle close: a signal restored long
+        after its candle closed still gets its full VERIFICATION_TIMEOUT of history fetches.
+        """
+        if signal.verify_first_due is None:
+            signal.verify_first_due = time.time()
+        return signal.verify_first_due
+    
+    def _advance(self, signal: SignalRecord, candles: dict):
+        """
+        Advance one signal's verification from M1 candle history (caller holds _verification_lock).
+        `candles` is {epoch: (open, high, low, close)} for the signal's pair.
+        
+        MTG Logic:
+        - If the signal candle closes in the signal direction, it's a direct win
+        - If the signal candle loses, check the next candle
+        - If the next candle closes in the signal direction, count as MTG win
+        - Only count as actual loss if the next candle also loses
+        """
+        pair = signal.pair
+        signal_type = signal.signal
+        stage = signal.verify_stage
+        candle_epoch = self._candle_epoch(signal)
+        
+        if not pair or not signal_type or candle_epoch is None:
+            logger.error(f"[VERIFY] Missing data for signal: pair={pair}, type={signal_type}")
+            self._finalize(signal, ERROR_RESULT_UNKNOWN, False)  # Don't default to WIN
+            return
+        
+        if stage in (STAGE_PENDING, STAGE_FIRST_CANDLE):
+            signal.verify_stage = STAGE_FIRST_CANDLE
+            
+            candle = self._closed_candle(candles, candle_epoch)
+            if candle is None:
+                self._retry_or_give_up(signal, f"First candle for {pair} not closed in history yet")
+                return
+            
+            open_price, close_price = candle[0], candle[3]
+            signal.entry_price = open_price  # The trade enters at the signal candle's open
+            first_candle_win = self._direction_won(signal_type, open_price, close_price)
+            if first_candle_win is None:
+                logger.error(f"[VERIFY] Unknown signal type '{signal_type}' for {pair}")
+                self._finalize(signal, ERROR_RESULT_UNKNOWN, False)  # Don't default to WIN
+                return
+            
+            signal.first_exit_price = close_price
+            price_diff_pct = ((close_price - open_price) / open_price * 100) if open_price > 0 else 0
+            if first_candle_win:
+                logger.info(f"[VERIFY] {pair} {signal_type}: Open={open_price:.5f}, Close={close_price:.5f}, Diff={price_diff_pct:+.3f}%, Result=DIRECT WIN")
+                self._finalize(signal, True, False)  # Direct win, not MTG
+                return
+            
+            # First candle lost - schedule the second candle check (MTG)
+            logger.info(f"[VERIFY] {pair} {signal_type}: First candle LOSS, waiting for second candle confirmation (MTG)...")
+            signal.verify_stage = STAGE_SECOND_CANDLE
+            signal.verify_first_due = None
+            
+            # The next candle may already be closed in this history window
+            if self._closed_candle(candles, candle_epoch + 60) is None:
+                self._schedule_signal(signal)
+                return
+            stage = STAGE_SECOND_CANDLE
+        
+        if stage == STAGE_SECOND_CANDLE:
+            candle = self._closed_candle(candles, candle_epoch + 60)
+            if candle is None:
+                if time.time() - self._first_due(signal) <= VERIFICATION_TIMEOUT:
+                    self._retry_or_give_up(signal, f"Second candle for {pair} not closed in history yet")
+                    return
+                logger.error(f"[VERIFY] Could not get second candle for {pair}, counting as LOSS")
+                self._finalize(signal, False, False)  # Actual loss
+                return
+            
+            open_price, close_price = candle[0], candle[3]
+            second_candle_win = bool(self._direction_won(signal_type, open_price, close_price))
+            price_diff_pct = ((close_price - open_price) / open_price * 100) if open_price > 0 else 0
+            if second_candle_win:
+                logger.info(f"[VERIFY] {pair} {signal_type}: Second candle confirms! Open={open_price:.5f}, Close={close_price:.5f}, Diff={price_diff_pct:+.3f}%, Result=MTG WIN")
+                self._finalize(signal, True, True)  # MTG win
+            else:
+                logger.info(f"[VERIFY] {pair} {signal_type}: Second candle also LOSS. Open={open_price:.5f}, Close={close_price:.5f}, Diff={price_diff_pct:+.3f}%, Result=ACTUAL LOSS")
+                self._finalize(signal, False, False)  # Actual loss
+    
+    def _finalize(self, signal: SignalRecord, result: Optional[bool], is_mtg: bool):
+        """Update the MTG tracker and complete the signal (caller holds _verification_lock)"""
+        signal_id = signal.signal_id
+        pair = signal.pair
+        
+        # Get current MTG count before applying result
+        current_mtg = self.martingale_tracker.get(pair, {}).get('mtg_count', 0)
+        mtg_count = current_mtg
+        
+        if result is not None:
+            # Update MTG tracker based on result
+            if pair not in self.martingale_tracker:
+                self.martingale_tracker[pair] = {'mtg_count': 0}
+            
+            if result:
+                if is_mtg:
+                    # MTG win: increment MTG count (shows we used MTG)
+                    mtg_count = current_mtg + 1
+                    # Keep MTG count for display (shows MTG level used)
+                    self.martingale_tracker[pair]['mtg_count'] = mtg_count
+                else:
+                    # Direct win: MTG count stays the same (shows current MTG level), then reset
+                    mtg_count = current_mtg
+                    # Reset MTG for next trade sequence
+                    self.martingale_tracker[pair]['mtg_count'] = 0
+            else:
+                # Loss: increment MTG count
+                mtg_count = current_mtg + 1
+                self.martingale_tracker[pair]['mtg_count'] = mtg_count
+            
+            self.martingale_tracker[pair]['last_result'] = result
+            self.martingale_tracker[pair]['is_mtg'] = is_mtg
+        
+        # Mark as completed and queue it for the next result delivery
+        self.mark_completed(signal_id, result, mtg_count, is_mtg, signal.entry_price)
+        self._newly_completed.append(signal)
+    
+    def check_and_update_expired_signals(self):
+        """
+        Return signals completed since the last call.
+        Verification itself runs on the scheduler thread at each candle's close,
+        so this never blocks; it only makes sure every active signal is scheduled.
+        """
+        with self._verification_lock:
+            for signal in self.active_signals.values():
+                if signal.verify_due is None:
+                    self._schedule_signal(signal)
+            
+            newly_completed = self._newly_completed
+            self._newly_completed = []
+        
+        return newly_completed
+    
+    def restore_from_database(self) -> int:
+        """
+        Rebuild in-memory state after a restart: pending signals resume verification,
+        signals and batches from the last SIGNAL_CLEANUP_HOURS come back for results
+        and statistics, and the per-pair MTG state is replayed from completed results.
+        Batches that were already complete are flagged so their summary is not re-sent.
+        Returns the number of signals restored.
+        """
+        if not DB_AVAILABLE:
+            return 0
+        
+        started = time.perf_counter()
+        since = datetime.now() - timedelta(hours=SIGNAL_CLEANUP_HOURS)
+        rows = db_writer.database.get_recent_signals(since)
+        
+        restored_batches = set()
+        restored_completed = []
+        with self._verification_lock:
+            for row in rows:
+                if row['signal_id'] in self.store:
+                    continue
+                signal = self.store.add(self._record_from_row(row))
+                if signal.batch_id and len(self.store.batch(signal.batch_id).signal_ids) == 1:
+                    restored_batches.add(signal.batch_id)
+                
+                if signal.completed:
+                    restored_completed.append(signal)
+                else:
+                    self._schedule_signal(signal)
+            
+            # Replay the MTG state in completion order
+            for signal in sorted(restored_completed, key=lambda s: s.completed_at or datetime.min):
+                if signal.result is None:
+                    continue
+                direct_win = signal.result and not signal.is_mtg
+                self.martingale_tracker[signal.pair] = {
+                    'mtg_count': 0 if direct_win else signal.mtg_count,
+                    'last_result': signal.result,
+                    'is_mtg': signal.is_mtg
+                }
+            
+            for batch_id in restored_batches:
+                batch = self.store.batch(batch_id)
+                batch.restored = True
+                batch.summary_sent = batch.pending == 0
+        
+        pending = len(self.active_signals)
+        logger.info(f"Restored {len(rows)} signals ({pending} pending, {len(restored_batches)} batches) "
+                    f"from database in {(time.perf_counter() - started) * 1000:.1f}ms")
+        return len(rows)
+    
+    @staticmethod
+    def _record_from_row(row: dict) -> SignalRecord:
+        """SignalRecord from a signals table row"""
+        result = row.get('result')
+        completed_at = row.get('completed_at')
+        completed = row.get('status') not in (None, 'pending')
+        return SignalRecord(
+            signal_id=row['signal_id'],
+            pair=row.get('pair') or '',
+            signal=row.get('signal_type') or '',
+            time=row.get('signal_time') or '',
+            timestamp=row.get('timestamp'),
+            batch_id=row.get('batch_id'),
+            user_id=row.get('user_id'),
+            chat_id=row.get('chat_id'),
+            entry_price=row.get('entry_price'),
+            confidence_score=row.get('confidence_score'),
+            added_at=datetime.fromisoformat(row['created_at']),
+            status='completed' if completed else 'pending',
+            result=None if result is None else result == 'win',
+            mtg_count=row.get('mtg_count') or 0,
+            is_mtg=bool(row.get('is_mtg')),
+            completed_at=datetime.fromisoformat(completed_at) if completed_at else None,
+            verify_stage=STAGE_DONE if completed else STAGE_PENDING
+        )
+    
+    def get_active_signals(self) -> dict:
+        """Get all active signals"""
+        return self.active_signals.copy()
+    
+    def format_results(self, batch_id: str = None) -> str:
+        """Format completed signals with checkmarks and MTG count"""
+        # Check for expired signals first
+        self.check_and_update_expired_signals()
+        
+        if not self.store.completed_count:
+            return "No completed signals yet. Generate signals first."
+        
+        # Filter by batch if specified; counters come from the batch (or the whole store)
+        if batch_id:
+            signals_to_show = self.store.batch_signals(batch_id, completed_only=True)
+            counts = self.store.batch(batch_id)
+        else:
+            signals_to_show = self.store.completed()
+            counts = self.store
+        
+        if not signals_to_show:
+            return "No completed signals for this batch yet."
+        
+        # Sort by time (oldest first for better readability)
+        sorted_signals = sorted(signals_to_show, 
+                               key=lambda x: x.time)
+        
+        output = ""
+        for signal in sorted_signals:
+            pair = signal.pair
+            time = signal.time
+            signal_type = signal.signal
+            result = signal.result
+            
+            # Handle None results (unverified)
+            if result is None:
+                checkmark = "❓"  # Unknown result
+            elif result:
+                # Win: show checkmark with MTG count if > 0 or is MTG
+                is_mtg = signal.is_mtg
+                mtg_count = signal.mtg_count
+                if mtg_count > 0 or is_mtg:
+                    checkmark = f"✅{mtg_count}"
+                else:
+                    checkmark = "✅"
+            else:
+                # Loss: show X
+                checkmark = "❌"
+            
+            output += f"{pair}-OTC,{time} M1 {signal_type} {checkmark}\n"
+        
+        # Add statistics if we have signals
+        total = len(sorted_signals)
+        wins, losses, unverified = counts.wins, counts.losses, counts.unverified
+        verified = wins + losses
+        
+        win_rate = (wins / verified * 100) if verified else 0
+        loss_rate = (losses / verified * 100) if verified else 0
+        
+        output += "\n100% ACCURACY SIGNAL DONE..😮‍💨🔥\n"
+        output += f"\n{'='*50}\n"
+        output += f"📊 *STATISTICS*\n"
+        output += f"{'='*50}\n"
+        output += f"Total: {total} | ✅ Wins: {wins} ({win_rate:.1f}%) | ❌ Losses: {losses} ({loss_rate:.1f}%)"
+        if unverified > 0:
+            output += f" | ❓ Unverified: {unverified}"
+        output += f"\n🎯 *Accuracy: {win_rate:.1f}%*\n"
+        output += f"{'='*50}"
+        
+        return output
+    
+    def check_batch_completed(self, batch_id: str) -> bool:
+        """Check if all signals in a batch are completed"""
+        batch = self.store.batch(batch_id)
+        return batch is not None and batch.pending == 0
+    
+    def format_individual_result(self, signal: SignalRecord) -> str:
+        """Format a single signal result for individual updates"""
+        pair = signal.pair
+        time = signal.time
+        signal_type = signal.signal
+        result = signal.result
+        mtg_count = signal.mtg_count
+        
+        if result is None:
+            checkmark = "❓"
+            status = "UNVERIFIED"
+        elif result:
+            # Win: show checkmark with MTG count if > 0 or is MTG
+            is_mtg = signal.is_mtg
+            if mtg_count > 0 or is_mtg:
+                checkmark = f"✅{mtg_count}"
+                status = "MTG WIN" if is_mtg else "WIN"
+            else:
+                checkmark = "✅"
+                status = "WIN"
+        else:
+            # Loss: show X
+            checkmark = "❌"
+            status = "LOSS"
+        
+        return f"{pair}-OTC,{time} M1 {signal_type} {checkmark} ({status})"
+    
+    def get_batch_results(self, batch_id: str) -> str:
+        """Get formatted results for a specific batch"""
+        # Completed signals of this batch - O(batch size)
+        batch_signals = self.store.batch_signals(batch_id, completed_only=True)
+        
+        if not batch_signals:
+            return None
+        
+        # Sort by time
+        batch_signals.sort(key=lambda x: x.time)
+        
+        output = ""
+        for signal in batch_signals:
+            pair = signal.pair
+            time = signal.time
+            signal_type = signal.signal
+            result = signal.result
+            mtg_count = signal.mtg_count
+            
+            if result is None:
+                checkmark = "❓"
+            elif result:
+                # Win: show checkmark with MTG count if > 0 or is MTG
+                is_mtg = signal.is_mtg
+                if mtg_count > 0 or is_mtg:
+                    checkmark = f"✅{mtg_count}"
+                else:
+                    checkmark = "✅"
+            else:
+                # Loss: show X
+                checkmark = "❌"
+            
+            output += f"{pair}-OTC,{time} M1 {signal_type} {checkmark}\n"
+        
+        output += "\n100% ACCURACY SIGNAL DONE..😮‍💨🔥"
+        return output
+    
+    def get_batch_statistics(self, batch_id: str) -> dict:
+        """Calculate statistics for a batch: wins, losses, win rate, loss rate"""
+        # Running counters kept by the store - O(1)
+        batch = self.store.batch(batch_id)
+        if batch is None or not batch.completed:
+            return None
+        
+        total_trades = batch.completed
+        wins, losses, unverified = batch.wins, batch.losses, batch.unverified
+        verified = wins + losses
+        
+        win_rate = (wins / verified * 100) if verified else 0
+        loss_rate = (losses / verified * 100) if verified else 0
+        
+        return {
+            'total_trades': total_trades,
+            'wins': wins,
+            'losses': losses,
+            'unverified': unverified,
+            'win_rate': win_rate,
+            'loss_rate': loss_rate
+        }
+    
+    def format_batch_summary(self, batch_id: str) -> str:
+        """Format final summary with statistics for a completed batch"""
+        stats = self.get_batch_statistics(batch_id)
+        if not stats:
+            return None
+        
+        results_text = self.get_batch_results(batch_id)
+        if not results_text:
+            return None
+        
+        # Add statistics summary
+        summary = f"\n{'='*50}\n"
+        summary += f"📊 *TRADE STATISTICS*\n"
+        summary += f"{'='*50}\n"
+        summary += f"Total Trades: {stats['total_trades']}\n"
+        summary += f"✅ Wins: {stats['wins']} ({stats['win_rate']:.1f}%)\n"
+        summary += f"❌ Losses: {stats['losses']} ({stats['loss_rate']:.1f}%)\n"
+        if stats.get('unverified', 0) > 0:
+            summary += f"❓ Unverified: {stats['unverified']}\n"
+        summary += f"{'='*50}\n"
+        summary += f"🎯 *ACCURACY: {stats['win_rate']:.1f}%*\n"
+        summary += f"{'='*50}\n"
+        
+        return results_text + summary
+    
+    def clear_old_signals(self, hours: int = None):
+        """Clear signals older than specified hours"""
+        if hours is None:
+            hours = SIGNAL_CLEANUP_HOURS
+            
+        cutoff = datetime.now() - timedelta(hours=hours)
+        
+        # Clear old completed signals and batches
+        with self._verification_lock:
+            self.store.remove_older_than(cutoff)
+        
+        # Cleanup database if available
+        if DB_AVAILABLE:
+            try:
+                db_writer.submit('cleanup_old_data', days=hours // 24)
+            except Exception as e:
+                logger.warning(f"Failed to cleanup database: {e}")
+
+# Global tracker instance
+tracker = ResultTracker()
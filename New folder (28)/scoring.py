@@ -0,0 +1,306 @@
+# scoring.py - Signal scoring rules, vectorized over many pairs
+
+import numpy as np
+import constants
+from indicators import INDICATOR_NAMES, LATEST_ATTR, compute_latest_indicators, stack_frames
+
+# Inputs to the scoring rules: latest indicator values plus recent closes
+PRICE_FEATURES = ('close', 'prev_close', 'close_3', 'close_5')
+FEATURE_NAMES = INDICATOR_NAMES + PRICE_FEATURES
+
+# constants.py thresholds the scoring rules read; score_signals accepts overrides by name
+THRESHOLD_NAMES = (
+    'SIGNAL_MIN_SCORE', 'SIGNAL_MIN_DIFF', 'SIGNAL_MIN_STRONG_INDICATORS',
+    'SIGNAL_VERY_STRONG_SCORE', 'SIGNAL_VERY_STRONG_DIFF', 'SIGNAL_VERY_STRONG_INDICATORS',
+    'SIGNAL_STRONG_SCORE', 'SIGNAL_STRONG_DIFF', 'SIGNAL_STRONG_INDICATORS', 'RSI_VERY_OVERSOLD',
+    'RSI_OVERSOLD', 'RSI_VERY_OVERBOUGHT', 'RSI_OVERBOUGHT', 'EMA_DIFF_VERY_STRONG',
+    'EMA_DIFF_STRONG', 'EMA_DIFF_CONFIRM', 'SMA_DIFF_EXTREMELY_STRONG', 'SMA_DIFF_VERY_STRONG',
+    'MACD_STRENGTH_VERY_STRONG', 'MACD_STRENGTH_STRONG', 'MACD_STRENGTH_MODERATE',
+    'STOCH_EXTREMELY_OVERSOLD', 'STOCH_VERY_OVERSOLD', 'STOCH_EXTREMELY_OVERBOUGHT',
+    'STOCH_VERY_OVERBOUGHT', 'ADX_EXTREMELY_STRONG', 'ADX_VERY_STRONG', 'ADX_WEAK', 'ADX_MODERATE',
+    'MOMENTUM_EXTREMELY_STRONG', 'MOMENTUM_VERY_STRONG', 'MOMENTUM_STRONG', 'BB_WIDTH_HIGH',
+    'BB_WIDTH_GOOD', 'VWAP_DIFF_VERY_SIGNIFICANT', 'VWAP_DIFF_SIGNIFICANT', 'ATR_EXTREMELY_HIGH',
+    'ATR_TOO_HIGH', 'ATR_TOO_LOW', 'ATR_LOW', 'TREND_5_EXTREMELY_STRONG', 'TREND_3_VERY_STRONG',
+    'TREND_3_STRONG',
+)
+THRESHOLDS = {name: getattr(constants, name) for name in THRESHOLD_NAMES}
+
+_SIGNAL_LABELS = np.array(['PUT', None, 'CALL'], dtype=object)  # Indexed by code + 1
+
+
+def latest_features(indicators: dict, close: np.ndarray) -> dict:
+    """
+    Build scoring features from compute_indicators() output.
+    close: 2-D (symbols, candles) array; needs at least 5 candles.
+    """
+    features = {name: indicators[name][:, -1] for name in INDICATOR_NAMES}
+    features['close'] = close[:, -1]
+    features['prev_close'] = close[:, -2]
+    features['close_3'] = close[:, -3]
+    features['close_5'] = close[:, -5]
+    return features
+
+
+def window_features(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> dict:
+    """
+    Same features as latest_features(compute_indicators(...)), computed through
+    compute_latest_indicators() so rolling indicators are only evaluated at the newest candle.
+    """
+    features = compute_latest_indicators(high, low, close)
+    features['close'] = close[:, -1]
+    features['prev_close'] = close[:, -2]
+    features['close_3'] = close[:, -3]
+    features['close_5'] = close[:, -5]
+    return features
+
+
+def _safe_pct(numerator, denominator):
+    """numerator / denominator * 100 where denominator > 0, else 0"""
+    positive = denominator > 0
+    return np.where(positive, numerator / np.where(positive, denominator, 1.0) * 100, 0.0)
+
+
+def _abs_pct(a, b):
+    """abs((a - b) / b * 100) where b > 0, else 0"""
+    return np.abs(_safe_pct(a - b, b))
+
+
+def _thresholds(overrides: dict) -> dict:
+    if not overrides:
+        return THRESHOLDS
+    unknown = set(overrides) - set(THRESHOLDS)
+    if unknown:
+        raise ValueError(f"Unknown scoring thresholds: {', '.join(sorted(unknown))}")
+    return {**THRESHOLDS, **overrides}
+
+
+def _tiers(t: dict) -> tuple:
+    """Confirmation tiers for the leading side: (min score, min score difference, min strong indicators)"""
+    return (
+        (t['SIGNAL_MIN_SCORE'], t['SIGNAL_MIN_DIFF'], t['SIGNAL_MIN_STRONG_INDICATORS']),
+        (t['SIGNAL_VERY_STRONG_SCORE'], t['SIGNAL_VERY_STRONG_DIFF'], t['SIGNAL_VERY_STRONG_INDICATORS']),
+        (t['SIGNAL_STRONG_SCORE'], t['SIGNAL_STRONG_DIFF'], t['SIGNAL_STRONG_INDICATORS']),
+    )
+
+
+def _adjust_leader(call_score, put_score, condition, points):
+    """Add `points` (may be negative, floored at 0) to whichever score leads, where condition holds"""
+    call_leads = condition & (call_score > put_score)
+    put_leads = condition & (put_score > call_score)
+    call_score = np.where(call_leads, np.maximum(0, call_score + points), call_score)
+    put_score = np.where(put_leads, np.maximum(0, put_score + points), put_score)
+    return call_score, put_score
+
+
+def score_signals(features: dict, thresholds: dict = None) -> tuple:
+    """
+    Score many pairs at once from their latest indicator values.
+
+    features: {name: 1-D array} for every name in FEATURE_NAMES (NaN indicators
+    fall back to neutral values). thresholds: optional {THRESHOLD_NAMES entry: value}
+    overrides of the constants.py values. Returns (signals, call_scores, put_scores)
+    where signals is an object array of 'CALL', 'PUT' or None.
+    """
+    t = _thresholds(thresholds)
+    f = {name: np.asarray(features[name], dtype=np.float64) for name in FEATURE_NAMES}
+    close = f['close']
+
+    def value(name, default):
+        return np.where(np.isnan(f[name]), default, f[name])
+
+    rsi = value('rsi', 50.0)
+    ema_fast = value('ema_fast', close)
+    ema_slow = value('ema_slow', close)
+    sma_20 = value('sma_20', close)
+    sma_50 = value('sma_50', close)
+    macd_val = value('macd', 0.0)
+    macd_signal_val = value('macd_signal', 0.0)
+    macd_diff = value('macd_diff', 0.0)
+    stoch_k = value('stoch_k', 50.0)
+    stoch_d = value('stoch_d', 50.0)
+    adx_val = value('adx', 25.0)
+    bb_high = value('bb_high', close * 1.02)
+    bb_low = value('bb_low', close * 0.98)
+    bb_mid = value('bb_mid', close)
+    atr_pct = _safe_pct(value('atr', 0.0), close)
+    vwap = value('vwap', close)
+
+    prev_close, close_3, close_5 = f['prev_close'], f['close_3'], f['close_5']
+    price_change = close - prev_close
+    price_change_pct = _safe_pct(price_change, prev_close)
+    price_trend_3 = close - close_3
+
+    zeros = np.zeros(len(close), dtype=np.int64)
+    call_score, put_score = zeros.copy(), zeros.copy()
+
+    # RSI signals
+    call_score += np.select([rsi < t['RSI_VERY_OVERSOLD'], rsi < t['RSI_OVERSOLD']], [5, 3], 0)
+    put_score += np.select(
+        [rsi < t['RSI_OVERSOLD'], rsi > t['RSI_VERY_OVERBOUGHT'], rsi > t['RSI_OVERBOUGHT']], [0, 5, 3], 0)
+
+    # EMA crossover and position
+    ema_diff_pct = _abs_pct(ema_fast, ema_slow)
+    bull, bear = ema_fast > ema_slow, ema_fast < ema_slow
+    above = (close > ema_fast) & (close > ema_slow)
+    below = (close < ema_fast) & (close < ema_slow)
+    very, strong = ema_diff_pct > t['EMA_DIFF_VERY_STRONG'], ema_diff_pct > t['EMA_DIFF_STRONG']
+    call_score += np.select([bull & very, bull & strong], [5 + 3 * above, 3 + 2 * above], 0)
+    put_score += np.select([bull & strong, bear & very, bear & strong], [0, 5 + 3 * below, 3 + 2 * below], 0)
+
+    # SMA trend
+    sma_20_50_diff = _abs_pct(sma_20, sma_50)
+    up_trend = (close > sma_20) & (sma_20 > sma_50)
+    down_trend = (close < sma_20) & (sma_20 < sma_50)
+    extreme = sma_20_50_diff > t['SMA_DIFF_EXTREMELY_STRONG']
+    very = sma_20_50_diff > t['SMA_DIFF_VERY_STRONG']
+    call_score += np.select([up_trend & extreme, up_trend & very], [5, 3], 0)
+    put_score += np.select([up_trend & very, down_trend & extreme, down_trend & very], [0, 5, 3], 0)
+
+    # MACD signals
+    macd_strength = np.abs(macd_diff)
+    bull = (macd_val > macd_signal_val) & (macd_diff > 0)
+    bear = (macd_val < macd_signal_val) & (macd_diff < 0)
+    very = macd_strength > t['MACD_STRENGTH_VERY_STRONG']
+    strong = macd_strength > t['MACD_STRENGTH_MODERATE']
+    call_score += np.select([bull & very, bull & strong], [5, 3], 0)
+    put_score += np.select([bull & strong, bear & very, bear & strong], [0, 5, 3], 0)
+
+    # Stochastic signals
+    ext_low = (stoch_k < t['STOCH_EXTREMELY_OVERSOLD']) & (stoch_d < t['STOCH_EXTREMELY_OVERSOLD'])
+    very_low = (stoch_k < t['STOCH_VERY_OVERSOLD']) & (stoch_d < t['STOCH_VERY_OVERSOLD'])
+    ext_high = (stoch_k > t['STOCH_EXTREMELY_OVERBOUGHT']) & (stoch_d > t['STOCH_EXTREMELY_OVERBOUGHT'])
+    very_high = (stoch_k > t['STOCH_VERY_OVERBOUGHT']) & (stoch_d > t['STOCH_VERY_OVERBOUGHT'])
+    call_score += np.select([ext_low, very_low], [4, 2], 0)
+    put_score += np.select([ext_low | very_low, ext_high, very_high], [0, 4, 2], 0)
+
+    # ADX trend strength - boosts or penalizes whichever side leads
+    adx_points = np.select(
+        [adx_val > t['ADX_EXTREMELY_STRONG'], adx_val > t['ADX_VERY_STRONG'],
+         adx_val < t['ADX_WEAK'], adx_val < t['ADX_MODERATE']],
+        [4, 3, -4, -2], 0)
+    call_score, put_score = _adjust_leader(call_score, put_score, adx_points != 0, adx_points)
+
+    # Price momentum
+    call_score += np.select(
+        [price_change_pct > t['MOMENTUM_EXTREMELY_STRONG'], price_change_pct > t['MOMENTUM_VERY_STRONG'],
+         price_change_pct > t['MOMENTUM_STRONG']], [4, 3, 2], 0)
+    put_score += np.select(
+        [price_change_pct > t['MOMENTUM_STRONG'], price_change_pct < -t['MOMENTUM_EXTREMELY_STRONG'],
+         price_change_pct < -t['MOMENTUM_VERY_STRONG'], price_change_pct < -t['MOMENTUM_STRONG']], [0, 4, 3, 2], 0)
+
+    # Bollinger Bands signals
+    bb_range = bb_high - bb_low
+    bb_width = _safe_pct(bb_range, bb_mid)
+    high_width, good_width = bb_width > t['BB_WIDTH_HIGH'], bb_width > t['BB_WIDTH_GOOD']
+    below_band, above_band = close < bb_low, close > bb_high
+    call_score += np.select([below_band & high_width, below_band & good_width], [5, 3], 0)
+    put_score += np.select(
+        [below_band & good_width, above_band & high_width, above_band & good_width], [0, 5, 3], 0)
+
+    # VWAP signals
+    vwap_diff_pct = _abs_pct(close, vwap)
+    very = vwap_diff_pct > t['VWAP_DIFF_VERY_SIGNIFICANT']
+    significant = vwap_diff_pct > t['VWAP_DIFF_SIGNIFICANT']
+    call_score += np.select([(close > vwap) & very, (close > vwap) & significant], [4, 2], 0)
+    put_score += np.select(
+        [(close > vwap) & significant, (close < vwap) & very, (close < vwap) & significant], [0, 4, 2], 0)
+
+    # Volatility filter (ATR) - penalizes whichever side leads
+    atr_points = np.select(
+        [atr_pct > t['ATR_EXTREMELY_HIGH'], atr_pct > t['ATR_TOO_HIGH'],
+         atr_pct < t['ATR_TOO_LOW'], atr_pct < t['ATR_LOW']],
+        [-5, -3, -3, -1], 0)
+    call_score, put_score = _adjust_leader(call_score, put_score, atr_points != 0, atr_points)
+
+    # Multi-candle trend confirmation
+    price_trend_5 = close - close_5
+    trend_5_pct = _safe_pct(price_trend_5, close_5)
+    trend_3_pct = _safe_pct(price_trend_3, close_3)
+    rising = (price_trend_3 > 0) & (price_change > 0)
+    falling = (price_trend_3 < 0) & (price_change < 0)
+    trend_choice = np.select([
+        rising & (price_trend_5 > 0) & (trend_5_pct > t['TREND_5_EXTREMELY_STRONG'])
+        & (trend_3_pct > t['TREND_3_STRONG']),
+        falling & (price_trend_5 < 0) & (trend_5_pct < -t['TREND_5_EXTREMELY_STRONG'])
+        & (trend_3_pct < -t['TREND_3_STRONG']),
+        rising & (trend_3_pct > t['TREND_3_VERY_STRONG']),
+        falling & (trend_3_pct < -t['TREND_3_VERY_STRONG']),
+        rising & (trend_3_pct > t['TREND_3_STRONG']),
+        falling & (trend_3_pct < -t['TREND_3_STRONG']),
+    ], [4, -4, 3, -3, 2, -2], 0)
+    call_score += np.maximum(trend_choice, 0)
+    put_score += np.maximum(-trend_choice, 0)
+
+    # Strong indicator confirmations
+    strong_call = (
+        (rsi < t['RSI_VERY_OVERSOLD']).astype(np.int64)
+        + ((ema_fast > ema_slow) & (ema_diff_pct > t['EMA_DIFF_CONFIRM']))
+        + ((close > sma_20) & (sma_20 > sma_50) & (sma_20_50_diff > t['SMA_DIFF_VERY_STRONG']))
+        + ((macd_val > macd_signal_val) & (macd_strength > t['MACD_STRENGTH_STRONG']))
+        + (stoch_k < t['STOCH_VERY_OVERSOLD'])
+        + (adx_val > t['ADX_VERY_STRONG'])
+        + (price_change_pct > t['MOMENTUM_VERY_STRONG'])
+        + ((close < bb_low) & (bb_width > t['BB_WIDTH_GOOD']))
+        + ((close > vwap) & (vwap_diff_pct > t['VWAP_DIFF_SIGNIFICANT']))
+    )
+    strong_put = (
+        (rsi > t['RSI_VERY_OVERBOUGHT']).astype(np.int64)
+        + ((ema_fast < ema_slow) & (ema_diff_pct > t['EMA_DIFF_CONFIRM']))
+        + ((close < sma_20) & (sma_20 < sma_50) & (sma_20_50_diff > t['SMA_DIFF_VERY_STRONG']))
+        + ((macd_val < macd_signal_val) & (macd_strength > t['MACD_STRENGTH_STRONG']))
+        + (stoch_k > t['STOCH_VERY_OVERBOUGHT'])
+        + (adx_val > t['ADX_VERY_STRONG'])
+        + (price_change_pct < -t['MOMENTUM_VERY_STRONG'])
+        + ((close > bb_high) & (bb_width > t['BB_WIDTH_GOOD']))
+        + ((close < vwap) & (vwap_diff_pct > t['VWAP_DIFF_SIGNIFICANT']))
+    )
+
+    # Decision: the leading side must clear one of the confirmation tiers
+    score_diff = np.abs(call_score - put_score)
+    leader_score = np.maximum(call_score, put_score)
+    leader_strong = np.where(call_score > put_score, strong_call, strong_put)
+    qualified = np.zeros(len(close), dtype=bool)
+    for min_score, min_diff, min_strong in _tiers(t):
+        qualified |= (leader_score >= min_score) & (score_diff >= min_diff) & (leader_strong >= min_strong)
+
+    codes = np.where(qualified, np.sign(call_score - put_score), 0)
+    return _SIGNAL_LABELS[codes + 1], call_score, put_score
+
+
+def score_signal(features: dict) -> tuple:
+    """Score a single pair. features: {name: float}. Returns (signal, call_score, put_score)."""
+    signals, call_scores, put_scores = score_signals({name: [features[name]] for name in FEATURE_NAMES})
+    return signals[0], int(call_scores[0]), int(put_scores[0])
+
+
+def score_frames(frames: dict, min_candles: int = 26) -> dict:
+    """
+    Score every candle DataFrame in one vectorized pass (indicators.compute_latest_indicators).
+    Frames carrying streamed indicator values in df.attrs[LATEST_ATTR] (market_client) are
+    scored from those instead of recomputing their window.
+    Frames shorter than `min_candles` are skipped, as in get_signal_for_pair.
+    Returns {symbol: (signal, call_score, put_score)}.
+    """
+    eligible = {symbol: df for symbol, df in frames.items() if df is not None and len(df) >= min_candles}
+    streamed = [symbol for symbol, df in eligible.items() if df.attrs.get(LATEST_ATTR) is not None]
+    batches = []
+    if streamed:
+        close = np.vstack([eligible[symbol]['close'].to_numpy()[-5:] for symbol in streamed])
+        features = {name: np.array([eligible[symbol].attrs[LATEST_ATTR][name] for symbol in streamed])
+                    for name in INDICATOR_NAMES}
+        features['close'] = close[:, -1]
+        features['prev_close'] = close[:, -2]
+        features['close_3'] = close[:, -3]
+        features['close_5'] = close[:, -5]
+        batches.append((streamed, features))
+    for symbol in streamed:
+        del eligible[symbol]
+    for symbols, high, low, close in stack_frames(eligible):
+        batches.append((symbols, window_features(high, low, close)))
+
+    results = {}
+    for symbols, features in batches:
+        signals, call_scores, put_scores = score_signals(features)
+        for row, symbol in enumerate(symbols):
+            results[symbol] = (signals[row], int(call_scores[row]), int(put_scores[row]))
+    return results
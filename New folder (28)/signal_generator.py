@@ -2,8 +2,12 @@
 
 import pandas as pd
 import ta
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import pytz
+from constants import INDICATOR_CACHE_SIZE, TARGET_SIGNALS, SIGNAL_INTERVAL_MINUTES
+from indicators import INDICATOR_NAMES
+from scoring import score_signal, score_frames
 
 # Major Forex Pairs Only
 FOREX_PAIRS = [
@@ -26,6 +30,103 @@ BINARY_SYMBOL_MAP = {
     "NZDCHF": "frxNZDCHF"
 }
 
+# LRU cache of computed signals: {(symbol, last candle epoch, last close, candle count): signal}
+_signal_cache = OrderedDict()
+
+def _snapshot_key(symbol: str, df: pd.DataFrame):
+    """
+    Identify a candle snapshot by symbol and its newest candle.
+    The last close is part of the key so an in-progress candle that keeps
+    updating under the same epoch is not served stale results.
+    """
+    if df is None or df.empty:
+        return None
+    try:
+        if 'timestamp' in df.columns:
+            last_epoch = pd.Timestamp(df['timestamp'].iat[-1]).value // 10**9
+        else:
+            last_epoch = len(df)
+        return (symbol, int(last_epoch), float(df['close'].iat[-1]), len(df))
+    except Exception:
+        return None
+
+def get_cached_signal(symbol: str, df: pd.DataFrame) -> str:
+    """
+    get_signal_for_pair() memoized per data snapshot.
+    Indicators for a pair are computed once per new candle (or price update),
+    however many signal slots and fallback passes ask for that pair.
+    """
+    key = _snapshot_key(symbol, df)
+    if key is None:
+        return get_signal_for_pair(df)
+    
+    if key in _signal_cache:
+        _signal_cache.move_to_end(key)
+        return _signal_cache[key]
+    
+    signal = get_signal_for_pair(df)
+    _signal_cache[key] = signal
+    if len(_signal_cache) > INDICATOR_CACHE_SIZE:
+        _signal_cache.popitem(last=False)
+    return signal
+
+def _pair_signal(symbol: str, df: pd.DataFrame, scores: dict) -> str:
+    """Signal from the batch scores, or get_cached_signal() for frames score_frames() skipped"""
+    if symbol in scores:
+        return scores[symbol][0]
+    return get_cached_signal(symbol, df)
+
+def add_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the `ta` indicator columns used by the scoring rules to a candle DataFrame.
+    Per-pair reference implementation (indicators.compute_indicators is the
+    vectorized multi-pair equivalent). Returns the same DataFrame.
+    """
+    # RSI (14 period)
+    df['rsi'] = ta.momentum.RSIIndicator(df['close'], window=14).rsi()
+    
+    # EMAs (fast and slow)
+    df['ema_fast'] = ta.trend.EMAIndicator(df['close'], window=9).ema_indicator()
+    df['ema_slow'] = ta.trend.EMAIndicator(df['close'], window=21).ema_indicator()
+    
+    # SMAs
+    df['sma_20'] = ta.trend.SMAIndicator(df['close'], window=20).sma_indicator()
+    df['sma_50'] = ta.trend.SMAIndicator(df['close'], window=min(50, len(df))).sma_indicator() if len(df) >= 50 else df['close']
+    
+    # MACD
+    macd = ta.trend.MACD(df['close'])
+    df['macd'] = macd.macd()
+    df['macd_signal'] = macd.macd_signal()
+    df['macd_diff'] = macd.macd_diff()
+    
+    # Stochastic Oscillator
+    stoch = ta.momentum.StochasticOscillator(df['high'], df['low'], df['close'])
+    df['stoch_k'] = stoch.stoch()
+    df['stoch_d'] = stoch.stoch_signal()
+    
+    # ADX (trend strength)
+    adx = ta.trend.ADXIndicator(df['high'], df['low'], df['close'])
+    df['adx'] = adx.adx()
+    
+    # Bollinger Bands (volatility and support/resistance)
+    bb = ta.volatility.BollingerBands(df['close'], window=20, window_dev=2)
+    df['bb_high'] = bb.bollinger_hband()
+    df['bb_low'] = bb.bollinger_lband()
+    df['bb_mid'] = bb.bollinger_mavg()
+    
+    # ATR (Average True Range - volatility measure)
+    atr = ta.volatility.AverageTrueRange(df['high'], df['low'], df['close'])
+    df['atr'] = atr.average_true_range()
+    
+    # VWAP approximation using typical price
+    df['typical_price'] = (df['high'] + df['low'] + df['close']) / 3
+    if len(df) >= 20:
+        df['vwap'] = df['typical_price'].rolling(window=20).mean()
+    else:
+        df['vwap'] = df['typical_price']
+    
+    return df
+
 def get_signal_for_pair(df: pd.DataFrame) -> str:
     """
     Generate CALL or PUT signal using advanced technical analysis.
@@ -53,323 +154,18 @@ def get_signal_for_pair(df: pd.DataFrame) -> str:
             return "CALL"
         
         # Calculate multiple indicators for confirmation
-        # RSI (14 period)
-        df['rsi'] = ta.momentum.RSIIndicator(df['close'], window=14).rsi()
-        
-        # EMAs (fast and slow)
-        df['ema_fast'] = ta.trend.EMAIndicator(df['close'], window=9).ema_indicator()
-        df['ema_slow'] = ta.trend.EMAIndicator(df['close'], window=21).ema_indicator()
-        
-        # SMAs
-        df['sma_20'] = ta.trend.SMAIndicator(df['close'], window=20).sma_indicator()
-        df['sma_50'] = ta.trend.SMAIndicator(df['close'], window=min(50, len(df))).sma_indicator() if len(df) >= 50 else df['close']
-        
-        # MACD
-        macd = ta.trend.MACD(df['close'])
-        df['macd'] = macd.macd()
-        df['macd_signal'] = macd.macd_signal()
-        df['macd_diff'] = macd.macd_diff()
-        
-        # Stochastic Oscillator
-        stoch = ta.momentum.StochasticOscillator(df['high'], df['low'], df['close'])
-        df['stoch_k'] = stoch.stoch()
-        df['stoch_d'] = stoch.stoch_signal()
-        
-        # ADX (trend strength)
-        adx = ta.trend.ADXIndicator(df['high'], df['low'], df['close'])
-        df['adx'] = adx.adx()
-        
-        # Bollinger Bands (volatility and support/resistance)
-        bb = ta.volatility.BollingerBands(df['close'], window=20, window_dev=2)
-        df['bb_high'] = bb.bollinger_hband()
-        df['bb_low'] = bb.bollinger_lband()
-        df['bb_mid'] = bb.bollinger_mavg()
-        
-        # ATR (Average True Range - volatility measure)
-        atr = ta.volatility.AverageTrueRange(df['high'], df['low'], df['close'])
-        df['atr'] = atr.average_true_range()
-        
-        # VWAP approximation using typical price
-        df['typical_price'] = (df['high'] + df['low'] + df['close']) / 3
-        if len(df) >= 20:
-            df['vwap'] = df['typical_price'].rolling(window=20).mean()
-        else:
-            df['vwap'] = df['typical_price']
-        
-        # Get latest values
-        latest = df.iloc[-1]
-        prev = df.iloc[-2] if len(df) >= 2 else latest
-        
-        rsi = float(latest['rsi']) if not pd.isna(latest['rsi']) else 50.0
-        close = float(latest['close'])
-        ema_fast = float(latest['ema_fast']) if not pd.isna(latest['ema_fast']) else close
-        ema_slow = float(latest['ema_slow']) if not pd.isna(latest['ema_slow']) else close
-        sma_20 = float(latest['sma_20']) if not pd.isna(latest['sma_20']) else close
-        sma_50 = float(latest['sma_50']) if not pd.isna(latest['sma_50']) else close
-        
-        macd_val = float(latest['macd']) if not pd.isna(latest['macd']) else 0.0
-        macd_signal_val = float(latest['macd_signal']) if not pd.isna(latest['macd_signal']) else 0.0
-        macd_diff = float(latest['macd_diff']) if not pd.isna(latest['macd_diff']) else 0.0
-        
-        stoch_k = float(latest['stoch_k']) if not pd.isna(latest['stoch_k']) else 50.0
-        stoch_d = float(latest['stoch_d']) if not pd.isna(latest['stoch_d']) else 50.0
-        
-        adx_val = float(latest['adx']) if not pd.isna(latest['adx']) else 25.0
-        
-        # Bollinger Bands
-        bb_high = float(latest['bb_high']) if not pd.isna(latest['bb_high']) else close * 1.02
-        bb_low = float(latest['bb_low']) if not pd.isna(latest['bb_low']) else close * 0.98
-        bb_mid = float(latest['bb_mid']) if not pd.isna(latest['bb_mid']) else close
-        
-        # ATR (volatility)
-        atr_val = float(latest['atr']) if not pd.isna(latest['atr']) else 0.0
-        atr_pct = (atr_val / close * 100) if close > 0 else 0
-        
-        # VWAP
-        vwap = float(latest['vwap']) if not pd.isna(latest['vwap']) else close
-        
-        # Price momentum
-        price_change = close - float(prev['close']) if len(df) >= 2 else 0
-        price_change_pct = (price_change / float(prev['close']) * 100) if len(df) >= 2 and prev['close'] > 0 else 0
-        
-        # Multi-candle trend (3-candle pattern)
-        if len(df) >= 3:
-            candle_3_ago = df.iloc[-3]
-            price_trend_3 = close - float(candle_3_ago['close'])
-        else:
-            price_trend_3 = price_change
-        
-        # Calculate signal strength scores
-        # STRICT CRITERIA FOR 85%+ ACCURACY
-        call_score = 0
-        put_score = 0
-        
-        # RSI signals (only trade on strong oversold/overbought)
-        if rsi < 25:  # Very oversold - very strong CALL signal
-            call_score += 5
-        elif rsi < 30:  # Oversold - strong CALL signal
-            call_score += 3
-        elif rsi > 75:  # Very overbought - very strong PUT signal
-            put_score += 5
-        elif rsi > 70:  # Overbought - strong PUT signal
-            put_score += 3
-        # Don't trade if RSI is neutral (30-70) - too risky
-        
-        # EMA crossover and position (EXTREME requirements for 90%+)
-        ema_diff_pct = abs((ema_fast - ema_slow) / ema_slow * 100) if ema_slow > 0 else 0
-        
-        if ema_fast > ema_slow and ema_diff_pct > 0.15:  # Very strong bullish crossover
-            call_score += 5
-            if close > ema_fast and close > ema_slow:  # Price above both EMAs
-                call_score += 3
-        elif ema_fast > ema_slow and ema_diff_pct > 0.08:  # Strong bullish crossover
-            call_score += 3
-            if close > ema_fast and close > ema_slow:
-                call_score += 2
-        elif ema_fast < ema_slow and ema_diff_pct > 0.15:  # Very strong bearish crossover
-            put_score += 5
-            if close < ema_fast and close < ema_slow:  # Price below both EMAs
-                put_score += 3
-        elif ema_fast < ema_slow and ema_diff_pct > 0.08:  # Strong bearish crossover
-            put_score += 3
-            if close < ema_fast and close < ema_slow:
-                put_score += 2
-        
-        # SMA trend (EXTREME requirements for 90%+)
-        sma_20_50_diff = abs((sma_20 - sma_50) / sma_50 * 100) if sma_50 > 0 else 0
-        
-        if close > sma_20 and sma_20 > sma_50 and sma_20_50_diff > 0.2:  # Extremely strong uptrend
-            call_score += 5
-        elif close > sma_20 and sma_20 > sma_50 and sma_20_50_diff > 0.15:  # Very strong uptrend
-            call_score += 3
-        elif close < sma_20 and sma_20 < sma_50 and sma_20_50_diff > 0.2:  # Extremely strong downtrend
-            put_score += 5
-        elif close < sma_20 and sma_20 < sma_50 and sma_20_50_diff > 0.15:  # Very strong downtrend
-            put_score += 3
-        # Don't trade on weak trends for 90% accuracy
-        
-        # MACD signals (EXTREME requirements for 90%+)
-        macd_strength = abs(macd_diff)
-        if macd_val > macd_signal_val and macd_diff > 0 and macd_strength > 0.0005:  # Very strong bullish MACD
-            call_score += 5
-        elif macd_val > macd_signal_val and macd_diff > 0 and macd_strength > 0.0002:  # Strong bullish MACD
-            call_score += 3
-        elif macd_val < macd_signal_val and macd_diff < 0 and macd_strength > 0.0005:  # Very strong bearish MACD
-            put_score += 5
-        elif macd_val < macd_signal_val and macd_diff < 0 and macd_strength > 0.0002:  # Strong bearish MACD
-            put_score += 3
-        
-        # Stochastic signals (EXTREME levels only for 90%+)
-        if stoch_k < 10 and stoch_d < 10:  # Extremely oversold
-            call_score += 4
-        elif stoch_k < 15 and stoch_d < 15:  # Very oversold
-            call_score += 2
-        elif stoch_k > 90 and stoch_d > 90:  # Extremely overbought
-            put_score += 4
-        elif stoch_k > 85 and stoch_d > 85:  # Very overbought
-            put_score += 2
-        # Don't trade on moderate stochastic levels
-        
-        # ADX trend strength (REQUIRE VERY STRONG trend for 90%+ accuracy)
-        if adx_val > 40:  # Extremely strong trend - major boost
-            if call_score > put_score:
-                call_score += 4
-            elif put_score > call_score:
-                put_score += 4
-        elif adx_val > 35:  # Very strong trend - boost score
-            if call_score > put_score:
-                call_score += 3
-            elif put_score > call_score:
-                put_score += 3
-        elif adx_val < 25:  # Weak trend - significant penalty (avoid choppy markets)
-            if call_score > put_score:
-                call_score = max(0, call_score - 4)
-            elif put_score > call_score:
-                put_score = max(0, put_score - 4)
-        elif adx_val < 30:  # Moderate trend - reduce score
-            if call_score > put_score:
-                call_score = max(0, call_score - 2)
-            elif put_score > call_score:
-                put_score = max(0, put_score - 2)
-        
-        # Price momentum (require VERY STRONG momentum for 90%+)
-        if price_change_pct > 0.1:  # Extremely strong positive momentum
-            call_score += 4
-        elif price_change_pct > 0.07:  # Very strong positive momentum
-            call_score += 3
-        elif price_change_pct > 0.05:  # Strong positive momentum
-            call_score += 2
-        elif price_change_pct < -0.1:  # Extremely strong negative momentum
-            put_score += 4
-        elif price_change_pct < -0.07:  # Very strong negative momentum
-            put_score += 3
-        elif price_change_pct < -0.05:  # Strong negative momentum
-            put_score += 2
-        # Don't trade on weak momentum
-        
-        # Bollinger Bands signals (EXTREME requirements for 90%+)
-        bb_width = (bb_high - bb_low) / bb_mid * 100 if bb_mid > 0 else 0
-        bb_position = ((close - bb_low) / (bb_high - bb_low) * 100) if (bb_high - bb_low) > 0 else 50
-        
-        if close < bb_low and bb_width > 0.3:  # Price well below lower band with high volatility
-            call_score += 5
-        elif close < bb_low and bb_width > 0.25:  # Price at lower band with good volatility
-            call_score += 3
-        elif close > bb_high and bb_width > 0.3:  # Price well above upper band with high volatility
-            put_score += 5
-        elif close > bb_high and bb_width > 0.25:  # Price at upper band with good volatility
-            put_score += 3
-        # Don't trade if price is near middle band
-        
-        # VWAP signals (EXTREME requirements for 90%+)
-        vwap_diff_pct = abs((close - vwap) / vwap * 100) if vwap > 0 else 0
-        
-        if close > vwap and vwap_diff_pct > 0.1:  # Price very significantly above VWAP
-            call_score += 4
-        elif close > vwap and vwap_diff_pct > 0.07:  # Price significantly above VWAP
-            call_score += 2
-        elif close < vwap and vwap_diff_pct > 0.1:  # Price very significantly below VWAP
-            put_score += 4
-        elif close < vwap and vwap_diff_pct > 0.07:  # Price significantly below VWAP
-            put_score += 2
-        # Don't trade if price is too close to VWAP
-        
-        # Volatility filter (ATR) - STRICT requirements for 90%+
-        if atr_pct > 1.5:  # Extremely high volatility - major penalty
-            if call_score > put_score:
-                call_score = max(0, call_score - 5)
-            elif put_score > call_score:
-                put_score = max(0, put_score - 5)
-        elif atr_pct > 1.0:  # Too high volatility - reduce score significantly
-            if call_score > put_score:
-                call_score = max(0, call_score - 3)
-            elif put_score > call_score:
-                put_score = max(0, put_score - 3)
-        elif atr_pct < 0.15:  # Too low volatility - reduce score (no movement)
-            if call_score > put_score:
-                call_score = max(0, call_score - 3)
-            elif put_score > call_score:
-                put_score = max(0, put_score - 3)
-        elif atr_pct < 0.2:  # Low volatility - reduce score
-            if call_score > put_score:
-                call_score = max(0, call_score - 1)
-            elif put_score > call_score:
-                put_score = max(0, put_score - 1)
-        
-        # Multi-candle trend confirmation (EXTREME requirements for 90%+)
-        if len(df) >= 5:  # Use 5-candle pattern for better confirmation
-            candle_5_ago = df.iloc[-5]
-            price_trend_5 = close - float(candle_5_ago['close'])
-            trend_5_pct = (price_trend_5 / float(candle_5_ago['close']) * 100) if candle_5_ago['close'] > 0 else 0
-            trend_3_pct = (price_trend_3 / float(df.iloc[-3]['close']) * 100) if len(df) >= 3 and df.iloc[-3]['close'] > 0 else 0
-            
-            # Require consistent strong trend across multiple candles
-            if price_trend_5 > 0 and price_trend_3 > 0 and price_change > 0 and trend_5_pct > 0.15 and trend_3_pct > 0.1:
-                call_score += 4  # Extremely strong consistent uptrend
-            elif price_trend_5 < 0 and price_trend_3 < 0 and price_change < 0 and trend_5_pct < -0.15 and trend_3_pct < -0.1:
-                put_score += 4  # Extremely strong consistent downtrend
-            elif price_trend_3 > 0 and price_change > 0 and trend_3_pct > 0.15:  # Very strong consistent uptrend
-                call_score += 3
-            elif price_trend_3 < 0 and price_change < 0 and trend_3_pct < -0.15:  # Very strong consistent downtrend
-                put_score += 3
-            elif price_trend_3 > 0 and price_change > 0 and trend_3_pct > 0.1:  # Strong consistent uptrend
-                call_score += 2
-            elif price_trend_3 < 0 and price_change < 0 and trend_3_pct < -0.1:  # Strong consistent downtrend
-                put_score += 2
-        
-        # Determine signal based on scores
-        # EXTREME REQUIREMENTS FOR 90%+ ACCURACY
-        score_diff = abs(call_score - put_score)
-        min_score = 15  # Minimum score required for 90%+ (very high threshold)
-        min_diff = 6    # Minimum difference required (very high threshold)
-        
-        # Additional requirement: At least 5 indicators must strongly agree
-        strong_indicators_call = sum([
-            rsi < 25,
-            ema_fast > ema_slow and ema_diff_pct > 0.1,
-            close > sma_20 and sma_20 > sma_50 and sma_20_50_diff > 0.15,
-            macd_val > macd_signal_val and macd_strength > 0.0003,
-            stoch_k < 15,
-            adx_val > 35,
-            price_change_pct > 0.07,
-            close < bb_low and bb_width > 0.25,
-            close > vwap and vwap_diff_pct > 0.07
-        ])
-        
-        strong_indicators_put = sum([
-            rsi > 75,
-            ema_fast < ema_slow and ema_diff_pct > 0.1,
-            close < sma_20 and sma_20 < sma_50 and sma_20_50_diff > 0.15,
-            macd_val < macd_signal_val and macd_strength > 0.0003,
-            stoch_k > 85,
-            adx_val > 35,
-            price_change_pct < -0.07,
-            close > bb_high and bb_width > 0.25,
-            close < vwap and vwap_diff_pct > 0.07
-        ])
-        
-        # Only generate signal if we have EXTREMELY STRONG confirmation
-        if call_score > put_score:
-            if call_score >= min_score and score_diff >= min_diff and strong_indicators_call >= 5:
-                return "CALL"  # Extremely strong CALL signal
-            elif call_score >= 12 and score_diff >= 5 and strong_indicators_call >= 4:
-                return "CALL"  # Very strong CALL signal
-            elif call_score >= 10 and score_diff >= 4 and strong_indicators_call >= 3:
-                return "CALL"  # Strong CALL signal
-            # Don't trade if criteria not met - wait for better setup
-            return None
-        elif put_score > call_score:
-            if put_score >= min_score and score_diff >= min_diff and strong_indicators_put >= 5:
-                return "PUT"  # Extremely strong PUT signal
-            elif put_score >= 12 and score_diff >= 5 and strong_indicators_put >= 4:
-                return "PUT"  # Very strong PUT signal
-            elif put_score >= 10 and score_diff >= 4 and strong_indicators_put >= 3:
-                return "PUT"  # Strong PUT signal
-            # Don't trade if criteria not met
-            return None
-        else:
-            # Scores are equal or too close - NO SIGNAL (wait for better setup)
-            return None
+        add_indicators(df)
+        
+        # Latest indicator values plus recent closes, scored by the pure scoring rules
+        features = {name: df[name].iat[-1] for name in INDICATOR_NAMES}
+        closes = df['close']
+        features['close'] = closes.iat[-1]
+        features['prev_close'] = closes.iat[-2]
+        features['close_3'] = closes.iat[-3]
+        features['close_5'] = closes.iat[-5]
+        
+        signal, call_score, put_score = score_signal(features)
+        return signal
     
     except Exception as e:
         print(f"   [WARNING] Error in get_signal_for_pair: {e}")
@@ -400,9 +196,17 @@ def generate_signals(ohlc_data_dict: dict) -> list:
     
     print(f"   Generating signals for {len(FOREX_PAIRS)} pairs...")
     
+    # Score every pair with enough candles in one vectorized pass; shorter
+    # frames go through the per-pair path (get_cached_signal)
+    try:
+        scores = score_frames(ohlc_data_dict)
+    except Exception as e:
+        print(f"   [WARNING] Batch scoring failed, scoring pairs one by one: {e}")
+        scores = {}
+    
     # Target: 30 signals over extended period
-    target_signals = 30
-    interval_minutes = 8  # 8 minutes apart (more signals)
+    target_signals = TARGET_SIGNALS
+    interval_minutes = SIGNAL_INTERVAL_MINUTES  # 8 minutes apart (more signals)
     
     minute_offset = interval_minutes
     
@@ -417,7 +221,7 @@ def generate_signals(ohlc_data_dict: dict) -> list:
         if binary_symbol and binary_symbol in ohlc_data_dict:
             try:
                 df = ohlc_data_dict[binary_symbol]
-                signal = get_signal_for_pair(df)
+                signal = _pair_signal(binary_symbol, df, scores)
                 if signal:
                     print(f"   [{pair}] Generated {signal} signal (STRICT 90%+ criteria)")
                 else:
@@ -439,7 +243,7 @@ def generate_signals(ohlc_data_dict: dict) -> list:
                 if binary_symbol and binary_symbol in ohlc_data_dict:
                     try:
                         df = ohlc_data_dict[binary_symbol]
-                        signal = get_signal_for_pair(df)
+                        signal = _pair_signal(binary_symbol, df, scores)
                         if signal:
                             print(f"   [{pair}] Generated {signal} signal (alternative pair)")
                     except:
@@ -491,7 +295,7 @@ def generate_signals(ohlc_data_dict: dict) -> list:
                     if binary_symbol and binary_symbol in ohlc_data_dict:
                         try:
                             df = ohlc_data_dict[binary_symbol]
-                            signal = get_signal_for_pair(df)
+                            signal = _pair_signal(binary_symbol, df, scores)
                         except:
                             pass
                     
@@ -0,0 +1,156 @@
+# signal_plan.py - Signal plans shared by every "Generate Signal" click
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import pandas as pd
+import pytz
+from signal_generator import FOREX_PAIRS, generate_signals, format_signal_output, format_time_utc6
+from logger_config import logger
+
+EMERGENCY_SIGNALS = 10  # Pairs in the fallback plan
+EMERGENCY_INTERVAL = 12  # Minutes between fallback signals
+
+
+@dataclass(slots=True)
+class SignalPlan:
+    """Signals and their formatted message for one (minute slot, candle snapshot) key"""
+    key: tuple
+    signals: list
+    output: str
+    created_at: float = field(default_factory=time.time)
+
+    def signals_copy(self) -> list:
+        """Per-click copies of the signal dicts (callers track them per chat)"""
+        return [dict(sig) for sig in self.signals]
+
+
+def snapshot_epochs(ohlc_data: dict) -> tuple:
+    """((symbol, newest candle epoch), ...) for get_all_ohlc_data() DataFrames, sorted by symbol"""
+    snapshot = []
+    for symbol, df in sorted(ohlc_data.items()):
+        if df is None or df.empty:
+            continue
+        try:
+            snapshot.append((symbol, pd.Timestamp(df['timestamp'].iat[-1]).value // 10**9))
+        except Exception:
+            snapshot.append((symbol, len(df)))
+    return tuple(snapshot)
+
+
+def plan_key(ohlc_data: dict, now: float = None) -> tuple:
+    """(minute slot, snapshot_epochs) - signal times move with the minute, signals with the candles"""
+    return int(now if now is not None else time.time()) // 60, snapshot_epochs(ohlc_data)
+
+
+def emergency_signals() -> list:
+    """Alternating CALL/PUT signals every EMERGENCY_INTERVAL minutes, used when generation fails"""
+    now = datetime.now(pytz.timezone('Asia/Dhaka'))
+    signals = []
+    for i, pair in enumerate(FOREX_PAIRS[:EMERGENCY_SIGNALS]):
+        signal_time = now + timedelta(minutes=(i + 1) * EMERGENCY_INTERVAL)
+        signals.append({
+            'pair': pair,
+            'time': format_time_utc6(signal_time.hour, signal_time.minute),
+            'signal': "CALL" if i % 2 == 0 else "PUT",
+            'timestamp': signal_time
+        })
+    return signals
+
+
+def build_plan(ohlc_data: dict) -> tuple:
+    """(signals, formatted output) for one click - never empty (falls back to emergency_signals)"""
+    try:
+        signals = generate_signals(ohlc_data)
+    except Exception as e:
+        logger.error(f"Signal generation failed, using emergency signals: {e}", exc_info=True)
+        signals = []
+
+    if not signals:
+        logger.critical("No signals generated! Creating emergency signals...")
+        signals = emergency_signals()
+    return signals, format_signal_output(signals, martingale=1)
+
+
+class SignalPlanCache:
+    """
+    Signal plans shared across users.
+
+    A plan depends only on the candles and the wall clock, so it is keyed on the
+    minute slot and the newest candle epoch of every pair. get() coalesces the
+    market data fetch of concurrent clicks, returns the current plan while its
+    key still matches, and single-flights the build of a new key: N clicks at
+    the same time cause one fetch and one generate_signals run. Only the newest
+    plan is kept; it is replaced once a new candle opens (the previous one closed)
+    or the minute turns. Builds run in a worker thread so the event loop keeps
+    answering other updates meanwhile, one at a time (generate_signals shares
+    its per-pair signal cache).
+    """
+
+    def __init__(self):
+        self._plan = None  # Newest SignalPlan
+        self._fetch_task = None  # Market data fetch shared by concurrent clicks
+        self._building = {}  # {key: asyncio.Task} plans being built
+        self._build_lock = threading.Lock()
+        self.stats = {'requests': 0, 'fetches': 0, 'builds': 0, 'hits': 0, 'joined': 0}
+
+    async def _fetch(self, fetch):
+        task = self._fetch_task
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._fetch_task = task
+            self.stats['fetches'] += 1
+
+            def release(_):
+                if self._fetch_task is task:
+                    self._fetch_task = None
+            task.add_done_callback(release)
+        return await asyncio.shield(task)
+
+    def _build_done(self, key: tuple, task: asyncio.Task):
+        self._building.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        plan = task.result()
+        if self._plan is None or plan.key[0] >= self._plan.key[0]:
+            self._plan = plan
+
+    async def get(self, fetch, build=build_plan) -> SignalPlan:
+        """
+        Plan for a click. fetch: coroutine function returning get_all_ohlc_data() output;
+        build: function (ohlc_data) -> (signals, output), run in a worker thread.
+        Build errors are raised to every click waiting on that build.
+        """
+        self.stats['requests'] += 1
+        ohlc_data = await self._fetch(fetch)
+        key = plan_key(ohlc_data)
+
+        plan = self._plan
+        if plan is not None and plan.key == key:
+            self.stats['hits'] += 1
+            return plan
+
+        task = self._building.get(key)
+        if task is None:
+            def locked_build():
+                with self._build_lock:
+                    return build(ohlc_data)
+
+            async def run():
+                signals, output = await asyncio.to_thread(locked_build)
+                return SignalPlan(key, signals, output)
+
+            task = asyncio.ensure_future(run())
+            self._building[key] = task
+            task.add_done_callback(lambda done: self._build_done(key, done))
+            self.stats['builds'] += 1
+            logger.debug(f"Building signal plan for minute {key[0]} ({len(key[1])} pairs)")
+        else:
+            self.stats['joined'] += 1
+        return await asyncio.shield(task)
+
+
+# Global plan cache
+signal_plans = SignalPlanCache()
@@ -0,0 +1,215 @@
+# signal_store.py - Indexed in-memory store for tracked signals and batch counters
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+
+@dataclass(slots=True)
+class SignalRecord:
+    """One tracked signal and its verification state"""
+    signal_id: str
+    pair: str
+    signal: str  # CALL / PUT
+    time: str  # HH:MM shown to users
+    timestamp: object  # datetime or ISO string of the signal minute
+    batch_id: Optional[str] = None
+    user_id: Optional[int] = None
+    chat_id: Optional[int] = None
+    entry_price: Optional[float] = None
+    confidence_score: Optional[float] = None
+    added_at: datetime = field(default_factory=datetime.now)
+    status: str = 'pending'
+    result: Optional[bool] = None  # True = win, False = loss, None = unverified
+    mtg_count: int = 0
+    is_mtg: bool = False
+    completed_at: Optional[datetime] = None
+    verify_stage: str = 'pending'
+    verify_due: Optional[float] = None  # Next scheduled check (unix time)
+    verify_first_due: Optional[float] = None  # First check of the current stage, for VERIFICATION_TIMEOUT
+    first_exit_price: Optional[float] = None
+
+    @property
+    def completed(self) -> bool:
+        return self.status == 'completed'
+
+
+@dataclass(slots=True)
+class BatchRecord:
+    """A batch of signals with running result counters"""
+    batch_id: str
+    user_id: Optional[int] = None
+    chat_id: Optional[int] = None
+    created_at: datetime = field(default_factory=datetime.now)
+    signal_ids: list = field(default_factory=list)
+    pending: int = 0
+    wins: int = 0
+    losses: int = 0
+    unverified: int = 0
+    summary_sent: bool = False  # Final summary already delivered (set for batches restored complete)
+    restored: bool = False
+
+    @property
+    def completed(self) -> int:
+        return self.wins + self.losses + self.unverified
+
+
+class SignalStore:
+    """
+    Signals indexed by signal_id, batch_id, pair and chat_id.
+
+    Pending and completed signals are kept in insertion-ordered dicts, and every
+    batch carries running win/loss/unverified counters updated on completion, so
+    lookups and batch statistics cost O(1) and batch listings O(batch size),
+    however many signals were processed.
+    """
+
+    __slots__ = ('active', '_completed', '_signals', '_batches', '_by_pair', '_by_chat', 'wins', 'losses', 'unverified')
+
+    def __init__(self):
+        self.active = {}  # {signal_id: SignalRecord} awaiting verification
+        self._completed = {}  # {signal_id: SignalRecord} in completion order
+        self._signals = {}  # {signal_id: SignalRecord}
+        self._batches = {}  # {batch_id: BatchRecord}
+        self._by_pair = {}  # {pair: {signal_id: None}}
+        self._by_chat = {}  # {chat_id: {batch_id: None}}
+        self.wins = 0
+        self.losses = 0
+        self.unverified = 0
+
+    def __len__(self) -> int:
+        return len(self._signals)
+
+    def __contains__(self, signal_id: str) -> bool:
+        return signal_id in self._signals
+
+    def add(self, record: SignalRecord) -> SignalRecord:
+        """Index a record (pending or already completed); replaces a record with the same id"""
+        if record.signal_id in self._signals:
+            self._discard(self._signals[record.signal_id])
+        self._signals[record.signal_id] = record
+        self._by_pair.setdefault(record.pair, {})[record.signal_id] = None
+
+        batch = None
+        if record.batch_id:
+            batch = self._batches.get(record.batch_id)
+            if batch is None:
+                batch = self._batches[record.batch_id] = BatchRecord(
+                    record.batch_id, record.user_id, record.chat_id, record.added_at
+                )
+                self._by_chat.setdefault(record.chat_id, {})[record.batch_id] = None
+            batch.signal_ids.append(record.signal_id)
+
+        if record.completed:
+            self._completed[record.signal_id] = record
+            self._count(batch, record.result, 1)
+        else:
+            self.active[record.signal_id] = record
+            if batch is not None:
+                batch.pending += 1
+        return record
+
+    def complete(self, signal_id: str, result: Optional[bool], mtg_count: int = 0, is_mtg: bool = False) -> Optional[SignalRecord]:
+        """Move a pending signal to completed and update its batch counters"""
+        record = self.active.pop(signal_id, None)
+        if record is None:
+            return None
+        record.status = 'completed'
+        record.result = result
+        record.completed_at = datetime.now()
+        record.mtg_count = mtg_count
+        record.is_mtg = is_mtg
+        record.verify_stage = 'done'
+        self._completed[signal_id] = record
+
+        batch = self._batches.get(record.batch_id) if record.batch_id else None
+        if batch is not None:
+            batch.pending -= 1
+        self._count(batch, result, 1)
+        return record
+
+    def _count(self, batch: Optional[BatchRecord], result: Optional[bool], step: int):
+        if result is None:
+            self.unverified += step
+            if batch is not None:
+                batch.unverified += step
+        elif result:
+            self.wins += step
+            if batch is not None:
+                batch.wins += step
+        else:
+            self.losses += step
+            if batch is not None:
+                batch.losses += step
+
+    def _discard(self, record: SignalRecord):
+        """Drop a record from every index, undoing its counter contributions"""
+        self._signals.pop(record.signal_id, None)
+        pair_ids = self._by_pair.get(record.pair)
+        if pair_ids is not None:
+            pair_ids.pop(record.signal_id, None)
+            if not pair_ids:
+                del self._by_pair[record.pair]
+
+        batch = self._batches.get(record.batch_id) if record.batch_id else None
+        if record.signal_id in self._completed:
+            del self._completed[record.signal_id]
+            self._count(batch, record.result, -1)
+        elif self.active.pop(record.signal_id, None) is not None and batch is not None:
+            batch.pending -= 1
+        if batch is not None and record.signal_id in batch.signal_ids:
+            batch.signal_ids.remove(record.signal_id)
+
+    # ---- lookups ----
+
+    def get(self, signal_id: str) -> Optional[SignalRecord]:
+        return self._signals.get(signal_id)
+
+    def batch(self, batch_id: str) -> Optional[BatchRecord]:
+        return self._batches.get(batch_id)
+
+    @property
+    def batches(self) -> dict:
+        """{batch_id: BatchRecord} (read-only use)"""
+        return self._batches
+
+    def batch_signals(self, batch_id: str, completed_only: bool = False) -> list:
+        """Records of a batch in insertion order - O(batch size)"""
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            return []
+        records = (self._signals[signal_id] for signal_id in batch.signal_ids)
+        if completed_only:
+            return [record for record in records if record.completed]
+        return list(records)
+
+    def for_pair(self, pair: str) -> list:
+        return [self._signals[signal_id] for signal_id in self._by_pair.get(pair, ())]
+
+    def batches_for_chat(self, chat_id: int) -> list:
+        return [self._batches[batch_id] for batch_id in self._by_chat.get(chat_id, ())]
+
+    def completed(self) -> list:
+        """Completed records in completion order"""
+        return list(self._completed.values())
+
+    @property
+    def completed_count(self) -> int:
+        return len(self._completed)
+
+    # ---- eviction ----
+
+    def remove_older_than(self, cutoff: datetime) -> int:
+        """Drop completed signals added before cutoff and batches created before it. Returns signals removed."""
+        old = [record for record in self._completed.values() if record.added_at <= cutoff]
+        for record in old:
+            self._discard(record)
+
+        for batch_id in [bid for bid, batch in self._batches.items() if batch.created_at < cutoff]:
+            batch = self._batches.pop(batch_id)
+            chat_batches = self._by_chat.get(batch.chat_id)
+            if chat_batches is not None:
+                chat_batches.pop(batch_id, None)
+                if not chat_batches:
+                    del self._by_chat[batch.chat_id]
+        return len(old)
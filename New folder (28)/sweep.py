@@ -0,0 +1,226 @@
+# sweep.py - Parallel grid / random search over the scoring thresholds
+#
+# Usage: python sweep.py [--db forex_bot.db | --npy candles/ | --dir csv/] [--pairs EURUSD ...] [--start 2024-01-01]
+#                        [--end 2024-03-31] [--every 240] [--window 50]
+#                        --grid SIGNAL_MIN_SCORE=12,15,18 --grid ADX_WEAK=20:30:5 [--random 200] [--seed 1]
+#                        [--workers 8] [--min-signals 100] [--sort win_rate] [--top 20] [--json sweep.json]
+#
+# Each --grid names a scoring threshold (scoring.THRESHOLD_NAMES, i.e. the constants.py name)
+# and its values, as a comma list or an inclusive start:stop:step range. Every combination of
+# the grids is backtested (or --random of them, sampled without replacement), plus the current
+# constants as the baseline, and the best --top by --sort are printed.
+#
+# The indicators do not depend on the thresholds, so they are computed once in this process:
+# the scoring features of every (click, pair) snapshot and the outcome of a CALL and of a PUT
+# in every (click, slot, pair) (backtest.signal_features / backtest.outcome_table). The arrays
+# are copied into multiprocessing shared memory, ProcessPoolExecutor workers attach to them
+# once, and a combination then costs one scoring.score_signals pass, the slot filling and a
+# table lookup. Tasks carry only the threshold dict, so throughput scales with the cores.
+
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import backtest
+from constants import TARGET_SIGNALS, SIGNAL_INTERVAL_MINUTES
+from scoring import THRESHOLDS
+from signal_generator import FOREX_PAIRS
+
+SORT_KEYS = ('win_rate', 'direct_win_rate', 'mtg_win_rate', 'total_trades')
+
+_shared = {}  # Worker process: {name: array view of a shared memory block}
+_blocks = []  # Worker process: attached blocks, kept open while the views are in use
+
+
+# ---- search space ----
+
+def _number(text: str):
+    value = float(text)
+    return int(value) if value.is_integer() and '.' not in text else value
+
+
+def parse_grid(specs: list) -> dict:
+    """['NAME=1,2,3', 'NAME=start:stop:step'] -> {NAME: [values]}; raises ValueError on bad input"""
+    grid = {}
+    for spec in specs:
+        name, sep, values = spec.partition('=')
+        name = name.strip().upper()
+        if not sep or not values:
+            raise ValueError(f"Expected NAME=values, got '{spec}'")
+        if name not in THRESHOLDS:
+            raise ValueError(f"Unknown threshold '{name}' (see scoring.THRESHOLD_NAMES)")
+        if ':' in values:
+            start, stop, step = (_number(part) for part in values.split(':'))
+            if step <= 0 or stop < start:
+                raise ValueError(f"Bad range for {name}: '{values}'")
+            count = int(round((stop - start) / step)) + 1
+            grid[name] = [round(start + step * i, 10) for i in range(count)]
+        else:
+            grid[name] = [_number(part) for part in values.split(',') if part.strip()]
+    return grid
+
+
+def combinations(grid: dict, samples: int = None, seed: int = None) -> list:
+    """
+    Threshold override dicts for the grid: all of them, or `samples` drawn without
+    replacement (decoded from sampled indices, so huge grids are never materialized).
+    """
+    names = list(grid)
+    sizes = [len(grid[name]) for name in names]
+    total = int(np.prod(sizes)) if names else 0
+    if not samples or samples >= total:
+        return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+    combos = []
+    for index in random.Random(seed).sample(range(total), samples):
+        values = {}
+        for name, size in zip(reversed(names), reversed(sizes)):
+            index, position = divmod(index, size)
+            values[name] = grid[name][position]
+        combos.append({name: values[name] for name in names})
+    return combos
+
+
+# ---- precomputation and shared memory ----
+
+def prepare(candles: dict, every: int, window: int, slots: int = TARGET_SIGNALS,
+            interval: int = SIGNAL_INTERVAL_MINUTES) -> dict:
+    """Threshold-independent arrays: click times, snapshot features and the outcome table"""
+    pairs = list(FOREX_PAIRS)
+    times = backtest.generation_times(candles, every, window, slots, interval)
+    features, cells, fresh = backtest.signal_features(candles, pairs, times, window)
+    table = backtest.outcome_table(candles, pairs, times, slots, interval)
+    return {'times': times, 'features': features, 'cells': cells, 'fresh': fresh, 'table': table}
+
+
+class SharedArrays:
+    """NumPy arrays copied into named shared memory blocks; `spec` lets workers attach to them"""
+
+    def __init__(self, arrays: dict):
+        self.blocks = []
+        self.spec = {}
+        try:
+            for name, array in arrays.items():
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+                self.spec[name] = (block.name, array.shape, array.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def _attach(spec: dict):
+    """Worker initializer: map the shared arrays once per process"""
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        _shared[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def run_combination(thresholds: dict, arrays: dict = None, slots: int = TARGET_SIGNALS,
+                    interval: int = SIGNAL_INTERVAL_MINUTES) -> dict:
+    """Statistics of one threshold combination over prepare() arrays (the shared ones in a worker)"""
+    arrays = _shared if arrays is None else arrays
+    codes = backtest.cell_codes(arrays['features'], arrays['cells'], arrays['fresh'].shape, thresholds)
+    report = backtest.evaluate(codes, arrays['fresh'], arrays['times'], arrays['table'], slots, interval)
+    report['params'] = thresholds
+    return report
+
+
+def sweep(arrays: dict, combos: list, workers: int = None) -> list:
+    """Run every combination; workers <= 1 runs in this process. Results keep the order of `combos`."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(combos) <= 1:
+        return [run_combination(combo, arrays) for combo in combos]
+
+    shared = SharedArrays(arrays)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(shared.spec,)) as executor:
+            chunk = max(1, len(combos) // (workers * 4))
+            return list(executor.map(run_combination, combos, chunksize=chunk))
+    finally:
+        shared.close()
+
+
+# ---- command line ----
+
+def format_results(results: list, sort: str, top: int, min_signals: int) -> str:
+    baseline, ranked = results[0], results[1:]
+    ranked = sorted((r for r in ranked if r['total_trades'] >= min_signals), key=lambda r: r[sort], reverse=True)
+
+    def line(label, r):
+        params = ' '.join(f"{name}={value}" for name, value in r['params'].items()) or 'constants.py'
+        return (f"{label:>8} | {r['total_trades']:>8} | {r['win_rate']:>6.1f}% | {r['direct_win_rate']:>6.1f}% | "
+                f"{r['mtg_win_rate']:>6.1f}% | {r['skipped_slots']:>7} | {params}")
+
+    output = f"{'rank':>8} | {'signals':>8} | {'win':>7} | {'direct':>7} | {'MTG':>7} | {'empty':>7} | thresholds\n"
+    output += "-" * 100 + "\n"
+    output += line('baseline', baseline) + "\n"
+    for rank, r in enumerate(ranked[:top], 1):
+        output += line(str(rank), r) + "\n"
+    if len(ranked) < len(results) - 1:
+        output += f"({len(results) - 1 - len(ranked)} combinations with fewer than {min_signals} signals not ranked)\n"
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel search over the scoring thresholds")
+    backtest.add_arguments(parser)
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=VALUES',
+                        help="Threshold values: NAME=1,2,3 or NAME=start:stop:step (repeatable)")
+    parser.add_argument('--random', type=int, help="Sample this many combinations instead of the full grid")
+    parser.add_argument('--seed', type=int, help="Random seed for --random")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes (default: all cores)")
+    parser.add_argument('--min-signals', type=int, default=1, help="Rank only combinations with this many signals")
+    parser.add_argument('--sort', choices=SORT_KEYS, default='win_rate')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--json', help="Write every combination's statistics to this file")
+    args = parser.parse_args()
+
+    try:
+        grid = parse_grid(args.grid)
+    except ValueError as e:
+        parser.error(str(e))
+    if not grid:
+        parser.error("at least one --grid is required")
+    if args.window < backtest.MIN_WINDOW:
+        parser.error(f"--window must be at least {backtest.MIN_WINDOW}")
+
+    candles, _ = backtest.load_candles(args)
+    if not candles:
+        return
+
+    started = time.perf_counter()
+    arrays = prepare(candles, args.every, args.window)
+    print(f"Precomputed {arrays['features'].shape[1]:,} snapshots over {len(arrays['times']):,} clicks "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    combos = [{}] + combinations(grid, args.random, args.seed)
+    started = time.perf_counter()
+    results = sweep(arrays, combos, args.workers)
+    elapsed = time.perf_counter() - started
+    print(f"{len(combos) - 1} combinations in {elapsed:.1f}s on {args.workers} workers "
+          f"({len(combos) / elapsed:.1f}/s)\n")
+    print(format_results(results, args.sort, args.top, args.min_signals))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()